@@ -1,9 +1,29 @@
 import argparse
 import json
+import os
 import sys
 from src.client import RapidPipelineClient
 from src.validation_utils import ValidationUtils
 from src.model_processor import ModelProcessor
+from src.asset_cleaner import AssetCleaner
+from src.duration_stats import DurationStore
+from src.job_scheduler import JobScheduler
+from src.event_bus import EventBus, JsonLinesSink, PrometheusSink
+from src.progress_dashboard import ProgressDashboard
+from src.job_server import JobServer
+from src.folder_watcher import FolderWatcher
+from src.content_hasher import ContentHasher
+from src.download_filter import DownloadFilter
+from src.fetch_index import FetchIndex
+from src.output_store import OutputStore
+from src.output_sink import LocalSink, S3Sink, TarSink
+from src.token_pool import TokenPool
+from src.lease_store import SqliteLeaseStore
+from src.adaptive_limiter import AdaptiveLimiter
+from src.transfer_manager import TransferManager
+from src.cancellation import CancelToken
+from src.checkpoint import Checkpoint
+from src.shutdown_handler import ShutdownHandler
 
 def parse_arguments():
     parser = argparse.ArgumentParser()
@@ -11,7 +31,8 @@ def parse_arguments():
     # Required argument
     parser.add_argument(
         "model",
-        help="input directory or 3D model (must be a self-contained file e.g. .glb OR .zip file OR base asset ID in the form <number>.id)",
+        nargs="?",
+        help="input directory or 3D model (must be a self-contained file e.g. .glb OR .zip file OR base asset ID in the form <number>.id) OR JSON-lines manifest (.jsonl) OR 'serve' to run the job submission API OR 'fetch' to download deferred results",
     )
 
     # Optional arguments
@@ -62,6 +83,300 @@ def parse_arguments():
         action="store_false",
         help="don't cleanup after processing",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        type=int,
+        default=1,
+        help="number of models processed concurrently",
+    )
+    parser.add_argument(
+        "--adaptive-concurrency",
+        dest="adaptiveConcurrency",
+        action="store_true",
+        help="adapt the number of concurrent uploads, optimizations and downloads (up to --workers) "
+        "to rate limits, server errors and slow responses",
+    )
+    parser.add_argument(
+        "--bandwidth-limit",
+        dest="bandwidthLimit",
+        type=float,
+        default=0.0,
+        help="cap on uploads and downloads together in MB/s, shared fairly between transfers "
+        "(default: no cap)",
+    )
+    parser.add_argument(
+        "--upload-limit",
+        dest="uploadLimit",
+        type=float,
+        default=0.0,
+        help="cap on uploads in MB/s (default: no cap)",
+    )
+    parser.add_argument(
+        "--download-limit",
+        dest="downloadLimit",
+        type=float,
+        default=0.0,
+        help="cap on downloads in MB/s (default: no cap)",
+    )
+    parser.add_argument(
+        "--max-optimizations",
+        dest="maxOptimizations",
+        type=int,
+        default=0,
+        help="optimizations in flight per API token (default: discovered from the server queue); "
+        "further jobs wait locally by priority",
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        dest="hedgePercentile",
+        type=float,
+        default=0.0,
+        help="resubmit optimizations still running past this percentile of the preset's past "
+        "durations (e.g. 99) and keep whichever finishes first (default: off)",
+    )
+    parser.add_argument(
+        "--schedule",
+        dest="schedule",
+        choices=JobScheduler.POLICIES,
+        default="fifo",
+        help="job order: fifo, sjf (shortest estimated job first) or lpt (longest first, lowest total time)",
+    )
+    parser.add_argument(
+        "--interactive-priority",
+        dest="interactivePriority",
+        type=int,
+        default=None,
+        help="run jobs of at least this priority in the interactive lane, ahead of bulk jobs "
+        "at every stage (default: a single lane)",
+    )
+    parser.add_argument(
+        "--interactive-workers",
+        dest="interactiveWorkers",
+        type=int,
+        default=1,
+        help="additional workers and optimization slots per token reserved for interactive jobs",
+    )
+    parser.add_argument(
+        "--bulk-poll-interval",
+        dest="bulkPollInterval",
+        type=float,
+        default=2.0,
+        help="seconds between the first status polls of bulk optimizations while lanes are used",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        dest="pollInterval",
+        type=float,
+        default=1.0,
+        help="seconds between the first status polls of an optimization (backing off from there)",
+    )
+    parser.add_argument(
+        "--max-poll-interval",
+        dest="maxPollInterval",
+        type=float,
+        default=5.0,
+        help="longest interval between status polls of an optimization in seconds",
+    )
+    parser.add_argument(
+        "--duration-stats-file",
+        dest="durationStatsFile",
+        default="job_durations.json",
+        help="file storing observed stage durations used for scheduling and ETAs",
+    )
+    parser.add_argument(
+        "--hash-inputs",
+        dest="hashInputs",
+        action="store_true",
+        help="hash local inputs to skip duplicates and unchanged files (digests are cached)",
+    )
+    parser.add_argument(
+        "--hash-cache-file",
+        dest="hashCacheFile",
+        default="hash_cache.json",
+        help="file caching input digests by inode, size and modification time",
+    )
+    parser.add_argument(
+        "--hash-sample-mb",
+        dest="hashSampleMb",
+        type=int,
+        default=0,
+        help="use a fast sampled fingerprint for inputs of this size in MB and larger (0 = never)",
+    )
+    parser.add_argument(
+        "--defer-cleanup",
+        dest="deferCleanup",
+        action="store_true",
+        help="delete remote assets at the end of the run instead of in the background",
+    )
+    parser.add_argument(
+        "--cleanup-state-file",
+        dest="cleanupStateFile",
+        default="pending_deletions.json",
+        help="file used to persist pending deletions across runs",
+    )
+    parser.add_argument(
+        "--events-file",
+        dest="eventsFile",
+        default="",
+        help="append all status events as JSON lines to this file",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        dest="metricsPort",
+        type=int,
+        default=0,
+        help="serve Prometheus metrics on http://127.0.0.1:<port>/metrics",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        dest="quiet",
+        action="store_true",
+        help="don't print status messages to the terminal",
+    )
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        action="store_true",
+        help="print API call statistics (latency percentiles, retries, bytes) at the end",
+    )
+    parser.add_argument(
+        "--no-verify-downloads",
+        dest="verifyDownloads",
+        action="store_false",
+        help="don't check downloaded results for truncation and corruption",
+    )
+    parser.add_argument(
+        "--download-include",
+        dest="downloadInclude",
+        default="",
+        help="comma separated result formats to download, e.g. glb,usdz (default: all)",
+    )
+    parser.add_argument(
+        "--download-exclude",
+        dest="downloadExclude",
+        default="",
+        help="comma separated result formats not to download, e.g. obj",
+    )
+    parser.add_argument(
+        "--defer-downloads",
+        dest="deferDownloads",
+        action="store_true",
+        help="record results that aren't downloaded in the fetch index for the 'fetch' command",
+    )
+    parser.add_argument(
+        "--fetch-index-file",
+        dest="fetchIndexFile",
+        default="fetch_index.json",
+        help="JSON file download URLs of deferred results are stored in",
+    )
+    parser.add_argument(
+        "--output-store",
+        dest="outputStore",
+        default="",
+        help="keep downloaded results once per content in this directory and hardlink them into output/",
+    )
+    parser.add_argument(
+        "--output-sink",
+        dest="outputSink",
+        default="local",
+        help="where results are written: 'local' (output/ directory), 'tar' (tar stream to stdout) "
+        "or s3://bucket/prefix (credentials from AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY)",
+    )
+    parser.add_argument(
+        "--s3-endpoint",
+        dest="s3Endpoint",
+        default="",
+        help="URL of an S3-compatible service for --output-sink s3://... (default: AWS)",
+    )
+    parser.add_argument(
+        "--run-timeout",
+        dest="runTimeout",
+        type=float,
+        default=0.0,
+        help="seconds after which all remaining jobs are stopped (default: no limit)",
+    )
+    parser.add_argument(
+        "--job-timeout",
+        dest="jobTimeout",
+        type=float,
+        default=0.0,
+        help="seconds a job may run before it is stopped (default: no limit; "
+        "\"timeout\" in a manifest line overrides it)",
+    )
+    parser.add_argument(
+        "--stage-timeout",
+        dest="stageTimeout",
+        type=float,
+        default=0.0,
+        help="seconds each upload, optimization and download may take (default: no limit)",
+    )
+    parser.add_argument(
+        "--lease-db",
+        dest="leaseDb",
+        default="",
+        help="SQLite database on a shared file system; nodes using the same database split the jobs between them",
+    )
+    parser.add_argument(
+        "--lease-ttl",
+        dest="leaseTtl",
+        type=float,
+        default=120.0,
+        help="seconds until a job claimed by a node that stopped heartbeating can be reclaimed",
+    )
+    parser.add_argument(
+        "--node-id",
+        dest="nodeId",
+        default="",
+        help="name of this node in the lease database (default: <hostname>:<pid>)",
+    )
+    parser.add_argument(
+        "--checkpoint-file",
+        dest="checkpointFile",
+        default="checkpoint.json",
+        help="file recording the stages of jobs in flight, so an interrupted run is resumed "
+        "by the next one (not used with --lease-db; empty to disable)",
+    )
+    parser.add_argument(
+        "--drain-grace",
+        dest="drainGrace",
+        type=float,
+        default=60.0,
+        help="seconds downloads in progress may take after SIGINT/SIGTERM before the run is stopped",
+    )
+    parser.add_argument(
+        "--watch",
+        dest="watch",
+        default="",
+        help="keep running and process new or changed models landing in this directory",
+    )
+    parser.add_argument(
+        "--settle-time",
+        dest="settleTime",
+        type=float,
+        default=2.0,
+        help="seconds a watched file must stay unchanged before it is processed",
+    )
+    parser.add_argument(
+        "--watch-existing",
+        dest="watchExisting",
+        action="store_true",
+        help="also process files already in the watched directory at startup",
+    )
+    parser.add_argument(
+        "--listen",
+        dest="listen",
+        default="127.0.0.1:8765",
+        help="host:port the job API listens on in serve mode",
+    )
+    parser.add_argument(
+        "--socket",
+        dest="socket",
+        default="",
+        help="serve the job API on this Unix socket instead of --listen",
+    )
     parser.add_argument(
         "-e",
         "--exit",
@@ -72,12 +387,45 @@ def parse_arguments():
 
     parser.set_defaults(cleanup=True)
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if not args.model and not args.watch:
+        parser.error("the following arguments are required: model (or --watch)")
+    if args.outputSink not in ("local", "tar") and not args.outputSink.startswith("s3://"):
+        parser.error("--output-sink must be 'local', 'tar' or s3://bucket/prefix")
+    if not 0 <= args.hedgePercentile < 100:
+        parser.error("--hedge-percentile must be between 0 and 100")
+    if args.outputStore and args.outputSink != "local":
+        parser.error("--output-store can only be used with the local output sink")
+    return args
+
+
+def create_output_sink(args, events: EventBus, request_utils, tar_stream=None):
+    """Create the output sink selected on the command line."""
+    if args.outputSink == "tar":
+        return TarSink(tar_stream, events)
+    if args.outputSink.startswith("s3://"):
+        region = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
+        return S3Sink.from_url(
+            args.outputSink,
+            endpoint=args.s3Endpoint,
+            region=region,
+            access_key=os.environ.get("AWS_ACCESS_KEY_ID", ""),
+            secret_key=os.environ.get("AWS_SECRET_ACCESS_KEY", ""),
+            session_token=os.environ.get("AWS_SESSION_TOKEN", ""),
+            request_utils=request_utils,
+        )
+    store = OutputStore(args.outputStore, events=events) if args.outputStore else None
+    return LocalSink(store, events)
 
 def main():
     # Parse arguments
     args = parse_arguments()
     validator = ValidationUtils()
+    tar_stream = None
+    if args.outputSink == "tar":
+        # The archive goes to stdout, all messages to stderr
+        tar_stream = sys.stdout.buffer
+        sys.stdout = sys.stderr
 
     # Load and validate credentials
     try:
@@ -109,23 +457,164 @@ def main():
         print(f'Unable to load and parse preset definitions JSON file "{args.presetsFile}". Make sure the file exists and is valid JSON.')
         sys.exit(1)
 
+    # Set up status reporting
+    events = EventBus(sinks=[] if args.quiet else [ProgressDashboard()])
+    if args.eventsFile:
+        events.add_sink(JsonLinesSink(args.eventsFile))
+    if args.metricsPort:
+        events.add_sink(PrometheusSink(args.metricsPort))
+
     # Initialize client and processor
+    download_filter = DownloadFilter(
+        [name.strip() for name in args.downloadInclude.split(",") if name.strip()],
+        [name.strip() for name in args.downloadExclude.split(",") if name.strip()],
+    )
+    fetch_index = None
+    if args.deferDownloads or args.model == "fetch":
+        fetch_index = FetchIndex(args.fetchIndexFile, events)
     client = RapidPipelineClient(
-        access_token=credentials["token"],
-        base_url=args.baseUrl
+        access_token=credentials.get("token", ""),
+        base_url=args.baseUrl,
+        events=events,
+        verify_downloads=args.verifyDownloads,
+        download_filter=download_filter,
+        fetch_index=fetch_index,
+        token_pool=TokenPool.from_credentials(credentials),
+        limiter=AdaptiveLimiter(args.workers, events=events) if args.adaptiveConcurrency else None,
+        max_optimizations=args.maxOptimizations,
+        stage_timeout=args.stageTimeout,
+        interactive_priority=args.interactivePriority,
+        reserved_optimizations=args.interactiveWorkers,
+        bulk_poll_interval=args.bulkPollInterval,
+        poll_interval=args.pollInterval,
+        max_poll_interval=args.maxPollInterval,
+        transfers=TransferManager(
+            args.bandwidthLimit * 1024 * 1024,
+            args.uploadLimit * 1024 * 1024,
+            args.downloadLimit * 1024 * 1024,
+            events,
+        ),
     )
-    processor = ModelProcessor(client)
-
-    # Process models
-    failed_optimizations = processor.process_models(
-        model_path=args.model,
-        presets=presets,
-        cleanup=args.cleanup,
-        exit_on_error=args.exitOnError,
-        model_label=args.modelLabel
+    client.file_utils.sink = create_output_sink(args, events, client.request_utils, tar_stream)
+    cleaner = AssetCleaner(
+        client, state_file=args.cleanupStateFile, defer=args.deferCleanup
+    )
+    durations = DurationStore(args.durationStatsFile, events)
+    hasher = None
+    if args.hashInputs:
+        hasher = ContentHasher(
+            args.hashCacheFile,
+            sample_threshold=args.hashSampleMb * 1024 * 1024,
+            events=events,
+        )
+    leases = None
+    if args.leaseDb:
+        leases = SqliteLeaseStore(args.leaseDb, args.nodeId, args.leaseTtl, events)
+    checkpoint = None
+    if args.checkpointFile and leases is None:
+        checkpoint = Checkpoint(args.checkpointFile, events)
+    processor = ModelProcessor(
+        client,
+        cleaner,
+        workers=args.workers,
+        durations=durations,
+        schedule=args.schedule,
+        hasher=hasher,
+        leases=leases,
+        hedge_percentile=args.hedgePercentile,
+        cancel_token=CancelToken("run", args.runTimeout),
+        job_timeout=args.jobTimeout,
+        checkpoint=checkpoint,
+        interactive_priority=args.interactivePriority,
+        interactive_workers=args.interactiveWorkers,
     )
+    watcher = None
+    server = None
+
+    def drain():
+        # First SIGINT/SIGTERM: stop taking work and let the jobs wind down
+        processor.drain(args.drainGrace)
+        if watcher is not None:
+            watcher.stop()
+        if server is not None:
+            server.stop()
+
+    shutdown = ShutdownHandler(drain, events)
+    shutdown.install()
+
+    if args.watch:
+        # Process models as they land in the directory until interrupted
+        watcher = FolderWatcher(
+            args.watch,
+            events,
+            settle_time=args.settleTime,
+            include_existing=args.watchExisting,
+        )
+        failed_optimizations = processor.watch_folder(
+            watcher,
+            presets,
+            cleanup=args.cleanup,
+            exit_on_error=args.exitOnError,
+            model_label=args.modelLabel,
+        )
+    elif args.model == "serve":
+        # Keep everything warm and accept jobs until interrupted
+        server = JobServer(
+            processor,
+            presets,
+            settings["schemaPath"],
+            cleanup=args.cleanup,
+            listen=args.listen,
+            socket_path=args.socket,
+        )
+        try:
+            server.serve_forever()  # until drain() stops it
+        finally:
+            server.close()
+        failed_optimizations = 0
+    elif args.model == "fetch":
+        # Download results deferred by earlier runs
+        failed_optimizations = processor.fetch_deferred(cleanup=args.cleanup)
+    else:
+        # Process models
+        failed_optimizations = processor.process_models(
+            model_path=args.model,
+            presets=presets,
+            cleanup=args.cleanup,
+            exit_on_error=args.exitOnError,
+            model_label=args.modelLabel
+        )
+    client.close()
+    cleaner.close()
+    if args.stats:
+        events.log("\n" + client.request_utils.stats.summary())
+        events.log("\n" + client.transfers.summary())
+        if len(client.tokens.tokens) > 1:
+            events.log("\n" + client.tokens.summary())
+        events.log("\n" + client.admission.summary())
+        if args.hedgePercentile:
+            events.log(
+                f"\nHedged optimizations: {client.hedges['submitted']} duplicates submitted, "
+                f"{client.hedges['won']} finished first"
+            )
+        if processor.flights.shared:
+            events.log(
+                f"\nShared optimizations: {processor.flights.shared} taken over from "
+                "jobs with the same input and preset"
+            )
+        if client.limiter is not None:
+            events.log("\n" + client.limiter.summary())
+        if leases is not None:
+            events.log("\n" + leases.summary())
+    if leases is not None:
+        leases.close()
+    events.close()
 
     # Exit with error if any optimizations failed
+    if shutdown.signum:
+        sys.exit(128 + shutdown.signum)
+    if processor.stopped_on_error:
+        sys.exit(2)
     sys.exit(0 if failed_optimizations == 0 else 1)
 
 if __name__ == "__main__":
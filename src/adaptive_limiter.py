@@ -0,0 +1,190 @@
+import contextlib
+import heapq
+import itertools
+import math
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+from src.cancellation import CancelToken
+from src.event_bus import EventBus
+
+
+class StageLimit:
+    """Concurrency limit and counters of one stage."""
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self.generation = 0  # incremented by every decrease
+        self.increases = 0
+        self.decreases: Dict[str, int] = {"429": 0, "5xx": 0, "latency": 0}
+        self.baselines: Dict[str, float] = {}  # smoothed latency per endpoint
+        self.waiting: List[Tuple[int, int]] = []  # heap of (-priority, sequence)
+
+
+class _Slot:
+    """A running call of a stage."""
+
+    def __init__(self, stage: str, generation: int, saturated: bool):
+        self.stage = stage
+        self.generation = generation
+        self.saturated = saturated  # the stage was at its limit when the slot was taken
+        self.congested = False
+
+
+class AdaptiveLimiter:
+    """Adapts the concurrency of each client stage to how the API copes (AIMD).
+
+    Calls of a stage (e.g. uploads) take a slot with slot() and wait while
+    the stage is at its limit. Each call that completes without trouble
+    while the stage was saturated raises the limit by 1/limit, i.e. about
+    one per round of calls (additive increase). A 429 or 5xx response or a
+    latency spike in a call of the stage multiplies the limit by BACKOFF
+    (multiplicative decrease). Only calls started after the last decrease
+    can cause another one, so a burst of errors from the same round cuts
+    the limit once.
+
+    Waiting calls take free slots highest priority first.
+
+    A latency spike is a request taking SPIKE_FACTOR times the smoothed
+    latency of its endpoint (and at least MIN_SPIKE seconds). Transfers to
+    and from storage ("s3") are not checked, as their latency depends on
+    the file size.
+    """
+
+    STAGES = ("upload", "optimize", "download")
+    BACKOFF = 0.5
+    SPIKE_FACTOR = 3.0
+    MIN_SPIKE = 1.0  # seconds
+    SMOOTHING = 0.1  # weight of a new latency sample in the baseline
+    CANCEL_CHECK_INTERVAL = 1.0  # seconds between cancellation checks while waiting
+
+    def __init__(
+        self,
+        max_limit: int,
+        initial: Optional[int] = None,
+        events: Optional[EventBus] = None,
+    ):
+        """
+        Args:
+            max_limit: Highest limit per stage (e.g. the number of workers)
+            initial: Starting limit per stage (defaults to half of max_limit)
+            events: Event bus for status messages
+        """
+        self.max_limit = max(1, max_limit)
+        start = initial if initial is not None else math.ceil(self.max_limit / 2)
+        start = min(max(1, start), self.max_limit)
+        self.events = events or EventBus()
+        self.stages = {stage: StageLimit(float(start)) for stage in self.STAGES}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._local = threading.local()  # slot of the current thread
+
+    @contextlib.contextmanager
+    def slot(
+        self, stage: str, cancel_token: Optional[CancelToken] = None, priority: int = 0
+    ) -> Iterator[None]:
+        """
+        Run a call of a stage, waiting while the stage is at its limit.
+
+        The limit is raised when the call completes without an exception
+        and without a congestion signal.
+
+        Args:
+            stage: One of STAGES
+            cancel_token: Stops waiting (raising Cancelled) when cancelled
+            priority: Higher priorities take a free slot first
+        """
+        state = self.stages[stage]
+        with self._condition:
+            ticket = (-priority, next(self._sequence))
+            heapq.heappush(state.waiting, ticket)
+            while state.waiting[0] != ticket or state.in_flight >= int(state.limit):
+                if cancel_token is not None and cancel_token.cancelled:
+                    state.waiting.remove(ticket)
+                    heapq.heapify(state.waiting)
+                    self._condition.notify_all()
+                    cancel_token.check()
+                self._condition.wait(self.CANCEL_CHECK_INTERVAL if cancel_token else None)
+            heapq.heappop(state.waiting)
+            self._condition.notify_all()  # the next waiting call may fit too
+            state.in_flight += 1
+            state.peak = max(state.peak, state.in_flight)
+            slot = _Slot(stage, state.generation, state.in_flight >= int(state.limit))
+        previous = getattr(self._local, "slot", None)
+        self._local.slot = slot
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            self._local.slot = previous
+            with self._condition:
+                state.in_flight -= 1
+                if succeeded and slot.saturated and not slot.congested:
+                    if state.limit < self.max_limit:
+                        state.limit = min(self.max_limit, state.limit + 1 / state.limit)
+                        state.increases += 1
+                self._condition.notify_all()
+
+    def record(self, endpoint: str, status: int, latency: float) -> None:
+        """
+        Feed a finished request of the current thread into its stage's limit.
+
+        Args:
+            endpoint: Endpoint name (see RequestUtils.endpoint_template)
+            status: HTTP status (0 if no response was received)
+            latency: Request duration in seconds
+        """
+        slot = getattr(self._local, "slot", None)
+        if slot is None:
+            return
+        state = self.stages[slot.stage]
+        with self._condition:
+            if status == 429:
+                reason = "429"
+            elif status >= 500:
+                reason = "5xx"
+            elif endpoint != "s3" and 200 <= status < 300:
+                reason = self._check_latency(state, endpoint, latency)
+            else:
+                reason = ""
+            if not reason:
+                return
+            slot.congested = True
+            if slot.generation < state.generation:
+                return  # the limit was already cut for this round of calls
+            previous = int(state.limit)
+            state.limit = max(1.0, state.limit * self.BACKOFF)
+            state.generation += 1
+            state.decreases[reason] += 1
+            limit = int(state.limit)
+        if limit < previous:
+            self.events.log(f"Reducing {slot.stage} concurrency to {limit} ({reason}).")
+
+    def _check_latency(self, state: StageLimit, endpoint: str, latency: float) -> str:
+        """Update the endpoint's latency baseline; returns "latency" for a spike."""
+        baseline = state.baselines.get(endpoint)
+        if baseline is None:
+            state.baselines[endpoint] = latency
+            return ""
+        state.baselines[endpoint] = baseline + self.SMOOTHING * (latency - baseline)
+        if latency >= self.MIN_SPIKE and latency > self.SPIKE_FACTOR * baseline:
+            return "latency"
+        return ""
+
+    def summary(self) -> str:
+        """Current limit and adjustments per stage, for the end-of-run statistics."""
+        lines = [
+            f"Adaptive concurrency (max {self.max_limit}):",
+            f"{'stage':<10} {'limit':>6} {'peak':>5} {'raised':>7} "
+            f"{'429':>5} {'5xx':>5} {'slow':>5}"
+        ]
+        with self._condition:
+            for stage, state in self.stages.items():
+                lines.append(
+                    f"{stage:<10} {int(state.limit):>6} {state.peak:>5} {state.increases:>7} "
+                    f"{state.decreases['429']:>5} {state.decreases['5xx']:>5} "
+                    f"{state.decreases['latency']:>5}"
+                )
+        return "\n".join(lines)
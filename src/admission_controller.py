@@ -0,0 +1,221 @@
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+from src.cancellation import CancelToken
+from src.event_bus import EventBus
+
+
+class _Ticket:
+    """An optimization waiting for or holding an admission slot."""
+
+    def __init__(self, token: str, priority: int, sequence: int):
+        self.token = token
+        self.priority = priority
+        self.sequence = sequence
+        self.admitted: Optional[float] = None
+        self.running = False  # the server reported progress
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (-self.priority, self.sequence) < (-other.priority, other.sequence)
+
+
+class _TokenState:
+    """Admission limit, queue and counters of one API token."""
+
+    def __init__(self, limit: int):
+        self.limit = limit  # 0: no limit
+        self.discovered = False
+        self.waiting: List[_Ticket] = []  # heap, highest priority first
+        self.in_flight: List[_Ticket] = []
+        self.admitted = 0
+        self.peak = 0
+        self.max_wait = 0.0
+
+
+class AdmissionController:
+    """Caps the optimizations in flight per API token.
+
+    Optimizations beyond a plan's parallel-optimization allowance only wait
+    in the server queue (in "sent_to_queue") while being polled. Instead,
+    they wait locally until a slot of their token is free, highest priority
+    first, and the slot is released when the optimization is done or fails.
+
+    The limit of a token is taken from the credentials ("max_optimizations"),
+    else from the default limit. If there is neither, it is discovered: when
+    an admitted optimization still hasn't started QUEUE_GRACE seconds after
+    it was submitted while others of the same token are running, the number
+    of running ones is taken as the allowance.
+
+    With interactive_priority set, `reserved` slots of each limited token
+    (at most all but one) are kept for optimizations of at least that
+    priority, so an interactive job doesn't wait for bulk ones to finish.
+    """
+
+    QUEUE_GRACE = 30.0  # seconds
+    CANCEL_CHECK_INTERVAL = 1.0  # seconds between cancellation checks while waiting
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        default_limit: int = 0,
+        events: Optional[EventBus] = None,
+        interactive_priority: Optional[int] = None,
+        reserved: int = 0,
+    ):
+        """
+        Args:
+            limits: Configured limit per token name (0: use default_limit)
+            default_limit: Limit for tokens without one (0: discover)
+            events: Event bus for status messages
+            interactive_priority: Lowest priority of interactive optimizations
+                (None: no slots are reserved)
+            reserved: Slots per token kept for interactive optimizations
+        """
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self.interactive_priority = interactive_priority
+        self.reserved = reserved if interactive_priority is not None else 0
+        self.events = events or EventBus()
+        self._tokens: Dict[str, _TokenState] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._local = threading.local()  # ticket of the current thread
+
+    @contextlib.contextmanager
+    def slot(
+        self, token: str, priority: int = 0, cancel_token: Optional[CancelToken] = None
+    ) -> Iterator[None]:
+        """
+        Hold an optimization slot of a token, waiting for one if necessary.
+
+        Args:
+            token: Name of the token the optimization is submitted with
+            priority: Higher priorities are admitted first
+            cancel_token: Stops waiting (raising Cancelled) when cancelled
+        """
+        with self._condition:
+            state = self._state(token)
+            ticket = _Ticket(token, priority, next(self._sequence))
+            heapq.heappush(state.waiting, ticket)
+            queued = time.time()
+            logged = False
+            while not self._admissible(state, ticket):
+                if not logged and state.waiting[0] is ticket:
+                    self.events.log(
+                        f"Waiting for one of {state.limit} optimization slot(s) of token {token} ..."
+                    )
+                    logged = True
+                if cancel_token is not None and cancel_token.cancelled:
+                    state.waiting.remove(ticket)
+                    heapq.heapify(state.waiting)
+                    self._condition.notify_all()
+                    cancel_token.check()
+                self._condition.wait(self.CANCEL_CHECK_INTERVAL if cancel_token else None)
+            heapq.heappop(state.waiting)
+            ticket.admitted = time.time()
+            state.in_flight.append(ticket)
+            state.admitted += 1
+            state.peak = max(state.peak, len(state.in_flight))
+            state.max_wait = max(state.max_wait, ticket.admitted - queued)
+            self._condition.notify_all()  # the next waiting ticket may be admitted too
+        previous = getattr(self._local, "ticket", None)
+        self._local.ticket = ticket
+        try:
+            yield
+        finally:
+            self._local.ticket = previous
+            self.release(ticket)
+
+    def try_acquire(self, token: str) -> Optional[_Ticket]:
+        """
+        Take a free slot of a token without waiting (e.g. for a hedged duplicate).
+
+        Args:
+            token: Name of the token
+
+        Returns:
+            Optional[_Ticket]: The slot (give it back with release()), None if
+            no slot is free or other optimizations are waiting
+        """
+        with self._condition:
+            state = self._state(token)
+            ticket = _Ticket(token, 0, next(self._sequence))
+            if state.waiting or (state.limit and len(state.in_flight) >= self._limit(state, ticket)):
+                return None
+            ticket.admitted = time.time()
+            state.in_flight.append(ticket)
+            state.admitted += 1
+            state.peak = max(state.peak, len(state.in_flight))
+            return ticket
+
+    def release(self, ticket: _Ticket) -> None:
+        """Give back a slot."""
+        with self._condition:
+            self._tokens[ticket.token].in_flight.remove(ticket)
+            self._condition.notify_all()
+
+    def observe(self, running: bool) -> None:
+        """
+        Report the status of the current thread's optimization after a poll.
+
+        Args:
+            running: Whether the server reported progress (False while queued)
+        """
+        ticket = getattr(self._local, "ticket", None)
+        if ticket is None or ticket.running:
+            return
+        with self._condition:
+            if running:
+                ticket.running = True
+                return
+            state = self._tokens[ticket.token]
+            if state.limit and not state.discovered:
+                return
+            if time.time() - ticket.admitted < self.QUEUE_GRACE:
+                return
+            running_count = sum(1 for other in state.in_flight if other.running)
+            if running_count and (not state.limit or running_count < state.limit):
+                state.limit = running_count
+                state.discovered = True
+                self.events.log(
+                    f"Optimizations of token {ticket.token} are queued by the server; "
+                    f"limiting them to {running_count} at a time."
+                )
+
+    def _admissible(self, state: _TokenState, ticket: _Ticket) -> bool:
+        """Whether a ticket is next in line and a slot is free (called with the lock held)."""
+        if state.waiting[0] is not ticket:
+            return False
+        return not state.limit or len(state.in_flight) < self._limit(state, ticket)
+
+    def _limit(self, state: _TokenState, ticket: _Ticket) -> int:
+        """Slots of a token a ticket may use, without the reserved ones for bulk tickets."""
+        if self.reserved and ticket.priority < self.interactive_priority:
+            return state.limit - min(self.reserved, state.limit - 1)
+        return state.limit
+
+    def _state(self, token: str) -> _TokenState:
+        """State of a token, created on first use (called with the lock held)."""
+        state = self._tokens.get(token)
+        if state is None:
+            limit = self.limits.get(token) or self.default_limit
+            state = self._tokens[token] = _TokenState(limit)
+        return state
+
+    def summary(self) -> str:
+        """Limit and admissions per token, for the end-of-run statistics."""
+        lines = ["Optimization admission:"]
+        with self._condition:
+            for token, state in self._tokens.items():
+                if not state.limit:
+                    limit = "no limit"
+                else:
+                    limit = ("discovered " if state.discovered else "") + f"max {state.limit}"
+                lines.append(
+                    f"  {token:<20} {state.admitted:>6} admitted  peak {state.peak:>3}  "
+                    f"longest wait {state.max_wait:.1f}s  ({limit})"
+                )
+        return "\n".join(lines)
@@ -0,0 +1,200 @@
+import threading
+from typing import Dict, Tuple
+
+
+class LatencyHistogram:
+    """HDR-style latency histogram.
+
+    Values are recorded in microseconds into logarithmic buckets that are each
+    split into linear sub-buckets, which keeps the relative error below
+    10^-significant_digits over the whole range at constant memory.
+    """
+
+    def __init__(self, significant_digits: int = 2):
+        """
+        Args:
+            significant_digits: Number of significant decimal digits to preserve
+        """
+        self._sub_bucket_bits = (2 * 10 ** significant_digits - 1).bit_length()
+        self._sub_bucket_count = 1 << self._sub_bucket_bits
+        self._sub_bucket_half = self._sub_bucket_count >> 1
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """
+        Record a latency.
+
+        Args:
+            seconds: Latency in seconds
+        """
+        index = self._index(max(1, int(seconds * 1e6)))
+        self._counts[index] = self._counts.get(index, 0) + 1
+        if self.count == 0 or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, percentile: float) -> float:
+        """
+        Get the latency at the given percentile.
+
+        Args:
+            percentile: Percentile between 0 and 100
+
+        Returns:
+            float: Latency in seconds (0.0 if nothing was recorded)
+        """
+        if not self.count:
+            return 0.0
+        target = max(1, int(round(self.count * percentile / 100.0)))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= target:
+                return min(self._value(index) / 1e6, self.max)
+        return self.max
+
+    def mean(self) -> float:
+        """Get the mean latency in seconds."""
+        return self.total / self.count if self.count else 0.0
+
+    def _index(self, value: int) -> int:
+        """Map a value in microseconds to its bucket index."""
+        if value < self._sub_bucket_count:
+            return value
+        shift = value.bit_length() - self._sub_bucket_bits
+        sub_bucket = value >> shift
+        return (shift + 1) * self._sub_bucket_half + sub_bucket - self._sub_bucket_half
+
+    def _value(self, index: int) -> int:
+        """Map a bucket index back to the midpoint value in microseconds."""
+        if index < self._sub_bucket_count:
+            return index
+        shift = index // self._sub_bucket_half - 1
+        sub_bucket = index % self._sub_bucket_half + self._sub_bucket_half
+        return (sub_bucket << shift) + ((1 << shift) >> 1)
+
+
+class EndpointStats:
+    """Latency histogram and outcome counters for a single endpoint."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statuses: Dict[int, int] = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    @property
+    def errors(self) -> int:
+        """Number of failed calls (network errors and HTTP status >= 400)."""
+        return sum(n for status, n in self.statuses.items() if status == 0 or status >= 400)
+
+
+class ApiStats:
+    """Thread-safe accounting of API calls made through RequestUtils."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints: Dict[Tuple[str, str], EndpointStats] = {}
+        self.retries = 0
+        self.rate_limited = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    def record(
+        self,
+        method: str,
+        endpoint: str,
+        status: int,
+        latency: float,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+        connection_reused: bool = False,
+    ) -> None:
+        """
+        Record a finished request attempt.
+
+        Args:
+            method: HTTP method
+            endpoint: Endpoint template, e.g. "rawmodel/{id}"
+            status: HTTP status code (0 for network errors)
+            latency: Time until the response headers arrived, in seconds
+            bytes_sent: Request body size
+            bytes_received: Response body size
+            connection_reused: Whether an already open connection was used
+        """
+        with self._lock:
+            stats = self.endpoints.get((method, endpoint))
+            if stats is None:
+                stats = self.endpoints[(method, endpoint)] = EndpointStats()
+            stats.latency.record(latency)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            self.bytes_sent += bytes_sent
+            self.bytes_received += bytes_received
+            if status == 429:
+                self.rate_limited += 1
+            if connection_reused:
+                self.connections_reused += 1
+            else:
+                self.connections_opened += 1
+
+    def record_retry(self) -> None:
+        """Record that a request is going to be retried."""
+        with self._lock:
+            self.retries += 1
+
+    def summary(self) -> str:
+        """
+        Render a human readable summary table.
+
+        Returns:
+            str: Multi-line summary
+        """
+        lines = [
+            "API statistics:",
+            f"{'endpoint':<45} {'calls':>6} {'errors':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}",
+        ]
+        with self._lock:
+            for (method, endpoint), stats in sorted(self.endpoints.items()):
+                latency = stats.latency
+                lines.append(
+                    f"{method + ' ' + endpoint:<45} {latency.count:>6} {stats.errors:>6} "
+                    f"{_format_seconds(latency.percentile(50)):>9} "
+                    f"{_format_seconds(latency.percentile(90)):>9} "
+                    f"{_format_seconds(latency.percentile(99)):>9} "
+                    f"{_format_seconds(latency.max):>9}"
+                )
+            lines.append(
+                f"Retries: {self.retries}  Rate limited (429): {self.rate_limited}  "
+                f"Sent: {format_bytes(self.bytes_sent)}  "
+                f"Received: {format_bytes(self.bytes_received)}  "
+                f"Connections: {self.connections_opened} opened, "
+                f"{self.connections_reused} reused"
+            )
+        return "\n".join(lines)
+
+
+def _format_seconds(seconds: float) -> str:
+    """Format a duration for the summary table."""
+    if seconds < 1:
+        return f"{seconds * 1000:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+def format_bytes(num_bytes: float) -> str:
+    """Format a byte count for summary tables (e.g. "1.5 MB")."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from src.client import RapidPipelineClient
+
+
+class AssetCleaner:
+    """Background deleter for uploaded base assets and optimized results.
+
+    Deletions are queued instead of being issued inline, so the next model can
+    start while the previous one is still being cleaned up. Pending deletions
+    are persisted to a state file and picked up again on the next run.
+    """
+
+    BASE_ASSET = "rawmodel"
+    RAPID_MODEL = "rapidmodel"
+
+    def __init__(
+        self,
+        client: RapidPipelineClient,
+        state_file: str = "pending_deletions.json",
+        defer: bool = False,
+        batch_size: int = 10,
+        min_interval: float = 0.2,
+        max_retries: int = 5,
+        retry_delay: float = 5.0,
+    ):
+        """
+        Args:
+            client: Client used to issue the DELETE requests
+            state_file: JSON file used to persist pending deletions
+            defer: If True, only delete when flush() is called (end of the run)
+            batch_size: Maximum number of deletions taken per batch
+            min_interval: Minimum delay between two DELETE requests in seconds
+            max_retries: Attempts per deletion before giving up for this run
+            retry_delay: Base delay before retrying a failed deletion (doubles per attempt)
+        """
+        self.client = client
+        self.events = client.events
+        self.state_file = state_file
+        self.defer = defer
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._pending: List[Dict] = []
+        self._in_progress = 0
+        self._flushing = 0
+        self._stopping = False
+        self._last_delete = 0.0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+        self._load_state()
+
+    def schedule(self, kind: str, asset_id: int, token: str = "") -> None:
+        """
+        Queue an asset for deletion.
+
+        Args:
+            kind: AssetCleaner.BASE_ASSET or AssetCleaner.RAPID_MODEL
+            asset_id: ID of the asset to delete
+            token: Name of the API token owning the asset (default: the first token)
+        """
+        with self._condition:
+            if any(i["kind"] == kind and i["id"] == asset_id for i in self._pending):
+                return
+            self._pending.append(
+                {"kind": kind, "id": asset_id, "token": token, "attempts": 0, "next_try": 0.0}
+            )
+            self._save_state()
+            self._ensure_started()
+            self._condition.notify_all()
+
+    def flush(self) -> int:
+        """
+        Process all pending deletions (including deferred ones) and wait for them.
+
+        Returns:
+            int: Number of deletions that are still pending after giving up
+        """
+        with self._condition:
+            if not self._pending:
+                return 0
+            self._flushing += 1
+            self._ensure_started()
+            self._condition.notify_all()
+            while self._in_progress or any(
+                i["attempts"] < self.max_retries for i in self._pending
+            ):
+                self._condition.wait()
+            self._flushing -= 1
+            remaining = len(self._pending)
+
+        if remaining:
+            self.events.log(
+                f"Cleanup: {remaining} deletion(s) failed and are kept in "
+                f'"{self.state_file}" for the next run.'
+            )
+        return remaining
+
+    def close(self) -> int:
+        """
+        Flush pending deletions and stop the background thread.
+
+        Returns:
+            int: Number of deletions that are still pending
+        """
+        remaining = self.flush()
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        return remaining
+
+    def _ensure_started(self) -> None:
+        """Start the background thread if it isn't running yet."""
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name="asset-cleaner", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        """Background loop taking batches of due deletions."""
+        while True:
+            with self._condition:
+                batch = self._next_batch()
+                while not batch:
+                    if self._stopping:
+                        return
+                    self._condition.wait(self._next_wakeup())
+                    batch = self._next_batch()
+                self._in_progress += len(batch)
+
+            for item in batch:
+                self._delete(item)
+
+            with self._condition:
+                self._in_progress -= len(batch)
+                self._save_state()
+                self._condition.notify_all()
+
+    def _next_batch(self) -> List[Dict]:
+        """Pick up to batch_size deletions that are due. Caller holds the lock."""
+        if self.defer and not self._flushing:
+            return []
+
+        now = time.time()
+        batch = []
+        for item in self._pending:
+            if item.get("busy") or item["attempts"] >= self.max_retries:
+                continue
+            if item["next_try"] <= now:
+                item["busy"] = True
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+        return batch
+
+    def _next_wakeup(self) -> Optional[float]:
+        """Seconds until the next retry is due, or None to wait for a notify."""
+        retries = [
+            i["next_try"]
+            for i in self._pending
+            if not i.get("busy") and i["attempts"] < self.max_retries
+        ]
+        if not retries or (self.defer and not self._flushing):
+            return None
+        return max(0.0, min(retries) - time.time())
+
+    def _delete(self, item: Dict) -> None:
+        """Issue a single rate-limited DELETE request and update its state."""
+        wait = self._last_delete + self.min_interval - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_delete = time.time()
+
+        with self.client.use_token(item.get("token", "")):
+            if item["kind"] == self.BASE_ASSET:
+                deleted = self.client.delete_base_asset(item["id"])
+            else:
+                deleted = self.client.delete_rapid_model(item["id"])
+
+        with self._condition:
+            item.pop("busy", None)
+            if deleted:
+                self._pending.remove(item)
+                return
+            item["attempts"] += 1
+            item["next_try"] = time.time() + self.retry_delay * 2 ** (
+                item["attempts"] - 1
+            )
+            if item["attempts"] >= self.max_retries:
+                self.events.log(
+                    f"Cleanup: giving up deleting {item['kind']} {item['id']} "
+                    f"after {item['attempts']} attempts."
+                )
+
+    def _load_state(self) -> None:
+        """Load deletions left over from a previous run."""
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                items = json.load(f)
+        except (IOError, ValueError):
+            self.events.log(f'Warning: unable to read cleanup state file "{self.state_file}".')
+            return
+
+        for item in items:
+            self._pending.append(
+                {
+                    "kind": item["kind"],
+                    "id": item["id"],
+                    "token": item.get("token", ""),
+                    "attempts": 0,
+                    "next_try": 0.0,
+                }
+            )
+        if self._pending:
+            self.events.log(f"Cleanup: resuming {len(self._pending)} pending deletion(s) from last run.")
+            self._ensure_started()
+
+    def _save_state(self) -> None:
+        """Persist pending deletions atomically. Caller holds the lock."""
+        items = [{"kind": i["kind"], "id": i["id"], "token": i["token"]} for i in self._pending]
+        try:
+            if not items:
+                if os.path.exists(self.state_file):
+                    os.remove(self.state_file)
+                return
+            tmp_file = self.state_file + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(items, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            self.events.log(f'Warning: unable to write cleanup state file "{self.state_file}": {e}')
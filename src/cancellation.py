@@ -0,0 +1,131 @@
+import threading
+import time
+import weakref
+from typing import List, Optional
+
+
+class Cancelled(Exception):
+    """Raised in a job whose cancel token was cancelled or whose deadline passed.
+
+    Code unwinding a cancelled job adds the IDs of the optimized models it
+    started to rapid_model_ids, so they can be deleted.
+    """
+
+    def __init__(self, reason: str, expired: bool = False):
+        super().__init__(reason)
+        self.reason = reason
+        self.expired = expired  # a deadline passed (rather than an explicit cancel)
+        self.rapid_model_ids: List[int] = []
+
+
+class CancelToken:
+    """Cooperative cancellation with an optional deadline.
+
+    Tokens form a tree (run, job, stage): a token is cancelled when it is
+    cancelled itself, its deadline has passed or its parent is cancelled.
+    Long-running code calls check() between steps and waits with sleep(),
+    which returns early on cancellation.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: Optional[float] = None,
+        parent: Optional["CancelToken"] = None,
+    ):
+        """
+        Args:
+            name: What the token limits ("run", "job", a stage name), for messages
+            timeout: Seconds from now until the deadline (None or 0: no deadline)
+            parent: Token whose cancellation cancels this one
+        """
+        self.name = name
+        self.deadline: Optional[float] = time.time() + timeout if timeout else None
+        self.parent: Optional[CancelToken] = None
+        self._reason = ""
+        self._event = threading.Event()
+        self._children: "weakref.WeakSet[CancelToken]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        if parent is not None:
+            self.link(parent)
+
+    def child(self, name: str, timeout: Optional[float] = None) -> "CancelToken":
+        """A token cancelled with this one, with an optional own deadline."""
+        return CancelToken(name, timeout, self)
+
+    def link(self, parent: "CancelToken") -> None:
+        """Make this token a child of parent (e.g. when a queued job starts)."""
+        self.parent = parent
+        with parent._lock:
+            parent._children.add(self)
+        if parent._event.is_set():
+            self.cancel(parent.reason)
+
+    def restrict(self, timeout: float) -> None:
+        """Move the deadline to timeout seconds from now, unless it is earlier already."""
+        deadline = time.time() + timeout
+        if self.deadline is None or deadline < self.deadline:
+            self.deadline = deadline
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel the token and its children."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._reason = reason
+            self._event.set()
+            children = list(self._children)
+        for child in children:
+            child.cancel(reason)
+
+    @property
+    def cancelled(self) -> bool:
+        return bool(self.reason)
+
+    @property
+    def reason(self) -> str:
+        """Why the token is cancelled ("" if it isn't)."""
+        if self._event.is_set():
+            return self._reason
+        token: Optional[CancelToken] = self
+        now = time.time()
+        while token is not None:
+            if token.deadline is not None and now >= token.deadline:
+                return f"{token.name} deadline exceeded"
+            token = token.parent
+        return ""
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the nearest deadline of the token or its parents (None: no deadline)."""
+        deadlines = []
+        token: Optional[CancelToken] = self
+        while token is not None:
+            if token.deadline is not None:
+                deadlines.append(token.deadline)
+            token = token.parent
+        return max(0.0, min(deadlines) - time.time()) if deadlines else None
+
+    def check(self) -> None:
+        """
+        Raise if the token is cancelled.
+
+        Raises:
+            Cancelled: If the token (or a parent) was cancelled or its deadline passed
+        """
+        reason = self.reason
+        if reason:
+            raise Cancelled(reason, expired=not self._event.is_set())
+
+    def sleep(self, seconds: float) -> None:
+        """
+        Wait, returning early if the token is cancelled.
+
+        Raises:
+            Cancelled: If the token is cancelled before or while waiting
+        """
+        self.check()
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        self._event.wait(seconds)
+        self.check()
@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+from src.event_bus import EventBus
+
+
+class Checkpoint:
+    """Stages of the jobs in flight, so an interrupted run can be resumed.
+
+    While a job runs, the stages it reached (e.g. "uploaded" or
+    "submitted:<preset>" with the asset ID) are written to a JSON file, and
+    its entry is removed once the job is finished (and the file once no
+    entries are left). Entries left by a run that was drained or killed
+    let the next run with the same inputs resume those jobs: recorded base
+    assets aren't uploaded again and recorded optimizations are waited for
+    instead of being submitted again.
+
+    Same interface as LeaseStore for recording stages (record_stage), for a
+    single node.
+    """
+
+    def __init__(self, path: str = "checkpoint.json", events: Optional[EventBus] = None):
+        """
+        Args:
+            path: JSON file the checkpoint is stored in
+            events: Event bus for status messages
+        """
+        self.path = path
+        self.events = events or EventBus()
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def stages(self, key: str) -> Dict[str, str]:
+        """
+        Stages recorded for a job by an interrupted run.
+
+        Args:
+            key: Job key (see ModelProcessor._lease_key)
+
+        Returns:
+            Dict[str, str]: Stage names and details (empty if there is no entry)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry["stages"]) if entry is not None else {}
+
+    def record_stage(self, key: str, stage: str, detail: str = "") -> None:
+        """
+        Record that a job reached a stage.
+
+        Args:
+            key: Job key
+            stage: Stage name, e.g. "uploaded" or "submitted:<preset>"
+            detail: Stage result, e.g. an asset ID
+        """
+        with self._lock:
+            entry = self._entries.setdefault(key, {"stages": {}})
+            entry["stages"][stage] = detail
+            entry["updated"] = time.time()
+            self._save()
+
+    def remove(self, key: str) -> None:
+        """Drop the entry of a finished job."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _save(self) -> None:
+        """Persist the checkpoint atomically (called with the lock held)."""
+        try:
+            if not self._entries:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            tmp_file = self.path + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_file, self.path)
+        except OSError as e:
+            self.events.log(f'Warning: unable to write checkpoint "{self.path}": {e}')
+
+    def _load(self) -> None:
+        """Load the entries left by an interrupted run."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self._entries = {
+                    key: entry for key, entry in json.load(f).items()
+                    if isinstance(entry, dict) and isinstance(entry.get("stages"), dict)
+                }
+        except (IOError, ValueError, TypeError, AttributeError):
+            self.events.log(f'Warning: unable to read checkpoint "{self.path}".')
+            return
+        if not self._entries:
+            self._save()  # e.g. left empty by an earlier version
+        else:
+            self.events.log(
+                f"{len(self._entries)} interrupted job(s) in checkpoint \"{self.path}\" "
+                "are resumed when their inputs are processed again."
+            )
@@ -1,26 +1,254 @@
-from typing import Dict, Optional, Tuple
+import contextlib
+import functools
+import threading
+import urllib.request
+import weakref
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from src.request_utils import RequestUtils
 from src.file_utils import FileUtils
+from src.event_bus import EventBus, StateEvent, TransferEvent
+from src.download_filter import DownloadFilter
+from src.fetch_index import FetchIndex
+from src.output_verifier import OutputVerifier
+from src.token_pool import ApiToken, TokenPool
+from src.adaptive_limiter import AdaptiveLimiter
+from src.admission_controller import AdmissionController
+from src.transfer_manager import TransferManager
+from src.cancellation import Cancelled, CancelToken
+from src.zip_stream import ZipStream
+import os
 import time
 
 
 class RapidPipelineClient:
     """Client for interacting with the RapidPipeline API."""
 
+    MAX_DOWNLOAD_ATTEMPTS = 3
+    POLL_BACKOFF = 1.5  # growth of the interval between status polls of an optimization
+
     def __init__(
-        self, access_token: str, base_url: str = "https://api.rapidpipeline.com/api/v2/"
+        self,
+        access_token: str,
+        base_url: str = "https://api.rapidpipeline.com/api/v2/",
+        events: Optional[EventBus] = None,
+        verify_downloads: bool = True,
+        download_filter: Optional[DownloadFilter] = None,
+        fetch_index: Optional[FetchIndex] = None,
+        token_pool: Optional[TokenPool] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        max_optimizations: int = 0,
+        stage_timeout: float = 0.0,
+        interactive_priority: Optional[int] = None,
+        reserved_optimizations: int = 0,
+        bulk_poll_interval: float = 0.0,
+        poll_interval: float = 1.0,
+        max_poll_interval: float = 5.0,
+        transfers: Optional[TransferManager] = None,
     ):
+        """
+        Args:
+            access_token: API token (used if no token pool is given)
+            base_url: Base URL of the API
+            events: Event bus for status reporting
+            verify_downloads: Whether downloaded results are verified
+            download_filter: Result formats to download (all by default)
+            fetch_index: If given, results skipped by the filter are recorded
+                in it to be fetched later
+            token_pool: Tokens to spread jobs across (see token_lease())
+            limiter: If given, adapts the concurrency of uploads, optimizations
+                and downloads to the API's responses
+            max_optimizations: Optimizations in flight per token, for tokens
+                without their own limit (0: discover the allowance)
+            stage_timeout: Deadline in seconds for each upload, optimization
+                and download (0: none)
+            interactive_priority: Lowest priority of interactive jobs (None:
+                no priority lanes)
+            reserved_optimizations: Optimization slots per token kept for
+                interactive jobs
+            bulk_poll_interval: Seconds between the first status polls of
+                the optimizations of bulk jobs (see lane())
+            poll_interval: Seconds between the first status polls of an
+                optimization; the interval grows by POLL_BACKOFF per poll
+            max_poll_interval: Longest interval between status polls
+            transfers: Shapes and counts uploads and downloads (defaults to
+                no bandwidth caps)
+        """
         self.access_token = access_token
         self.base_url = base_url
-        self.request_utils = RequestUtils()
-        self.file_utils = FileUtils()
+        self.events = events or EventBus()
+        self.request_utils = RequestUtils(self.events)
+        self.transfers = transfers or TransferManager(events=self.events)
+        self.file_utils = FileUtils(self.events, self.request_utils, transfers=self.transfers)
+        self.verifier = OutputVerifier() if verify_downloads else None
+        self.download_filter = download_filter or DownloadFilter()
+        self.fetch_index = fetch_index
+        self.tokens = token_pool or TokenPool([ApiToken("default", access_token)])
+        self.request_utils.on_rate_limit = self._on_rate_limit
+        self.admission = AdmissionController(
+            {token.name: token.max_optimizations for token in self.tokens.tokens},
+            max_optimizations,
+            self.events,
+            interactive_priority,
+            reserved_optimizations,
+        )
+        self.limiter = limiter
+        self.stage_timeout = stage_timeout
+        self.bulk_poll_interval = bulk_poll_interval
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.hedges = {"submitted": 0, "won": 0}  # duplicates of straggling optimizations
+        self.draining = ""  # reason once drain() was called
+        self._hedge_lock = threading.Lock()
+        self._stage_tokens: "weakref.WeakSet[CancelToken]" = weakref.WeakSet()
+        self._drain_lock = threading.Lock()
+        if limiter is not None:
+            self.request_utils.on_request_end = limiter.record
+        self._local = threading.local()  # API and cancel token and lane of the current thread
+
+    def close(self) -> None:
+        """Wait for pending verifications, stop the verifier threads and finish the output sink."""
+        if self.verifier is not None:
+            self.verifier.close()
+        self.file_utils.sink.close()
+
+    @contextlib.contextmanager
+    def token_lease(self) -> Iterator[ApiToken]:
+        """Use a token of the pool for all requests of the current thread (i.e. a job)."""
+        token = self.tokens.acquire(self.cancel_token)
+        previous = getattr(self._local, "token", None)
+        self._local.token = token
+        try:
+            yield token
+        finally:
+            self._local.token = previous
+            self.tokens.release(token)
+
+    @contextlib.contextmanager
+    def use_token(self, name: str) -> Iterator[None]:
+        """Use a named token of the pool for the requests of the current thread.
+
+        Unknown names (e.g. of a token removed from the credentials) fall
+        back to the first token.
+        """
+        previous = getattr(self._local, "token", None)
+        self._local.token = self.tokens.get(name)
+        try:
+            yield
+        finally:
+            self._local.token = previous
+
+    @property
+    def current_token(self) -> str:
+        """Name of the token the current thread uses."""
+        token = getattr(self._local, "token", None) or self.tokens.tokens[0]
+        return token.name
+
+    @contextlib.contextmanager
+    def cancellation(self, cancel_token: CancelToken) -> Iterator[None]:
+        """Stop the requests of the current thread (i.e. a job) when a token is cancelled.
+
+        Waiting and polling raise Cancelled once the token is cancelled or its
+        deadline has passed.
+        """
+        previous = getattr(self._local, "cancel", None)
+        self._local.cancel = cancel_token
+        try:
+            yield
+        finally:
+            self._local.cancel = previous
+
+    @contextlib.contextmanager
+    def lane(self, priority: int, bulk: bool = False) -> Iterator[None]:
+        """Run the requests of the current thread (i.e. a job) in a priority lane.
+
+        Uploads, optimizations and downloads wait for limiter slots and
+        bandwidth (see TransferManager) by priority, and optimizations of
+        bulk jobs are polled at least bulk_poll_interval seconds apart,
+        leaving the API to interactive jobs.
+        """
+        previous = getattr(self._local, "lane", None)
+        self._local.lane = (priority, bulk)
+        try:
+            yield
+        finally:
+            self._local.lane = previous
+
+    def _lane(self) -> Tuple[int, bool]:
+        """Priority and bulk flag of the current thread's lane."""
+        return getattr(self._local, "lane", None) or (0, False)
+
+    @property
+    def cancel_token(self) -> Optional[CancelToken]:
+        """Cancel token of the current thread (None outside of jobs)."""
+        return getattr(self._local, "cancel", None)
+
+    def _check_cancelled(self) -> None:
+        """Raise Cancelled if the current thread's job was cancelled."""
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+
+    def _sleep(self, seconds: float) -> None:
+        """Sleep, returning early (raising Cancelled) if the current job is cancelled."""
+        if self.cancel_token is None:
+            time.sleep(seconds)
+        else:
+            self.cancel_token.sleep(seconds)
+
+    def drain(self, reason: str = "shutdown") -> None:
+        """
+        Stop the uploads and optimizations of all jobs, letting downloads run on.
+
+        Uploads and optimizations in progress raise Cancelled(reason) at their
+        next check, and no new ones are started. Optimizations are only no
+        longer polled; they keep running on the server.
+
+        Args:
+            reason: Reason given to the stopped jobs
+        """
+        with self._drain_lock:
+            self.draining = reason
+            tokens = [token for token in self._stage_tokens if token.name != "download"]
+        for token in tokens:
+            token.cancel(reason)
+
+    @contextlib.contextmanager
+    def _stage(self, stage: str, priority: Optional[int] = None) -> Iterator[None]:
+        """
+        Run a stage under its deadline and in a slot of the adaptive limiter (if any).
+
+        Args:
+            stage: "upload", "optimize" or "download"
+            priority: For optimizations: wait for an admission slot of the
+                current token first (see AdmissionController)
+        """
+        parent = self.cancel_token
+        cancel_token = parent
+        if parent is not None:
+            cancel_token = parent.child(stage, self.stage_timeout or None)
+            with self._drain_lock:
+                if self.draining and stage != "download":
+                    raise Cancelled(self.draining)
+                self._stage_tokens.add(cancel_token)
+        self._local.cancel = cancel_token
+        try:
+            with contextlib.ExitStack() as stack:
+                if priority is not None:
+                    stack.enter_context(
+                        self.admission.slot(self.current_token, priority, cancel_token)
+                    )
+                if self.limiter is not None:
+                    stack.enter_context(self.limiter.slot(stage, cancel_token, self._lane()[0]))
+                yield
+        finally:
+            self._local.cancel = parent
 
     def get_upload_urls(self, file_ext: str, model_label: str) -> Optional[Dict]:
         """Get presigned URLs for uploading model files."""
         headers = self._get_auth_headers()
         payload = {"filenames": [f"rapid{file_ext}"], "model_name": model_label}
 
-        print(f"Starting Upload for model: {model_label} ...")
+        self.events.log(f"Starting Upload for model: {model_label} ...")
         response = self.request_utils.post_json(
             f"{self.base_url}rawmodel/api-upload/start",
             headers=headers,
@@ -28,63 +256,245 @@ class RapidPipelineClient:
         )
         return response
 
-    def upload_model(self, model_file: str, file_ext: str, upload_urls: Dict) -> bool:
-        """Upload a model file and finalize the upload."""
+    def upload_model(
+        self,
+        model_file: str,
+        file_ext: str,
+        upload_urls: Dict,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> bool:
+        """Upload a model file and finalize the upload.
+
+        The file is streamed from disk. A directory is uploaded as one asset
+        by streaming a ZIP archive of it (file_ext must be ".zip").
+
+        If a timings dictionary is given, the durations of the "upload" and
+        "analysis" stages are stored in it.
+        """
+        with self._stage("upload"):
+            return self._upload_model(model_file, file_ext, upload_urls, timings)
+
+    def _upload_model(
+        self,
+        model_file: str,
+        file_ext: str,
+        upload_urls: Dict,
+        timings: Optional[Dict[str, float]],
+    ) -> bool:
+        """Stream a model file (or directory) to storage and wait for its analysis."""
         try:
-            with open(model_file, "rb") as data_model:
-                url_model = upload_urls["links"]["s3_upload_urls"]["rapid" + file_ext]
-                model_id = upload_urls["id"]
+            if os.path.isdir(model_file):
+                data_model = ZipStream(model_file)
+                size = data_model.size
+            else:
+                data_model = open(model_file, "rb")
+                size = os.fstat(data_model.fileno()).st_size
+        except (IOError, OSError):
+            self.events.log(f'Error: cannot open model file "{model_file}"', "error")
+            return False
+
+        with data_model, self.transfers.stream(data_model, "upload", self._lane()[0]) as body:
+            url_model = upload_urls["links"]["s3_upload_urls"]["rapid" + file_ext]
+            model_id = upload_urls["id"]
+            job = f"rawmodel/{model_id}"
 
-                print("Uploading model file ...")
-                if not self.request_utils.put_binary(url_model, data_model.read()):
-                    return False
+            self.events.log("Uploading model file ...")
+            self.events.emit(
+                StateEvent(job, "uploading", label=os.path.basename(model_file))
+            )
+            start_time = time.perf_counter()
+            if not self.request_utils.put_stream(url_model, body, size):
+                self.events.emit(StateEvent(job, "failed"))
+                return False
+            upload_time = time.perf_counter() - start_time
+            self.events.emit(
+                TransferEvent("upload", model_file, size, upload_time, job)
+            )
 
-                return self._finalize_upload(model_id)
-        except IOError:
-            print(f'Error: cannot open model file "{model_file}"')
+        start_time = time.perf_counter()
+        if not self._finalize_upload(model_id):
             return False
+        if timings is not None:
+            timings["upload"] = upload_time
+            timings["analysis"] = time.perf_counter() - start_time
+        return True
 
-    def optimize_model(self, model_id: int, output_prefix: str, preset: Dict) -> int:
-        """Submit and monitor an optimization job."""
+    def optimize_model(
+        self,
+        model_id: int,
+        output_prefix: str,
+        preset: Dict,
+        timings: Optional[Dict[str, float]] = None,
+        download_filter: Optional[DownloadFilter] = None,
+        priority: int = 0,
+        hedge_after: Optional[float] = None,
+        submitted: Optional[int] = None,
+        on_submitted: Optional[Callable[[int], None]] = None,
+    ) -> int:
+        """Submit and monitor an optimization job.
+
+        The job is only submitted once the admission controller has a free
+        optimization slot for the current token (by priority), and holds it
+        until the optimization is done or failed.
+
+        If submitted is given (the ID of an optimization started by an
+        interrupted run), that optimization is waited for instead of
+        submitting the preset again. Otherwise on_submitted is called with
+        the ID of the new optimization as soon as it was submitted.
+
+        If hedge_after is given and the optimization is still running after
+        that many seconds, the preset is submitted once more on the same base
+        asset (if the token has a free slot). The first to complete is kept,
+        the other one is deleted.
+
+        If a timings dictionary is given, the durations of the "optimization"
+        and "download" stages are stored in it. Only the result formats
+        accepted by download_filter (default: the client's filter) are
+        downloaded.
+        """
         headers = self._get_auth_headers()
+        label = os.path.basename(output_prefix)
 
-        # Submit optimization job
-        response = self.request_utils.post_json(
-            f"{self.base_url}rawmodel/optimize/{model_id}",
-            headers=headers,
-            payload=preset,
-        )
+        with self._stage("optimize", priority):
+            start_time = time.perf_counter()  # not counting the wait for admission
 
-        if not response:
+            if submitted is not None:
+                rapid_model_id = submitted
+                self.events.log(f"Resuming optimization of rapidmodel {rapid_model_id}")
+            else:
+                # Submit optimization job
+                response = self.request_utils.post_json(
+                    f"{self.base_url}rawmodel/optimize/{model_id}",
+                    headers=headers,
+                    payload=preset,
+                )
+
+                if not response:
+                    return -1
+
+                rapid_model_id = response["id"]
+                if on_submitted is not None:
+                    on_submitted(rapid_model_id)
+            hedge_slots: List = []
+            resubmit = None
+            if hedge_after is not None:
+                resubmit = functools.partial(
+                    self._submit_hedge, model_id, preset, headers, hedge_slots
+                )
+            try:
+                rapid_model_id, response = self._wait_for_optimization(
+                    rapid_model_id, label, hedge_after, resubmit
+                )
+            finally:
+                for hedge_slot in hedge_slots:
+                    self.admission.release(hedge_slot)
+        if response is None:
             return -1
 
-        rapid_model_id = response["id"]
-        return self._wait_for_optimization(rapid_model_id, output_prefix)
+        optimization_time = time.perf_counter() - start_time
+        job = f"rapidmodel/{rapid_model_id}"
+        self.events.emit(StateEvent(job, "downloading", label=label))
+        download_start = time.perf_counter()
+        try:
+            with self._stage("download"):
+                intact = self._handle_optimization_complete(
+                    response, output_prefix, job, download_filter, rapid_model_id
+                )
+        except Cancelled as e:
+            self.events.emit(StateEvent(job, "cancelled", detail=e.reason))
+            e.rapid_model_ids.append(rapid_model_id)
+            raise
+        if not intact:
+            self.events.log(
+                f"Error: Results of rapidmodel {rapid_model_id} could not be "
+                "downloaded intact; the model was kept in cloud storage.",
+                "error",
+            )
+            self.events.emit(StateEvent(job, "failed", detail="download"))
+            return -1
+        self.events.emit(StateEvent(job, "done"))
+        if timings is not None:
+            timings["optimization"] = optimization_time
+            timings["download"] = time.perf_counter() - download_start
+        return rapid_model_id
+
+    def share_results(
+        self,
+        rapid_model_id: int,
+        output_prefix: str,
+        source_prefix: str,
+        owner: str,
+        download_filter: Optional[DownloadFilter] = None,
+    ) -> bool:
+        """Write the results of another job's optimization under output_prefix.
+
+        Results the other job wrote to a local output sink (under
+        source_prefix) are copied, the others are downloaded.
+
+        Args:
+            rapid_model_id: ID of the finished optimization
+            output_prefix: Output prefix of the current job
+            source_prefix: Output prefix the results were downloaded to
+            owner: Name of the API token the optimization belongs to
+            download_filter: Result formats to write (default: the client's filter)
+
+        Returns:
+            bool: True if all wanted results were written intact
+        """
+        label = os.path.basename(output_prefix)
+        job = f"rapidmodel/{rapid_model_id}:{label}"
+        with self.use_token(owner):
+            # Fresh download URLs, as the leader's may have expired
+            response = self.request_utils.get_json(
+                f"{self.base_url}rapidmodel/{rapid_model_id}",
+                headers=self._get_auth_headers(),
+            )
+            if not response or response["data"]["optimization_status"] != "done":
+                return False
+            self.events.emit(StateEvent(job, "downloading", label=label))
+            try:
+                with self._stage("download"):
+                    intact = self._handle_optimization_complete(
+                        response, output_prefix, job, download_filter, rapid_model_id,
+                        source_prefix,
+                    )
+            except Cancelled as e:
+                self.events.emit(StateEvent(job, "cancelled", detail=e.reason))
+                raise
+        self.events.emit(StateEvent(job, "done" if intact else "failed"))
+        return intact
 
     def delete_base_asset(self, asset_id: int) -> bool:
         """Delete a base asset from cloud storage."""
-        print("Deleting base asset from cloud storage ...")
+        self.events.log("Deleting base asset from cloud storage ...")
         return self.request_utils.delete(
             f"{self.base_url}rawmodel/{asset_id}", headers=self._get_auth_headers()
         )
 
     def delete_rapid_model(self, model_id: int) -> bool:
         """Delete an optimized model from cloud storage."""
-        print("Deleting optimized model from cloud storage ...")
+        self.events.log("Deleting optimized model from cloud storage ...")
         return self.request_utils.delete(
             f"{self.base_url}rapidmodel/{model_id}", headers=self._get_auth_headers()
         )
 
     def _get_auth_headers(self) -> Dict[str, str]:
-        """Get headers with authentication token."""
+        """Get headers with the authentication token of the current thread."""
+        token = getattr(self._local, "token", None) or self.tokens.tokens[0]
         return {
-            "Authorization": f"Bearer {self.access_token}",
+            "Authorization": f"Bearer {token.secret}",
             "Content-Type": "application/json",
         }
 
+    def _on_rate_limit(self, request: urllib.request.Request) -> None:
+        """Attribute a 429 response to the token of the request."""
+        authorization = request.get_header("Authorization") or ""
+        if authorization.startswith("Bearer "):
+            self.tokens.record_rate_limit(authorization[len("Bearer "):])
+
     def _finalize_upload(self, model_id: str) -> bool:
         """Finalize the model upload and wait for processing."""
-        print("Finalizing Upload ...")
+        self.events.log("Finalizing Upload ...")
         response = self.request_utils.get_json(
             f"{self.base_url}rawmodel/{model_id}/api-upload/complete",
             headers=self._get_auth_headers(),
@@ -93,25 +503,32 @@ class RapidPipelineClient:
         if not response:
             return False
 
-        print("Waiting for model to finish analysing ...")
+        self.events.log("Waiting for model to finish analysing ...")
         return self._wait_for_processing(model_id)
 
     def _wait_for_processing(self, model_id: str) -> bool:
         """Wait for initial model processing to complete."""
         start_time = time.time()
+        job = f"rawmodel/{model_id}"
+        last_status = None
         while True:
             response = self.request_utils.get_json(
                 f"{self.base_url}rawmodel/{model_id}", headers=self._get_auth_headers()
             )
 
             if not response:
+                self.events.emit(StateEvent(job, "failed"))
                 return False
 
             status = response["data"]["upload_status"]
+            if status != last_status:
+                self.events.emit(StateEvent(job, status))
+                last_status = status
             if status == "complete":
                 return True
             elif status not in ["waiting", "unzipping", "analysing"]:
-                print(f"Unexpected status: {status}")
+                self.events.log(f"Unexpected status: {status}", "error")
+                self.events.emit(StateEvent(job, "failed", detail=status))
                 return False
 
             elapsed_time = int(time.time() - start_time)
@@ -119,45 +536,260 @@ class RapidPipelineClient:
                 minutes = elapsed_time // 60
                 seconds = elapsed_time % 60
                 time_str = f"{minutes}m {seconds}s" if minutes > 0 else f"{seconds}s"
-                print(f"Waiting for processing... ({time_str}) Status: {status}")
+                self.events.log(f"Waiting for processing... ({time_str}) Status: {status}")
 
-            time.sleep(1)
+            try:
+                self._sleep(1)
+            except Cancelled as e:
+                self.events.emit(StateEvent(job, "cancelled", detail=e.reason))
+                raise
 
-    def _wait_for_optimization(self, rapid_model_id: int, output_prefix: str) -> int:
-        """Wait for optimization to complete and download results."""
-        print(f"Waiting for optimization to complete for rapidmodel {rapid_model_id}")
+    def _wait_for_optimization(
+        self,
+        rapid_model_id: int,
+        label: str = "",
+        hedge_after: Optional[float] = None,
+        resubmit: Optional[Callable[[], Optional[int]]] = None,
+    ) -> Tuple[int, Optional[Dict]]:
+        """Wait for an optimization to complete, hedging it if it straggles.
 
-        while True:
-            response = self.request_utils.get_json(
-                f"{self.base_url}rapidmodel/{rapid_model_id}",
-                headers=self._get_auth_headers(),
+        If resubmit is given and the optimization hasn't completed after
+        hedge_after seconds, resubmit() submits a duplicate. Both are polled
+        from then on; the first to complete wins and the other is deleted.
+
+        Returns:
+            Tuple[int, Optional[Dict]]: ID of the completed optimization and its
+            final status response (None if the optimization failed)
+        """
+        self.events.log(f"Waiting for optimization to complete for rapidmodel {rapid_model_id}")
+
+        start_time = time.perf_counter()
+        running = [rapid_model_id]
+        last_status: Dict[int, str] = {}
+        interval, max_interval = self._poll_intervals()
+        polled = False
+        while running:
+            try:
+                if polled:
+                    self._sleep(interval)
+                    interval = min(interval * self.POLL_BACKOFF, max_interval)
+                polled = True
+                self._check_cancelled()
+            except Cancelled as e:
+                for candidate in running:
+                    self.events.emit(
+                        StateEvent(f"rapidmodel/{candidate}", "cancelled", detail=e.reason)
+                    )
+                e.rapid_model_ids.extend(running)
+                raise
+            for candidate in list(running):
+                response = self._poll_optimization(candidate, label, last_status)
+                if response is None:
+                    running.remove(candidate)
+                elif response["data"]["optimization_status"] == "done":
+                    for loser in running:
+                        if loser != candidate:
+                            self._cancel_optimization(loser, candidate)
+                    if candidate != rapid_model_id:
+                        self._count_hedge("won")
+                    return candidate, response
+            if (
+                resubmit is not None
+                and running
+                and time.perf_counter() - start_time >= hedge_after
+            ):
+                duplicate = resubmit()
+                resubmit = None
+                if duplicate is not None:
+                    running.append(duplicate)
+        return rapid_model_id, None
+
+    def _poll_intervals(self) -> Tuple[float, float]:
+        """First and longest interval between status polls in the current thread's lane."""
+        first = self.poll_interval
+        if self._lane()[1]:
+            first = max(first, self.bulk_poll_interval)
+        return first, max(first, self.max_poll_interval)
+
+    def _poll_optimization(
+        self, rapid_model_id: int, label: str, last_status: Dict[int, str]
+    ) -> Optional[Dict]:
+        """Poll the status of an optimization once.
+
+        Returns:
+            Optional[Dict]: The status response, None if the optimization failed
+        """
+        job = f"rapidmodel/{rapid_model_id}"
+        response = self.request_utils.get_json(
+            f"{self.base_url}rapidmodel/{rapid_model_id}",
+            headers=self._get_auth_headers(),
+        )
+
+        if not response:
+            self.events.emit(StateEvent(job, "failed"))
+            return None
+
+        status = response["data"]["optimization_status"]
+        if status != last_status.get(rapid_model_id) and status != "done":
+            self.events.emit(StateEvent(job, status, label=label))
+            last_status[rapid_model_id] = status
+        if status == "done":
+            return response
+        elif status != "sent_to_queue":
+            self.events.log(
+                f"Error: Unexpected status code from optimization run ({status}).",
+                "error",
             )
+            self.events.emit(StateEvent(job, "failed", detail=status))
+            return None
 
-            if not response:
-                return -1
-
-            status = response["data"]["optimization_status"]
-            if status == "done":
-                self._handle_optimization_complete(response, output_prefix)
-                return rapid_model_id
-            elif status != "sent_to_queue":
-                print(
-                    f"Error: Unexpected status code from optimization run ({status})."
+        self.admission.observe(bool(response["data"].get("progress")))
+        self._update_optimization_progress(rapid_model_id, response["data"])
+        return response
+
+    def _submit_hedge(
+        self, model_id: int, preset: Dict, headers: Dict[str, str], hedge_slots: List
+    ) -> Optional[int]:
+        """Submit a duplicate of a straggling optimization.
+
+        Args:
+            model_id: Base asset ID
+            preset: Preset payload of the straggler
+            headers: Headers the straggler was submitted with
+            hedge_slots: Admission slots of hedges (the new one is appended)
+
+        Returns:
+            Optional[int]: ID of the duplicate, None if it wasn't submitted
+        """
+        hedge_slot = self.admission.try_acquire(self.current_token)
+        if hedge_slot is None:
+            self.events.log("Optimization is straggling, but no slot is free for a duplicate.")
+            return None
+        response = self.request_utils.post_json(
+            f"{self.base_url}rawmodel/optimize/{model_id}",
+            headers=headers,
+            payload=preset,
+        )
+        if not response:
+            self.admission.release(hedge_slot)
+            return None
+        hedge_slots.append(hedge_slot)
+        self._count_hedge("submitted")
+        self.events.log(
+            f"Optimization is straggling, submitted a duplicate (rapidmodel {response['id']})."
+        )
+        return response["id"]
+
+    def _cancel_optimization(self, rapid_model_id: int, winner: int) -> None:
+        """Delete the optimization that lost a hedged race."""
+        self.events.log(f"Rapidmodel {winner} finished first, cancelling rapidmodel {rapid_model_id}.")
+        self.events.emit(StateEvent(f"rapidmodel/{rapid_model_id}", "cancelled", detail="hedged"))
+        if not self.delete_rapid_model(rapid_model_id):
+            self.events.log(
+                f"Warning: unable to delete rapidmodel {rapid_model_id}.", "error"
+            )
+
+    def _count_hedge(self, outcome: str) -> None:
+        with self._hedge_lock:
+            self.hedges[outcome] += 1
+
+    def download_files(self, files: List[Tuple[str, str]], job: str = "") -> List[str]:
+        """Download files, verifying each one while the next is downloading.
+
+        Files that fail to download or verify are downloaded again, up to
+        MAX_DOWNLOAD_ATTEMPTS times in total.
+
+        Args:
+            files: (URL, output path) per file
+            job: Identifier of the job the downloads belong to
+
+        Returns:
+            List[str]: Output paths of the files that couldn't be downloaded intact
+        """
+        checks = [
+            (url, output_path, self._download_and_verify(url, output_path, job))
+            for url, output_path in files
+        ]
+
+        damaged = []
+        for url, output_path, check in checks:
+            problems = check.result()
+            attempt = 1
+            while problems and attempt < self.MAX_DOWNLOAD_ATTEMPTS:
+                attempt += 1
+                self.events.log(
+                    f'Warning: "{output_path}" is damaged ({"; ".join(problems)}), '
+                    f"downloading again (attempt {attempt}/{self.MAX_DOWNLOAD_ATTEMPTS}) ..."
                 )
-                return -1
+                problems = self._download_and_verify(url, output_path, job).result()
+            if problems:
+                self.events.log(
+                    f'Error: "{output_path}" is damaged: {"; ".join(problems)}', "error"
+                )
+                damaged.append(output_path)
+        return damaged
+
+    def _handle_optimization_complete(
+        self,
+        response: Dict,
+        output_prefix: str,
+        job: str = "",
+        download_filter: Optional[DownloadFilter] = None,
+        rapid_model_id: int = -1,
+        source_prefix: str = "",
+    ) -> bool:
+        """Download the wanted results, recording skipped ones in the fetch index.
 
-            self._update_optimization_progress(response["data"])
+        With a source_prefix, results already written there (by another job
+        sharing the optimization) are copied instead of downloaded.
 
-    def _handle_optimization_complete(self, response: Dict, output_prefix: str) -> None:
-        """Handle successful optimization completion."""
+        Returns:
+            bool: True if all wanted results were downloaded intact
+        """
+        download_filter = download_filter or self.download_filter
         download_urls = response["data"]["downloads"]["all"]
+        files = []
         for file_type, url in download_urls.items():
             output_path = self.file_utils.get_output_path(url, output_prefix)
-            self.file_utils.download_file(url, output_path)
+            if download_filter.wants(file_type, url):
+                source_path = self.file_utils.get_output_path(url, source_prefix)
+                if source_prefix and self.file_utils.copy_file(source_path, output_path, job):
+                    continue
+                files.append((url, output_path))
+            elif self.fetch_index is not None:
+                self.events.log(f"Deferring download of {file_type} result: {output_path}")
+                self.fetch_index.add(
+                    url, output_path, file_type, rapid_model_id, self.current_token
+                )
+            else:
+                self.events.log(f"Skipping download of {file_type} result.")
+        return not self.download_files(files, job)
+
+    def _download_and_verify(self, url: str, output_path: str, job: str) -> "Future[List[str]]":
+        """Download a file and queue its verification (local output sinks only).
+
+        Returns:
+            Future[List[str]]: Resolves to the problems found (empty if intact)
+
+        Raises:
+            Cancelled: If the current job was cancelled
+        """
+        self._check_cancelled()
+        if not self.file_utils.download_file(
+            url, output_path, job, priority=self._lane()[0], cancel_token=self.cancel_token
+        ):
+            problems = ["download failed"]
+        elif self.verifier is not None and self.file_utils.sink.local:
+            return self.verifier.submit(output_path)
+        else:
+            problems = []
+        result: "Future[List[str]]" = Future()
+        result.set_result(problems)
+        return result
 
-    def _update_optimization_progress(self, data: Dict) -> None:
+    def _update_optimization_progress(self, rapid_model_id: int, data: Dict) -> None:
         """Update optimization progress display."""
         if "progress" in data:
             progress = data["progress"]
             step = data.get("processing_step", "")
-            self.file_utils.display_progress(progress, step)
+            self.file_utils.display_progress(progress, step, f"rapidmodel/{rapid_model_id}")
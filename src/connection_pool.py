@@ -0,0 +1,231 @@
+import http.client
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+
+class PooledResponse:
+    """HTTP response that hands its connection back to the pool once fully read."""
+
+    def __init__(
+        self,
+        response: http.client.HTTPResponse,
+        connection: http.client.HTTPConnection,
+        pool: "ConnectionPool",
+        key: Tuple[str, str, int],
+    ):
+        self._response = response
+        self._connection: Optional[http.client.HTTPConnection] = connection
+        self._pool = pool
+        self._key = key
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        data = self._response.read(amt)
+        if not data or self._response.isclosed():
+            self._release()
+        return data
+
+    def getheader(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self._response.getheader(name, default)
+
+    def close(self) -> None:
+        if self._connection is not None and not self._response.isclosed():
+            # Unread data left: the connection can't be reused
+            self._connection.close()
+            self._connection = None
+        self._response.close()
+        self._release()
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _release(self) -> None:
+        if self._connection is not None:
+            self._pool.release(self._key, self._connection, self._response)
+            self._connection = None
+
+
+class ConnectionPool:
+    """Thread-safe pool of persistent HTTP(S) connections per host.
+
+    Keeping connections open avoids a TCP and TLS handshake for every API
+    call and every presigned transfer.
+    """
+
+    MAX_REDIRECTS = 5
+    BLOCK_SIZE = 256 * 1024  # chunk size for streamed request bodies
+    REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+    def __init__(self, max_idle_per_host: int = 8, timeout: float = 300):
+        """
+        Args:
+            max_idle_per_host: Maximum number of idle connections kept per host
+            timeout: Socket timeout in seconds
+        """
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def urlopen(self, request: urllib.request.Request) -> Tuple[PooledResponse, bool]:
+        """
+        Send a request on a pooled connection.
+
+        Mirrors urllib.request.urlopen: redirects are followed, HTTP errors
+        raise HTTPError and connection problems raise URLError.
+
+        Args:
+            request: The prepared request
+
+        Returns:
+            Tuple[PooledResponse, bool]: The response and whether an already
+            open connection was reused
+        """
+        for _ in range(self.MAX_REDIRECTS):
+            response, reused = self._send(request)
+            location = response.getheader("Location")
+            if response.status not in self.REDIRECT_CODES or not location:
+                return response, reused
+            response.read()
+            request = self._redirect(request, response.status, response.headers, location)
+        raise urllib.error.URLError(f"too many redirects for {request.full_url}")
+
+    @staticmethod
+    def _redirect(
+        request: urllib.request.Request, status: int, headers, location: str
+    ) -> urllib.request.Request:
+        """
+        Build the request following a redirect, as urllib's HTTPRedirectHandler does.
+
+        307/308 repeat the request with its body (rewound with seek(0)),
+        301-303 continue with a body-less GET (or HEAD). Authorization isn't
+        passed on to another host.
+
+        Raises:
+            HTTPError: If a 307/308 redirect would have to resend a body that
+                can't be rewound
+        """
+        url = urllib.parse.urljoin(request.full_url, location)
+        dropped = set()
+        if urllib.parse.urlsplit(url).netloc.lower() != (request.host or "").lower():
+            dropped |= {"authorization", "host"}
+        method = request.get_method()
+        body = request.data
+        if status in (307, 308):
+            if body is not None and not isinstance(body, (bytes, bytearray)):
+                if not hasattr(body, "seek"):
+                    raise urllib.error.HTTPError(
+                        request.full_url, status, "can't resend the request body to follow "
+                        "the redirect", headers, None,
+                    )
+                body.seek(0)
+        else:
+            method = "HEAD" if method == "HEAD" else "GET"
+            body = None
+            dropped |= {"content-length", "content-type"}
+        kept = {
+            name: value for name, value in request.header_items() if name.lower() not in dropped
+        }
+        return urllib.request.Request(url, data=body, headers=kept, method=method)
+
+    def _send(self, request: urllib.request.Request) -> Tuple[PooledResponse, bool]:
+        """Send a single request without following redirects."""
+        parts = urllib.parse.urlsplit(request.full_url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        headers = dict(request.header_items())
+        headers.setdefault("Host", parts.netloc)
+        headers.setdefault("User-Agent", "Python-urllib")
+        body = request.data
+        if body is not None and "Content-length" not in headers and "Content-Length" not in headers:
+            if isinstance(body, bytes):
+                headers["Content-Length"] = str(len(body))
+
+        connection, reused = self._acquire(key)
+        try:
+            connection.request(request.get_method(), path, body=body, headers=headers)
+            response = connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+            connection.close()
+            if not reused or not _is_replayable(body):
+                raise urllib.error.URLError(e)
+            # The server closed the idle keep-alive connection: retry on a new one
+            if hasattr(body, "seek"):
+                body.seek(0)
+            connection, reused = self._new_connection(key), False
+            try:
+                connection.request(request.get_method(), path, body=body, headers=headers)
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise urllib.error.URLError(e)
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise urllib.error.URLError(e)
+
+        pooled = PooledResponse(response, connection, self, key)
+        if response.status >= 400:
+            raise urllib.error.HTTPError(
+                request.full_url, response.status, response.reason, response.headers, pooled
+            )
+        return pooled, reused
+
+    def release(
+        self,
+        key: Tuple[str, str, int],
+        connection: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+    ) -> None:
+        """Return a connection whose response was fully read to the pool."""
+        if response.will_close or connection.sock is None:
+            connection.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _acquire(self, key: Tuple[str, str, int]) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._new_connection(key), False
+
+    def _new_connection(self, key: Tuple[str, str, int]) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(
+                host, port, timeout=self.timeout, blocksize=self.BLOCK_SIZE
+            )
+        return http.client.HTTPConnection(
+            host, port, timeout=self.timeout, blocksize=self.BLOCK_SIZE
+        )
+
+
+def _is_replayable(body) -> bool:
+    """Whether a request body can be sent a second time."""
+    return body is None or isinstance(body, (bytes, bytearray)) or hasattr(body, "seek")
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+from src.event_bus import EventBus
+
+
+class ContentHasher:
+    """Hashes input files in parallel, reusing digests of unchanged files.
+
+    Files are memory-mapped and fed to hashlib in large slices; hashlib
+    releases the GIL while hashing, so a thread pool hashes several files
+    at disk speed. Digests are cached by path together with the file's
+    (inode, size, mtime_ns) and reused as long as these are unchanged.
+
+    Files of sample_threshold bytes and more can get a sampled fingerprint
+    instead: a hash of the size and evenly spaced blocks of the file. It is
+    much cheaper but only detects changes in the sampled blocks, so these
+    digests are marked with a "sampled-" prefix. They are good enough to
+    notice that a file was rewritten, but not to identify its content (see
+    is_exact()).
+
+    Directories (multi-file assets) are hashed from the relative names and
+    digests of the files they contain; their digest is sampled if any of
+    these is.
+    """
+
+    SLICE_SIZE = 8 * 1024 * 1024
+    SAMPLE_BLOCKS = 64
+    SAMPLE_BLOCK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        cache_path: str = "hash_cache.json",
+        workers: int = 4,
+        algorithm: str = "sha256",
+        sample_threshold: int = 0,
+        events: Optional[EventBus] = None,
+    ):
+        """
+        Args:
+            cache_path: JSON file the digests are cached in ("" to disable)
+            workers: Number of files hashed concurrently
+            algorithm: hashlib algorithm name
+            sample_threshold: Size in bytes from which files get a sampled
+                fingerprint (0 to always hash the full content)
+            events: Event bus for warnings
+        """
+        hashlib.new(algorithm)  # raises ValueError if unsupported
+        self.cache_path = cache_path
+        self.workers = max(1, workers)
+        self.algorithm = algorithm
+        self.sample_threshold = sample_threshold
+        self.events = events or EventBus()
+        # path -> [inode, size, mtime_ns, digest]
+        self._cache: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def hash_files(self, paths: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Hash files (or directories) in parallel.
+
+        Args:
+            paths: Paths to hash
+
+        Returns:
+            Dict[str, Optional[str]]: Digest per path, None if it couldn't be read
+        """
+        paths = list(paths)
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="hasher") as pool:
+            digests = dict(zip(paths, pool.map(self.hash_path, paths)))
+        self.save()
+        return digests
+
+    def hash_path(self, path: str) -> Optional[str]:
+        """
+        Hash a file or directory, using the cache if possible.
+
+        Args:
+            path: File or directory path
+
+        Returns:
+            Optional[str]: "<algorithm>:<hex digest>", or None if it couldn't be read
+        """
+        try:
+            if os.path.isdir(path):
+                return self._hash_directory(path)
+            return self._hash_file(path)
+        except OSError as e:
+            self.events.log(f'Warning: unable to hash "{path}": {e}')
+            return None
+
+    def save(self) -> None:
+        """Persist the digest cache atomically."""
+        with self._lock:
+            if not self._dirty or not self.cache_path:
+                return
+            data = dict(self._cache)
+            self._dirty = False
+        try:
+            tmp_file = self.cache_path + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_path)
+        except OSError as e:
+            self.events.log(f'Warning: unable to write hash cache "{self.cache_path}": {e}')
+
+    def _hash_file(self, path: str) -> str:
+        """Hash a single file, using the cache if it is unchanged."""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        signature = [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None and cached[:3] == signature:
+            return cached[3]
+
+        if self.sample_threshold and stat.st_size >= self.sample_threshold:
+            digest = "sampled-" + self._sampled_digest(path, stat.st_size)
+        else:
+            digest = self._full_digest(path, stat.st_size)
+        with self._lock:
+            self._cache[key] = signature + [digest]
+            self._dirty = True
+        return digest
+
+    def _full_digest(self, path: str, size: int) -> str:
+        """Hash the whole file through a memory map."""
+        hasher = hashlib.new(self.algorithm)
+        with open(path, "rb") as f:
+            if size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for offset in range(0, len(view), self.SLICE_SIZE):
+                            hasher.update(view[offset:offset + self.SLICE_SIZE])
+                    finally:
+                        view.release()
+        return f"{self.algorithm}:{hasher.hexdigest()}"
+
+    def _sampled_digest(self, path: str, size: int) -> str:
+        """Hash the size and evenly spaced blocks (including head and tail) of a file."""
+        hasher = hashlib.new(self.algorithm)
+        hasher.update(str(size).encode("ascii"))
+        last_offset = max(0, size - self.SAMPLE_BLOCK_SIZE)
+        with open(path, "rb") as f:
+            for i in range(self.SAMPLE_BLOCKS):
+                f.seek(last_offset * i // (self.SAMPLE_BLOCKS - 1))
+                hasher.update(f.read(self.SAMPLE_BLOCK_SIZE))
+        return f"{self.algorithm}:{hasher.hexdigest()}"
+
+    def _hash_directory(self, path: str) -> str:
+        """Hash the names and digests of all non-hidden files below a directory."""
+        hasher = hashlib.new(self.algorithm)
+        exact = True
+        for directory, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for filename in sorted(filenames):
+                file_path = os.path.join(directory, filename)
+                if filename.startswith(".") or not os.path.isfile(file_path):
+                    continue
+                name = os.path.relpath(file_path, path).replace(os.sep, "/")
+                digest = self._hash_file(file_path)
+                exact = exact and is_exact(digest)
+                hasher.update(f"{name}\0{digest}\n".encode("utf-8"))
+        digest = f"{self.algorithm}:{hasher.hexdigest()}"
+        return digest if exact else "sampled-" + digest
+
+    def _load(self) -> None:
+        """Load cached digests from a previous run."""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                self._cache = {
+                    path: list(entry)
+                    for path, entry in json.load(f).items()
+                    if isinstance(entry, list) and len(entry) == 4
+                }
+        except (IOError, ValueError, AttributeError):
+            self.events.log(f'Warning: unable to read hash cache "{self.cache_path}".')
+
+
+def is_exact(digest: Optional[str]) -> bool:
+    """Whether a digest identifies content (not None and not a sampled fingerprint)."""
+    return digest is not None and not digest.startswith("sampled-")
+
+
+def find_duplicates(digests: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """
+    Find inputs with the same content as an earlier input.
+
+    Inputs with sampled fingerprints are never paired: two files differing
+    outside the sampled blocks would have the same fingerprint.
+
+    Args:
+        digests: Digest per path, in input order
+
+    Returns:
+        Dict[str, str]: Path of each duplicate -> path of the first input with that digest
+    """
+    first: Dict[str, str] = {}
+    duplicates: Dict[str, str] = {}
+    for path, digest in digests.items():
+        if not is_exact(digest):
+            continue
+        if digest in first:
+            duplicates[path] = first[digest]
+        else:
+            first[digest] = path
+    return duplicates
@@ -0,0 +1,87 @@
+import urllib.parse
+from typing import Dict, Iterable, Optional, Set
+
+# Keys of the optional "download" object of a preset
+DOWNLOAD_RULES = ("include", "exclude")
+
+
+class DownloadFilter:
+    """Include/exclude rules for the result formats of an optimization.
+
+    A rule is a format name, matched against the key of a download in the
+    API response (e.g. "glb", "usdz", "obj") and against the file extension
+    of its URL ("obj.zip" as well as "zip"). A result is downloaded if it
+    matches an include rule (or there are none) and no exclude rule.
+
+    Filters derived with for_preset() also apply the rules of their parent,
+    so a preset can only narrow down the formats allowed on the command line.
+    """
+
+    def __init__(
+        self,
+        include: Iterable[str] = (),
+        exclude: Iterable[str] = (),
+        parent: Optional["DownloadFilter"] = None,
+    ):
+        """
+        Args:
+            include: Formats to download (all if empty)
+            exclude: Formats never to download
+            parent: Filter whose rules must match as well
+        """
+        self.include: Set[str] = {name.lower().lstrip(".") for name in include}
+        self.exclude: Set[str] = {name.lower().lstrip(".") for name in exclude}
+        self.parent = parent
+
+    def for_preset(self, preset: Dict) -> "DownloadFilter":
+        """
+        Filter applying a preset's "download" rules in addition to these.
+
+        Args:
+            preset: The preset configuration
+
+        Returns:
+            DownloadFilter: The combined filter (self if the preset has no rules)
+        """
+        rules = preset.get("download")
+        if not rules:
+            return self
+        return DownloadFilter(rules.get("include", ()), rules.get("exclude", ()), parent=self)
+
+    def wants(self, file_type: str, url: str) -> bool:
+        """
+        Whether a result should be downloaded.
+
+        Args:
+            file_type: Key of the download in the API response
+            url: Download URL
+
+        Returns:
+            bool: True if the result passes all rules
+        """
+        if self.parent is not None and not self.parent.wants(file_type, url):
+            return False
+        names = format_names(file_type, url)
+        if self.include and not names & self.include:
+            return False
+        return not names & self.exclude
+
+
+def format_names(file_type: str, url: str) -> Set[str]:
+    """
+    Names a download can be matched by.
+
+    Args:
+        file_type: Key of the download in the API response
+        url: Download URL
+
+    Returns:
+        Set[str]: e.g. {"obj", "obj.zip", "zip"} for an OBJ result in a ZIP archive
+    """
+    names = {file_type.lower()}
+    filename = urllib.parse.urlsplit(url).path.rsplit("/", 1)[-1].lower()
+    if "." in filename:
+        extension = filename.split(".", 1)[1]
+        names.add(extension)
+        names.add(extension.rsplit(".", 1)[-1])
+    return names
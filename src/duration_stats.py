@@ -0,0 +1,195 @@
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from src.event_bus import EventBus
+
+
+class DurationStore:
+    """Small local store of observed stage durations.
+
+    Durations are kept per (input size bucket, preset, stage), where the size
+    bucket is the power of two of the input size in bytes. Only the most recent
+    samples are kept, so estimates follow changes in server load.
+    """
+
+    UPLOAD = "upload"
+    ANALYSIS = "analysis"
+    OPTIMIZATION = "optimization"
+    DOWNLOAD = "download"
+
+    UNKNOWN_SIZE = -1
+    MAX_SAMPLES = 50
+    SAVE_INTERVAL = 30  # seconds
+
+    # Used until a stage has been observed at least once
+    DEFAULT_DURATIONS = {UPLOAD: 10.0, ANALYSIS: 30.0, OPTIMIZATION: 120.0, DOWNLOAD: 5.0}
+
+    def __init__(self, path: str = "job_durations.json", events: Optional[EventBus] = None):
+        """
+        Args:
+            path: JSON file the samples are persisted in
+            events: Event bus for warnings
+        """
+        self.path = path
+        self.events = events or EventBus()
+        self._samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._last_save = time.time()
+        self._dirty = False
+        self._load()
+
+    @classmethod
+    def size_bucket(cls, size: Optional[int]) -> int:
+        """
+        Map an input size to its bucket.
+
+        Args:
+            size: Input size in bytes, or None if unknown
+
+        Returns:
+            int: floor(log2(size)), or UNKNOWN_SIZE
+        """
+        if size is None:
+            return cls.UNKNOWN_SIZE
+        return int(math.log2(max(size, 1)))
+
+    def record(
+        self, size: Optional[int], preset: str, stage: str, duration: float
+    ) -> None:
+        """
+        Record an observed duration.
+
+        Args:
+            size: Input size in bytes, or None if unknown
+            preset: Preset name ("" for stages that don't depend on the preset)
+            stage: One of UPLOAD, ANALYSIS, OPTIMIZATION, DOWNLOAD
+            duration: Duration in seconds
+        """
+        key = self._key(self.size_bucket(size), preset, stage)
+        with self._lock:
+            samples = self._samples.setdefault(key, [])
+            samples.append(round(duration, 3))
+            del samples[: -self.MAX_SAMPLES]
+            self._dirty = True
+            save = time.time() - self._last_save >= self.SAVE_INTERVAL
+        if save:
+            self.save()
+
+    def estimate(self, size: Optional[int], preset: str, stage: str) -> float:
+        """
+        Estimate the duration of a stage from the median of past samples.
+
+        Falls back to the nearest size bucket with samples for the same preset
+        and stage, and to a default if the stage has never been observed.
+
+        Args:
+            size: Input size in bytes, or None if unknown
+            preset: Preset name ("" for stages that don't depend on the preset)
+            stage: Stage name
+
+        Returns:
+            float: Estimated duration in seconds
+        """
+        samples = self._nearest_samples(size, preset, stage)
+        if not samples:
+            return self.DEFAULT_DURATIONS.get(stage, 60.0)
+        return _percentile(samples, 50)
+
+    def percentile(
+        self, size: Optional[int], preset: str, stage: str, percentile: float
+    ) -> Optional[float]:
+        """
+        Get a duration percentile from past samples.
+
+        Args:
+            size: Input size in bytes, or None if unknown
+            preset: Preset name
+            stage: Stage name
+            percentile: Percentile between 0 and 100
+
+        Returns:
+            Optional[float]: Duration in seconds, or None without samples
+        """
+        samples = self._nearest_samples(size, preset, stage)
+        return _percentile(samples, percentile) if samples else None
+
+    def sample_count(self, size: Optional[int], preset: str, stage: str) -> int:
+        """Number of samples the estimates for this key are based on."""
+        return len(self._nearest_samples(size, preset, stage))
+
+    def save(self) -> None:
+        """Persist the samples atomically."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {key: list(samples) for key, samples in self._samples.items()}
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            tmp_file = self.path + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.path)
+        except OSError as e:
+            self.events.log(f'Warning: unable to write duration stats file "{self.path}": {e}')
+
+    def _nearest_samples(self, size: Optional[int], preset: str, stage: str) -> List[float]:
+        """Samples of the closest size bucket with data for preset and stage."""
+        bucket = self.size_bucket(size)
+        with self._lock:
+            samples = self._samples.get(self._key(bucket, preset, stage))
+            if samples:
+                return list(samples)
+            candidates = []
+            for key, values in self._samples.items():
+                other_bucket, other_preset, other_stage = key.split("|", 2)
+                if other_preset == preset and other_stage == stage and values:
+                    candidates.append((abs(int(other_bucket) - bucket), key))
+            if not candidates:
+                return []
+            return list(self._samples[min(candidates)[1]])
+
+    def _load(self) -> None:
+        """Load samples from a previous run."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self._samples = {key: list(values) for key, values in json.load(f).items()}
+        except (IOError, ValueError, AttributeError):
+            self.events.log(f'Warning: unable to read duration stats file "{self.path}".')
+
+    @staticmethod
+    def _key(bucket: int, preset: str, stage: str) -> str:
+        return f"{bucket}|{preset}|{stage}"
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    rank = max(1, int(math.ceil(len(ordered) * percentile / 100.0)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def predict_makespan(durations: List[float], workers: int) -> float:
+    """
+    Predict the total duration of running jobs in the given order.
+
+    Simulates list scheduling: every job is started on the worker that
+    becomes free first.
+
+    Args:
+        durations: Estimated job durations in start order
+        workers: Number of concurrent workers
+
+    Returns:
+        float: Predicted makespan in seconds
+    """
+    loads = [0.0] * max(1, workers)
+    for duration in durations:
+        index = loads.index(min(loads))
+        loads[index] += duration
+    return max(loads)
@@ -0,0 +1,395 @@
+import json
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, TextIO, Tuple
+
+
+class Event:
+    """Base class for events emitted on the EventBus."""
+
+    kind = "event"
+    __slots__ = ("timestamp",)
+
+    def __init__(self):
+        self.timestamp = time.time()
+
+    def to_dict(self) -> Dict:
+        """Return the event as a JSON-serializable dictionary."""
+        data = {"kind": self.kind}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                data[name] = getattr(self, name)
+        return data
+
+
+class LogEvent(Event):
+    """Human readable status message."""
+
+    kind = "log"
+    __slots__ = ("message", "level")
+
+    def __init__(self, message: str, level: str = "info"):
+        super().__init__()
+        self.message = message
+        self.level = level
+
+
+class RequestStartEvent(Event):
+    """An HTTP request is about to be sent."""
+
+    kind = "request_start"
+    __slots__ = ("method", "endpoint", "bytes_sent")
+
+    def __init__(self, method: str, endpoint: str, bytes_sent: int = 0):
+        super().__init__()
+        self.method = method
+        self.endpoint = endpoint
+        self.bytes_sent = bytes_sent
+
+
+class RequestEndEvent(Event):
+    """An HTTP request finished (successfully or not)."""
+
+    kind = "request_end"
+    __slots__ = ("method", "endpoint", "status", "latency", "bytes_sent", "bytes_received")
+
+    def __init__(
+        self,
+        method: str,
+        endpoint: str,
+        status: int,
+        latency: float,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+    ):
+        super().__init__()
+        self.method = method
+        self.endpoint = endpoint
+        self.status = status
+        self.latency = latency
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+
+
+class TransferEvent(Event):
+    """A file was transferred to or from storage."""
+
+    kind = "transfer"
+    __slots__ = ("direction", "path", "bytes", "duration", "job")
+
+    def __init__(
+        self, direction: str, path: str, num_bytes: int, duration: float, job: str = ""
+    ):
+        super().__init__()
+        self.direction = direction
+        self.path = path
+        self.bytes = num_bytes
+        self.duration = duration
+        self.job = job
+
+
+class TransferProgressEvent(Event):
+    """Bytes transferred so far for a running upload or download."""
+
+    kind = "transfer_progress"
+    __slots__ = ("job", "direction", "bytes", "total")
+
+    def __init__(self, job: str, direction: str, num_bytes: int, total: int = 0):
+        super().__init__()
+        self.job = job
+        self.direction = direction
+        self.bytes = num_bytes
+        self.total = total
+
+
+class ThroughputEvent(Event):
+    """Current upload and download throughput in bytes per second."""
+
+    kind = "throughput"
+    __slots__ = ("upload", "download", "transfers")
+
+    def __init__(self, upload: float, download: float, transfers: int = 0):
+        super().__init__()
+        self.upload = upload
+        self.download = download
+        self.transfers = transfers
+
+
+class StateEvent(Event):
+    """A job or remote asset changed its state."""
+
+    kind = "state"
+    __slots__ = ("job", "state", "detail", "label")
+
+    def __init__(self, job: str, state: str, detail: str = "", label: str = ""):
+        super().__init__()
+        self.job = job
+        self.state = state
+        self.detail = detail
+        self.label = label
+
+
+class ProgressEvent(Event):
+    """Optimization progress reported by the server."""
+
+    kind = "progress"
+    __slots__ = ("job", "progress", "step")
+
+    def __init__(self, job: str, progress: int, step: str = ""):
+        super().__init__()
+        self.job = job
+        self.progress = progress
+        self.step = step
+
+
+class EventSink:
+    """Base class for event consumers. Sinks run on the bus dispatch thread."""
+
+    def handle(self, event: Event) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Called whenever the dispatch queue runs empty."""
+
+    def close(self) -> None:
+        """Called once when the bus is closed."""
+
+
+class EventBus:
+    """Queue-backed event bus dispatching events to sinks on a background thread.
+
+    emit() only enqueues the event, so reporting never blocks the caller on
+    terminal or file I/O.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sinks: Optional[List[EventSink]] = None):
+        """
+        Args:
+            sinks: Event sinks to dispatch to (defaults to a TtyRenderer)
+        """
+        self.sinks = list(sinks) if sinks is not None else [TtyRenderer()]
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._dispatch, name="event-bus", daemon=True
+        )
+        self._thread.start()
+
+    def add_sink(self, sink: EventSink) -> None:
+        """Register an additional sink."""
+        # Copy on write: the dispatch thread may be iterating the list
+        self.sinks = self.sinks + [sink]
+
+    def remove_sink(self, sink: EventSink) -> None:
+        """Unregister a sink (it isn't closed)."""
+        self.sinks = [s for s in self.sinks if s is not sink]
+
+    def emit(self, event: Event) -> None:
+        """Enqueue an event for dispatch."""
+        self._queue.put(event)
+
+    def log(self, message: str, level: str = "info") -> None:
+        """Emit a LogEvent."""
+        self._queue.put(LogEvent(message, level))
+
+    def close(self) -> None:
+        """Dispatch all pending events and close the sinks."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        for sink in self.sinks:
+            sink.close()
+
+    def _dispatch(self) -> None:
+        """Background loop handing events to the sinks."""
+        while True:
+            event = self._queue.get()
+            while True:
+                if event is self._STOP:
+                    self._flush_sinks()
+                    return
+                for sink in self.sinks:
+                    try:
+                        sink.handle(event)
+                    except Exception as e:
+                        sys.stderr.write(f"ERROR: event sink failed: {e}\n")
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._flush_sinks()
+
+    def _flush_sinks(self) -> None:
+        for sink in self.sinks:
+            try:
+                sink.flush()
+            except Exception as e:
+                sys.stderr.write(f"ERROR: event sink failed: {e}\n")
+
+
+class TtyRenderer(EventSink):
+    """Compact terminal renderer for log messages and progress bars."""
+
+    def __init__(self, stream: Optional[TextIO] = None, bar_width: int = 20):
+        """
+        Args:
+            stream: Output stream (defaults to sys.stdout)
+            bar_width: Width of the progress bar in characters
+        """
+        self.stream = stream or sys.stdout
+        self.bar_width = bar_width
+        self._progress_line = False
+
+    def handle(self, event: Event) -> None:
+        if isinstance(event, LogEvent):
+            self._end_progress_line()
+            self.stream.write(event.message + "\n")
+        elif isinstance(event, ProgressEvent):
+            self._render_progress(event)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def close(self) -> None:
+        self._end_progress_line()
+        self.stream.flush()
+
+    def _render_progress(self, event: ProgressEvent) -> None:
+        """Redraw the single progress line."""
+        filled = int(self.bar_width * event.progress / 100)
+        bar = "[" + "#" * filled + "_" * (self.bar_width - filled) + "]"
+        step_info = f"  |  {event.step}" if event.step else ""
+        if step_info:
+            step_info = step_info + " " * (45 - len(step_info))
+
+        self.stream.write(f"\rProgress: {bar} {event.progress}%{step_info}")
+        self._progress_line = True
+        if event.progress == 100:
+            self._end_progress_line()
+
+    def _end_progress_line(self) -> None:
+        if self._progress_line:
+            self.stream.write("\n")
+            self._progress_line = False
+
+
+class JsonLinesSink(EventSink):
+    """Writes every event as one JSON object per line."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: File the events are appended to
+        """
+        self.path = path
+        self._file = open(path, "a", buffering=1024 * 1024)
+
+    def handle(self, event: Event) -> None:
+        self._file.write(json.dumps(event.to_dict()) + "\n")
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class PrometheusSink(EventSink):
+    """Aggregates events into counters served in Prometheus text format.
+
+    Metrics are exposed on http://<host>:<port>/metrics.
+    """
+
+    PREFIX = "rapidpipeline"
+
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        """
+        Args:
+            port: Local port to serve the metrics on
+            host: Interface to bind to
+        """
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._gauges: Dict[Tuple[str, Tuple], float] = {}
+
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+
+    def handle(self, event: Event) -> None:
+        with self._lock:
+            if isinstance(event, RequestStartEvent):
+                self._add(self._gauges, "requests_in_flight", (), 1)
+            elif isinstance(event, RequestEndEvent):
+                labels = (
+                    ("method", event.method),
+                    ("endpoint", event.endpoint),
+                    ("status", str(event.status)),
+                )
+                self._add(self._gauges, "requests_in_flight", (), -1)
+                self._add(self._counters, "requests_total", labels, 1)
+                self._add(self._counters, "request_duration_seconds_sum", labels[:2], event.latency)
+                self._add(self._counters, "request_duration_seconds_count", labels[:2], 1)
+                self._add(self._counters, "bytes_sent_total", (), event.bytes_sent)
+                self._add(self._counters, "bytes_received_total", (), event.bytes_received)
+            elif isinstance(event, TransferEvent):
+                labels = (("direction", event.direction),)
+                self._add(self._counters, "transfer_bytes_total", labels, event.bytes)
+                self._add(self._counters, "transfers_total", labels, 1)
+            elif isinstance(event, ThroughputEvent):
+                for direction in ("upload", "download"):
+                    key = ("throughput_bytes_per_second", (("direction", direction),))
+                    self._gauges[key] = getattr(event, direction)
+            elif isinstance(event, StateEvent):
+                self._add(self._counters, "state_transitions_total", (("state", event.state),), 1)
+            elif isinstance(event, LogEvent):
+                self._add(self._counters, "log_messages_total", (("level", event.level),), 1)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for metrics, metric_type in ((self._counters, "counter"), (self._gauges, "gauge")):
+                seen = set()
+                for (name, labels), value in sorted(metrics.items()):
+                    full_name = f"{self.PREFIX}_{name}"
+                    if name not in seen:
+                        lines.append(f"# TYPE {full_name} {metric_type}")
+                        seen.add(name)
+                    label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                    if label_str:
+                        full_name += "{" + label_str + "}"
+                    lines.append(f"{full_name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def _add(metrics: Dict, name: str, labels: Tuple, value: float) -> None:
+        key = (name, labels)
+        metrics[key] = metrics.get(key, 0) + value
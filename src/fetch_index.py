@@ -0,0 +1,142 @@
+import calendar
+import json
+import os
+import threading
+import time
+import urllib.parse
+from typing import Dict, List, Optional
+from src.event_bus import EventBus
+
+
+class FetchIndex:
+    """Download URLs of results that were skipped, so they can be fetched on demand.
+
+    Presigned download URLs expire, so every entry is stored with the expiry
+    time read from its URL and dropped once that has passed. Optimized models
+    with entries in the index are kept in cloud storage until their results
+    were fetched or have expired.
+    """
+
+    def __init__(self, path: str = "fetch_index.json", events: Optional[EventBus] = None):
+        """
+        Args:
+            path: JSON file the index is stored in
+            events: Event bus for warnings
+        """
+        self.path = path
+        self.events = events or EventBus()
+        self._entries: List[Dict] = []
+        self._lock = threading.Lock()
+        self._load()
+
+    def add(
+        self, url: str, output_path: str, file_type: str, rapid_model_id: int, token: str = ""
+    ) -> None:
+        """
+        Record a skipped download.
+
+        Args:
+            url: Download URL
+            output_path: Path the file would have been saved to
+            file_type: Key of the download in the API response
+            rapid_model_id: ID of the optimized model the file belongs to
+            token: Name of the API token owning the optimized model
+        """
+        entry = {
+            "url": url,
+            "output_path": output_path,
+            "format": file_type,
+            "rapid_model_id": rapid_model_id,
+            "token": token,
+            "expires": url_expiry(url),
+        }
+        with self._lock:
+            self._entries = [e for e in self._entries if e["output_path"] != output_path]
+            self._entries.append(entry)
+            self._save()
+
+    def has_model(self, rapid_model_id: int) -> bool:
+        """Whether there are unexpired entries for an optimized model."""
+        now = time.time()
+        with self._lock:
+            return any(
+                e["rapid_model_id"] == rapid_model_id and not _expired(e, now)
+                for e in self._entries
+            )
+
+    def entries(self) -> List[Dict]:
+        """All entries, in the order they were recorded."""
+        with self._lock:
+            return [dict(entry) for entry in self._entries]
+
+    def prune(self) -> List[Dict]:
+        """
+        Drop expired entries.
+
+        Returns:
+            List[Dict]: The entries that were dropped
+        """
+        now = time.time()
+        with self._lock:
+            expired = [e for e in self._entries if _expired(e, now)]
+            if expired:
+                self._entries = [e for e in self._entries if not _expired(e, now)]
+                self._save()
+        return expired
+
+    def remove(self, output_path: str) -> None:
+        """Drop the entry of a fetched file."""
+        with self._lock:
+            self._entries = [e for e in self._entries if e["output_path"] != output_path]
+            self._save()
+
+    def _save(self) -> None:
+        """Persist the index atomically (called with the lock held)."""
+        try:
+            tmp_file = self.path + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_file, self.path)
+        except OSError as e:
+            self.events.log(f'Warning: unable to write fetch index "{self.path}": {e}')
+
+    def _load(self) -> None:
+        """Load the entries of previous runs."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self._entries = [
+                    entry for entry in json.load(f)
+                    if isinstance(entry, dict) and "url" in entry and "output_path" in entry
+                ]
+        except (IOError, ValueError, TypeError):
+            self.events.log(f'Warning: unable to read fetch index "{self.path}".')
+
+
+def url_expiry(url: str) -> Optional[float]:
+    """
+    Expiry time of a presigned URL.
+
+    Args:
+        url: URL signed with AWS signature version 4 (X-Amz-Date and
+            X-Amz-Expires) or version 2 (Expires)
+
+    Returns:
+        Optional[float]: Unix time the URL expires at, None if unknown
+    """
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+    try:
+        if "X-Amz-Date" in query and "X-Amz-Expires" in query:
+            signed = time.strptime(query["X-Amz-Date"][0], "%Y%m%dT%H%M%SZ")
+            return calendar.timegm(signed) + int(query["X-Amz-Expires"][0])
+        if "Expires" in query:
+            return float(query["Expires"][0])
+    except ValueError:
+        pass
+    return None
+
+
+def _expired(entry: Dict, now: float) -> bool:
+    expires = entry.get("expires")
+    return expires is not None and expires <= now
@@ -1,38 +1,166 @@
+import contextlib
 import os
-import urllib.request
+import time
 from typing import Dict, Optional
 from pathlib import Path
-import sys
+from src.cancellation import Cancelled, CancelToken
+from src.event_bus import EventBus, ProgressEvent, TransferEvent, TransferProgressEvent
+from src.output_sink import LocalSink, OutputSink
+from src.request_utils import RequestUtils
+from src.transfer_manager import TransferManager
 
 
 class FileUtils:
     """Utility class for handling file operations and progress tracking."""
 
-    def download_file(self, url: str, output_path: str) -> bool:
+    CHUNK_SIZE = 1024 * 1024
+    PROGRESS_INTERVAL = 0.5  # seconds between transfer progress events
+
+    def __init__(
+        self,
+        events: Optional[EventBus] = None,
+        request_utils: Optional[RequestUtils] = None,
+        sink: Optional[OutputSink] = None,
+        transfers: Optional[TransferManager] = None,
+    ):
+        self.events = events or EventBus()
+        self.request_utils = request_utils or RequestUtils(self.events)
+        self.sink = sink or LocalSink(events=self.events)
+        self.transfers = transfers  # shapes and counts downloads, if given
+        self._local = LocalSink(events=self.events)
+
+    def download_file(
+        self,
+        url: str,
+        output_path: str,
+        job: str = "",
+        use_sink: bool = True,
+        priority: int = 0,
+        cancel_token: Optional[CancelToken] = None,
+    ) -> bool:
         """
         Download a file from a URL to a specified path.
 
         Args:
             url: The URL to download from
             output_path: The path to save the file to
+            job: Identifier of the job the download belongs to
+            use_sink: Whether to write to the output sink (otherwise the file
+                is written to the local output path)
+            priority: Higher priorities get bandwidth first (see TransferManager)
+            cancel_token: Checked before every chunk; once cancelled, the
+                partial file is discarded and Cancelled is raised
 
         Returns:
             bool: True if download was successful, False otherwise
+
+        Raises:
+            Cancelled: If the cancel token was cancelled during the download
         """
         try:
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-            print(f"Downloading to: {output_path}")
-            with urllib.request.urlopen(url) as response:
-                with open(output_path, "wb") as out_file:
-                    out_file.write(response.read())
+            self.events.log(f"Downloading to: {output_path}")
+            start_time = time.perf_counter()
+            response = self.request_utils.open_stream(url)
+            if response is None:
+                return False
+            sink = self.sink if use_sink else self._local
+            body = contextlib.nullcontext(response)
+            if self.transfers is not None:
+                body = self.transfers.stream(response, "download", priority)
+            with response, body as shaped:
+                total = self.request_utils.content_length(response)
+                with sink.open(output_path, total) as out_file:
+                    num_bytes = self._copy_with_progress(
+                        shaped, out_file, job, total, cancel_token
+                    )
+                    if total and num_bytes != total:
+                        out_file.discard()
+                        self.events.log(
+                            f"ERROR: Download truncated: got {num_bytes} of {total} bytes",
+                            "error",
+                        )
+                        return False
+                    out_file.commit()
+            self.events.emit(
+                TransferEvent(
+                    "download", output_path, num_bytes, time.perf_counter() - start_time, job
+                )
+            )
             return True
 
+        except Cancelled:
+            raise
         except Exception as e:
-            print(f"ERROR: Failed to download file: {str(e)}")
+            self.events.log(f"ERROR: Failed to download file: {str(e)}", "error")
             return False
 
+    def copy_file(self, source_path: str, output_path: str, job: str = "") -> bool:
+        """
+        Copy a result written before (e.g. by another job) to the output sink.
+
+        Only local output sinks leave results that can be copied.
+
+        Args:
+            source_path: Output path of the earlier result
+            output_path: The path to save the copy to
+            job: Identifier of the job the copy belongs to
+
+        Returns:
+            bool: True if the result was copied, False if it has to be downloaded
+        """
+        if not self.sink.local or not os.path.isfile(source_path):
+            return False
+        try:
+            self.events.log(f"Copying {source_path} to: {output_path}")
+            total = os.path.getsize(source_path)
+            with open(source_path, "rb") as source, self.sink.open(output_path, total) as out_file:
+                self._copy_with_progress(source, out_file, job, total)
+                out_file.commit()
+            return True
+        except OSError as e:
+            self.events.log(f'Warning: unable to copy "{source_path}": {e}')
+            return False
+
+    def _copy_with_progress(
+        self,
+        response,
+        out_file,
+        job: str,
+        total: int = 0,
+        cancel_token: Optional[CancelToken] = None,
+    ) -> int:
+        """
+        Copy a response body to a file, emitting throttled progress events.
+
+        Args:
+            response: Response to read from
+            out_file: File to write to
+            job: Identifier of the job the download belongs to
+            total: Expected number of bytes (0 if unknown)
+            cancel_token: Checked before every chunk
+
+        Returns:
+            int: Number of bytes copied
+
+        Raises:
+            Cancelled: If the cancel token was cancelled (the caller's sink
+                writer discards the partial file when the exception leaves it)
+        """
+        num_bytes = 0
+        last_report = time.perf_counter()
+        while True:
+            if cancel_token is not None:
+                cancel_token.check()
+            chunk = response.read(self.CHUNK_SIZE)
+            if not chunk:
+                return num_bytes
+            out_file.write(chunk)
+            num_bytes += len(chunk)
+            now = time.perf_counter()
+            if now - last_report >= self.PROGRESS_INTERVAL:
+                last_report = now
+                self.events.emit(TransferProgressEvent(job, "download", num_bytes, total))
+
     def get_output_path(self, url: str, output_prefix: str) -> str:
         """
         Generate the output path for a downloaded file.
@@ -98,36 +226,13 @@ class FileUtils:
 
         return output_prefix + final_filename
 
-    def display_progress(self, progress: int, step: str = "") -> None:
+    def display_progress(self, progress: int, step: str = "", job: str = "") -> None:
         """
-        Display a progress bar with optional processing step.
+        Report optimization progress with optional processing step.
 
         Args:
             progress: Progress percentage (0-100)
             step: Current processing step description
+            job: Identifier of the job the progress belongs to
         """
-        bar = self._make_progress_bar(progress)
-        step_info = f"  |  {step}" if step else ""
-        if step_info:
-            step_info = step_info + " " * (45 - len(step_info))
-
-        sys.stdout.write(f"\rProgress: {bar} {progress}%{step_info}")
-        sys.stdout.flush()
-
-        if progress == 100:
-            print()  # New line when complete
-
-    def _make_progress_bar(self, progress: int, width: int = 20) -> str:
-        """
-        Create a text-based progress bar.
-
-        Args:
-            progress: Progress percentage (0-100)
-            width: Width of the progress bar in characters
-
-        Returns:
-            str: The progress bar string
-        """
-        filled = int(width * progress / 100)
-        bar = "[" + "#" * filled + "_" * (width - filled) + "]"
-        return bar
+        self.events.emit(ProgressEvent(job, progress, step))
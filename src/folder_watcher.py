@@ -0,0 +1,280 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from src.event_bus import EventBus
+
+
+class InotifyWatch:
+    """Minimal Linux inotify binding (via ctypes) for a single directory."""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+
+    WATCH_MASK = (
+        IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+    )
+
+    _EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+    _READ_SIZE = 64 * 1024
+
+    OVERFLOW = None  # returned instead of a name when events were lost
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Directory to watch
+
+        Raises:
+            OSError: If inotify is unavailable or the directory can't be watched
+        """
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        if libc.inotify_add_watch(self._fd, os.fsencode(path), self.WATCH_MASK) < 0:
+            code = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(code, os.strerror(code), path)
+        self.closed = False
+
+    @staticmethod
+    def available() -> bool:
+        """Whether inotify can be used on this platform."""
+        return sys.platform.startswith("linux")
+
+    def read(self, timeout: float) -> List[Optional[str]]:
+        """
+        Wait for events.
+
+        Args:
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            List[Optional[str]]: Names of the changed entries, with OVERFLOW
+            if the kernel queue overflowed and events were lost
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, self._READ_SIZE)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+
+        names: List[Optional[str]] = []
+        offset = 0
+        while offset + self._EVENT_HEADER.size <= len(data):
+            _, mask, _, length = self._EVENT_HEADER.unpack_from(data, offset)
+            offset += self._EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                names.append(self.OVERFLOW)
+            elif mask & (self.IN_IGNORED | self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                self.closed = True
+            elif name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class FolderWatcher:
+    """Watches a directory and reports files once they stopped changing.
+
+    Changes are picked up with inotify on Linux, otherwise (or if inotify
+    can't be used) the directory is rescanned periodically with os.scandir.
+
+    A file is ready once it hasn't changed for settle_time seconds (by its
+    size, modification time and change events), so files that are still
+    being copied aren't picked up. Ready files are collected for batch_delay
+    seconds and handed over together. Files whose content changes after they
+    were handed over are reported again.
+    """
+
+    # Files being written by common copy/download tools
+    TEMPORARY_SUFFIXES = (".tmp", ".part", ".partial", ".crdownload", ".filepart")
+
+    def __init__(
+        self,
+        path: str,
+        events: Optional[EventBus] = None,
+        settle_time: float = 2.0,
+        batch_delay: float = 1.0,
+        max_batch: int = 100,
+        poll_interval: float = 5.0,
+        include_existing: bool = False,
+        use_inotify: bool = True,
+    ):
+        """
+        Args:
+            path: Directory to watch
+            events: Event bus for status messages
+            settle_time: Seconds a file must stay unchanged before it is ready
+            batch_delay: Seconds to wait for more ready files before handing them over
+            max_batch: Maximum number of files handed over at once
+            poll_interval: Seconds between rescans when polling
+            include_existing: Whether files already present at startup are reported
+            use_inotify: Whether to use inotify if available
+        """
+        self.path = path
+        self.events = events or EventBus()
+        self.settle_time = settle_time
+        self.batch_delay = batch_delay
+        self.max_batch = max(1, max_batch)
+        self.poll_interval = poll_interval
+        self.include_existing = include_existing
+        self.use_inotify = use_inotify
+
+        # path -> (size, mtime_ns, time of the last observed change)
+        self._candidates: Dict[str, Tuple[int, int, float]] = {}
+        # path -> (size, mtime_ns) when it was last handed over
+        self._handled: Dict[str, Tuple[int, int]] = {}
+        self._batch: List[str] = []
+        self._last_ready = 0.0
+        self._stop = threading.Event()
+
+    def run(self, on_batch: Callable[[List[str]], None]) -> None:
+        """
+        Watch the directory until stop() is called.
+
+        Args:
+            on_batch: Called (on this thread) with each batch of ready file paths
+        """
+        watch = None
+        if self.use_inotify and InotifyWatch.available():
+            try:
+                watch = InotifyWatch(self.path)
+            except (OSError, AttributeError) as e:
+                self.events.log(f"Warning: inotify unavailable ({e}), polling instead.")
+
+        # Initial scan: existing files are either candidates or known
+        for path, size, mtime_ns in self._scan():
+            if self.include_existing:
+                self._candidates[path] = (size, mtime_ns, 0.0)
+            else:
+                self._handled[path] = (size, mtime_ns)
+
+        mode = "inotify" if watch is not None else f"polling every {self.poll_interval:g}s"
+        self.events.log(f'\nWatching "{self.path}" for new models ({mode}).')
+        tick = min(1.0, self.settle_time / 2, self.batch_delay / 2) or 0.1
+        last_scan = time.time()
+        try:
+            while not self._stop.is_set():
+                if watch is not None:
+                    names = watch.read(tick)
+                    if InotifyWatch.OVERFLOW in names:
+                        self.events.log("Warning: missed file events, rescanning.")
+                        self._rescan()
+                    for name in names:
+                        if name is not InotifyWatch.OVERFLOW:
+                            self._touch(os.path.join(self.path, name))
+                    if watch.closed:
+                        self.events.log(f'Error: watched directory "{self.path}" is gone.', "error")
+                        break
+                else:
+                    self._stop.wait(tick)
+                    if time.time() - last_scan >= self.poll_interval:
+                        self._rescan()
+                        last_scan = time.time()
+
+                self._collect_ready()
+                if self._batch and (
+                    len(self._batch) >= self.max_batch
+                    or time.time() - self._last_ready >= self.batch_delay
+                ):
+                    batch, self._batch = self._batch, []
+                    on_batch(batch)
+        finally:
+            if watch is not None:
+                watch.close()
+
+    def stop(self) -> None:
+        """Stop watching (from another thread or a signal handler)."""
+        self._stop.set()
+
+    def _scan(self):
+        """Yield (path, size, mtime_ns) of all candidate files in the directory."""
+        try:
+            entries = os.scandir(self.path)
+        except OSError as e:
+            self.events.log(f'Error: unable to scan "{self.path}": {e}', "error")
+            return
+        with entries:
+            for entry in entries:
+                if not self._is_model_name(entry.name):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime_ns
+
+    def _rescan(self) -> None:
+        """Pick up all new or changed files from a full directory scan."""
+        for path, size, mtime_ns in self._scan():
+            if self._handled.get(path) == (size, mtime_ns):
+                continue
+            candidate = self._candidates.get(path)
+            if candidate is None or candidate[:2] != (size, mtime_ns):
+                self._candidates[path] = (size, mtime_ns, time.time())
+
+    def _touch(self, path: str) -> None:
+        """Register a change event for a file."""
+        if not self._is_model_name(os.path.basename(path)):
+            return
+        size, mtime_ns, _ = self._candidates.get(path, (-1, -1, 0.0))
+        self._candidates[path] = (size, mtime_ns, time.time())
+
+    def _collect_ready(self) -> None:
+        """Move candidates that stopped changing to the current batch."""
+        now = time.time()
+        for path, (size, mtime_ns, changed) in list(self._candidates.items()):
+            if now - changed < self.settle_time:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted or renamed before it settled
+                del self._candidates[path]
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            unchanged = signature == (size, mtime_ns)
+            if not unchanged and now - stat.st_mtime_ns / 1e9 < self.settle_time:
+                # Still being written: wait another period
+                self._candidates[path] = signature + (now,)
+                continue
+            del self._candidates[path]
+            if self._handled.get(path) == signature or not os.path.isfile(path):
+                continue
+            self._handled[path] = signature
+            self._batch.append(path)
+            self._last_ready = now
+
+    def _is_model_name(self, name: str) -> bool:
+        """Skip hidden files and files that are still being downloaded."""
+        return not name.startswith(".") and not name.lower().endswith(self.TEMPORARY_SUFFIXES)
@@ -0,0 +1,338 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from src.cancellation import Cancelled, CancelToken
+from src.event_bus import EventBus
+from src.model_inspector import ModelInfo
+
+
+class Job:
+    """A single input to upload (or reuse) and optimize with a set of presets."""
+
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        model_file: str,
+        label: str = "",
+        preset_names: Optional[List[str]] = None,
+        priority: int = 0,
+        presets: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Args:
+            model_file: File path, URL or base asset ID in the form <number>.id
+            label: Optional label for the model
+            preset_names: Names of the presets to apply (None for all presets)
+            priority: Higher priorities are started first
+            presets: Job specific preset definitions replacing the loaded presets
+            timeout: Seconds the job may run once started (None: processor default)
+        """
+        self.id = next(self._ids)
+        self.model_file = model_file
+        self.label = label
+        self.preset_names = preset_names
+        self.priority = priority
+        self.presets = presets
+        self.timeout = timeout
+        self.cancel_token = CancelToken("job")  # linked to the run when the job starts
+        self.state = "queued"
+        self.lane = "bulk"  # set by the scheduler on submission
+        self.size: Optional[int] = None  # input size in bytes, if known
+        self.estimate = 0.0  # estimated processing time in seconds
+        self.digest: Optional[str] = None  # content hash of the input, if computed
+        self.shares_input = False  # other jobs of the run have the same input digest
+        self.info: Optional[ModelInfo] = None  # summary of an inspected glTF input
+        self.complexity = 0  # triangle count, if known
+        self.failures = 0  # failed uploads/optimizations of this job
+        self.submitted: Optional[float] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        """Return the job status as a JSON-serializable dictionary."""
+        return {
+            "id": self.id,
+            "input": self.model_file,
+            "label": self.label,
+            "presets": self.preset_names or sorted(self.presets or []) or None,
+            "priority": self.priority,
+            "lane": self.lane,
+            "timeout": self.timeout,
+            "state": self.state,
+            "failures": self.failures,
+            "estimate": round(self.estimate, 1),
+            "digest": self.digest,
+            "triangles": self.complexity or None,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class _LaneQueue:
+    """Bounded priority queues of the lanes; get() serves the lanes in order."""
+
+    def __init__(self, lanes: Iterable[str], maxsize: int):
+        self.maxsize = maxsize  # per lane
+        self._heaps: Dict[str, List[tuple]] = {lane: [] for lane in lanes}
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, lane: str, item: tuple, block: bool = True) -> bool:
+        """Queue an item, waiting while its lane is full; False if full and not blocking."""
+        with self._condition:
+            heap = self._heaps[lane]
+            while len(heap) >= self.maxsize:
+                if not block:
+                    return False
+                self._condition.wait()
+            heapq.heappush(heap, item)
+            self._condition.notify_all()
+            return True
+
+    def get(self, lanes: Iterable[str]) -> Optional[tuple]:
+        """Smallest item of the first non-empty lane; None once closed and the lanes are empty."""
+        with self._condition:
+            while True:
+                for lane in lanes:
+                    heap = self._heaps[lane]
+                    if heap:
+                        item = heapq.heappop(heap)
+                        self._condition.notify_all()  # a submitter may be waiting
+                        return item
+                if self._closed:
+                    return None
+                self._condition.wait()
+
+    def close(self) -> None:
+        """Let get() return None once the lanes are empty."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class JobScheduler:
+    """Runs jobs on a pool of worker threads from bounded priority queues.
+
+    submit() blocks while the queue of the job's lane is full, so jobs can be
+    streamed in from an arbitrarily long source with constant memory.
+
+    Within the same priority, jobs are ordered by the scheduling policy:
+
+    - "fifo": submission order
+    - "sjf": shortest estimated job first (lowest mean latency)
+    - "lpt": longest estimated job first. With workers taking the next job
+      whenever they become free, this is the LPT bin-packing heuristic and
+      keeps giant assets from starting last (lowest makespan).
+
+    Jobs with equal estimates are ordered by their complexity (triangle count).
+
+    With interactive_priority set, jobs of at least that priority run in the
+    "interactive" lane, the others in the "bulk" lane. Each lane has its own
+    queue, so interactive jobs are never held up by a full bulk queue, and
+    free workers always take queued interactive jobs before bulk ones.
+    Additional interactive_workers only run interactive jobs, so one starts
+    at once even while every other worker is busy with a bulk job.
+    """
+
+    POLICIES = ("fifo", "sjf", "lpt")
+    LANES = ("interactive", "bulk")  # in the order they are served
+
+    def __init__(
+        self,
+        handler: Callable[[Job], None],
+        workers: int = 1,
+        max_queued: int = 0,
+        events: Optional[EventBus] = None,
+        policy: str = "fifo",
+        estimate: Optional[Callable[[Job], float]] = None,
+        interactive_priority: Optional[int] = None,
+        interactive_workers: int = 0,
+    ):
+        """
+        Args:
+            handler: Function processing a single job
+            workers: Number of jobs processed concurrently
+            max_queued: Maximum number of waiting jobs per lane (defaults to
+                2 per worker)
+            events: Event bus for status messages
+            policy: One of POLICIES
+            estimate: Function estimating a job's duration in seconds
+            interactive_priority: Lowest priority of interactive jobs (None:
+                a single lane)
+            interactive_workers: Additional workers reserved for interactive jobs
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.policy = policy
+        self.estimate = estimate
+        self.interactive_priority = interactive_priority
+        self.interactive_workers = interactive_workers if interactive_priority is not None else 0
+        self.events = events or EventBus()
+        self.active: Dict[int, Job] = {}
+        self.error: Optional[BaseException] = None
+
+        self._queue = _LaneQueue(self.LANES, max_queued or 2 * self.workers)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, args=(self.LANES,), name=f"job-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        for i in range(self.interactive_workers):
+            thread = threading.Thread(
+                target=self._work, args=(("interactive",),), name=f"interactive-worker-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job: Job) -> None:
+        """
+        Queue a job, blocking while the queue of its lane is full.
+
+        Args:
+            job: The job to run
+        """
+        self._prepare(job)
+        self._queue.put(job.lane, self.order_key(job) + (next(self._sequence), job))
+
+    def try_submit(self, job: Job) -> bool:
+        """
+        Queue a job without blocking.
+
+        Args:
+            job: The job to run
+
+        Returns:
+            bool: False if the queue of its lane is full
+        """
+        self._prepare(job)
+        return self._queue.put(
+            job.lane, self.order_key(job) + (next(self._sequence), job), block=False
+        )
+
+    def cancel(self, job: Job) -> bool:
+        """
+        Cancel a queued or running job.
+
+        A queued job won't run. A running job stops at its next cancellation
+        check and is marked "cancelled" once it has unwound.
+
+        Args:
+            job: A submitted job
+
+        Returns:
+            bool: True if the job was queued or running
+        """
+        with self._lock:
+            if job.state == "running":
+                job.cancel_token.cancel()
+                return True
+            if job.state != "queued":
+                return False
+            job.state = "cancelled"
+            job.finished = time.time()
+            return True
+
+    def _prepare(self, job: Job) -> None:
+        """Set the lane, estimate and submission time of a job."""
+        job.lane = self.lane(job)
+        if self.estimate is not None and not job.estimate:
+            job.estimate = self.estimate(job)
+        job.submitted = time.time()
+
+    def lane(self, job: Job) -> str:
+        """Lane a job runs in (see LANES)."""
+        if self.interactive_priority is not None and job.priority >= self.interactive_priority:
+            return "interactive"
+        return "bulk"
+
+    def order_key(self, job: Job) -> tuple:
+        """
+        Sort key of a job under the scheduling policy (smallest runs first).
+
+        Args:
+            job: The job (with its estimate set)
+
+        Returns:
+            tuple: (negated priority, policy specific keys)
+        """
+        if self.policy == "sjf":
+            return (-job.priority, job.estimate, job.complexity)
+        if self.policy == "lpt":
+            return (-job.priority, -job.estimate, -job.complexity)
+        return (-job.priority, 0, 0)
+
+    def close(self) -> None:
+        """Stop the workers once all queued jobs are done and wait for them."""
+        self._queue.close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def run(self, jobs: Iterable[Job], cancel_token: Optional[CancelToken] = None) -> None:
+        """
+        Run all jobs from an iterable and wait for them to finish.
+
+        The iterable is consumed lazily. If a handler raises SystemExit, no
+        further jobs are started and the exception is re-raised once the
+        running jobs are finished.
+
+        Args:
+            jobs: Jobs to run
+            cancel_token: Once cancelled (e.g. the run was stopped), no further
+                jobs are submitted
+        """
+        self.start()
+        for job in jobs:
+            if self.error is not None or (cancel_token is not None and cancel_token.cancelled):
+                break
+            self.submit(job)
+        self.close()
+        if self.error is not None:
+            raise self.error
+
+    def _work(self, lanes: Iterable[str]) -> None:
+        """Worker loop taking jobs from the given lanes (in order)."""
+        while True:
+            item = self._queue.get(lanes)
+            if item is None:
+                return
+            job = item[-1]
+            if self.error is not None:
+                continue
+
+            with self._lock:
+                if job.state == "cancelled":
+                    continue
+                self.active[job.id] = job
+                job.state = "running"
+                job.started = time.time()
+            try:
+                self.handler(job)
+                job.state = "failed" if job.failures else "done"
+            except Cancelled as e:
+                job.state = "failed" if e.expired else "cancelled"
+            except SystemExit as e:
+                job.state = "failed"
+                self.error = e
+            except Exception as e:
+                job.state = "failed"
+                self.events.log(f"ERROR: job {job.model_file} failed: {e}", "error")
+            finally:
+                job.finished = time.time()
+                with self._lock:
+                    self.active.pop(job.id, None)
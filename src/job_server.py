@@ -0,0 +1,382 @@
+import collections
+import json
+import os
+import queue
+import socketserver
+import stat
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import jsonschema
+from src.download_filter import DOWNLOAD_RULES
+from src.event_bus import Event, EventSink
+from src.job_scheduler import Job, JobScheduler
+from src.manifest import job_from_entry
+from src.model_processor import ModelProcessor
+from src.validation_utils import SELECTION_RULES, ValidationUtils
+
+
+class EventSubscriber(EventSink):
+    """Buffers events for one streaming client.
+
+    The buffer is bounded: if a client reads too slowly, further events are
+    dropped for that client instead of slowing down the event bus.
+    """
+
+    def __init__(self, max_queued: int = 1000):
+        """
+        Args:
+            max_queued: Maximum number of buffered events
+        """
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(max_queued)
+
+    def handle(self, event: Event) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout: float) -> Optional[Event]:
+        """Wait for the next event, returning None on timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class JobServer:
+    """Long-running job submission API (serve mode).
+
+    Keeps one client, processor and scheduler alive across jobs, so
+    connections, loaded presets and the compiled schema validator are reused
+    and a submitted job starts without any startup cost.
+
+    Endpoints (JSON, on localhost HTTP or a Unix socket):
+
+    - POST /jobs: submit a job (a manifest entry, see ManifestReader)
+    - GET /jobs: list all known jobs
+    - GET /jobs/<id>: status of a job
+    - DELETE /jobs/<id>: cancel a queued or running job
+    - GET /events: stream all events as JSON lines
+    """
+
+    MAX_BODY_SIZE = 1024 * 1024
+    MAX_FINISHED_JOBS = 1000
+    HEARTBEAT_INTERVAL = 15  # seconds
+
+    def __init__(
+        self,
+        processor: ModelProcessor,
+        presets: Dict,
+        schema_path: str,
+        cleanup: bool = True,
+        listen: str = "127.0.0.1:8765",
+        socket_path: str = "",
+        max_queued: int = 1000,
+    ):
+        """
+        Args:
+            processor: Processor running the jobs
+            presets: Loaded presets jobs can refer to by name
+            schema_path: JSON schema used to validate inline preset configurations
+            cleanup: Whether to cleanup after processing
+            listen: host:port to serve HTTP on (ignored if socket_path is set)
+            socket_path: Unix socket to serve on instead of TCP
+            max_queued: Maximum number of waiting jobs
+        """
+        self.processor = processor
+        self.events = processor.events
+        self.presets = presets
+        self.schema_path = schema_path
+        self.cleanup = cleanup
+        self.address = socket_path or listen
+        self.jobs: "collections.OrderedDict[int, Job]" = collections.OrderedDict()
+        self.scheduler: JobScheduler = processor.create_scheduler(
+            presets, cleanup=cleanup, max_queued=max_queued
+        )
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._server = self._create_server(listen, socket_path)
+
+    def serve_forever(self) -> None:
+        """Start the workers and serve requests until interrupted."""
+        self.scheduler.start()
+        self.events.log(f"Serving job API on {self.address}")
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        """Make serve_forever() return (from another thread, e.g. on a signal)."""
+        self._server.shutdown()
+
+    def close(self) -> None:
+        """Stop accepting jobs, cancel queued ones and wait for running jobs."""
+        self._stopping.set()
+        self._server.server_close()
+        with self._lock:
+            jobs = list(self.jobs.values())
+        cancelled = sum(self.scheduler.cancel(job) for job in jobs)
+        if cancelled:
+            self.events.log(f"Cancelled {cancelled} queued job(s).")
+        self.scheduler.close()
+        self.processor.durations.save()
+        if self.cleanup:
+            self.processor.cleaner.flush()
+        if isinstance(self._server, _UnixHTTPServer):
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+    def submit(self, entry) -> Tuple[int, Dict]:
+        """
+        Validate and queue a submitted job.
+
+        Args:
+            entry: The decoded request body
+
+        Returns:
+            Tuple[int, Dict]: HTTP status and response body
+        """
+        if not isinstance(entry, dict):
+            return 400, {"error": "the job must be a JSON object"}
+        try:
+            inline_presets = self._parse_inline_presets(entry.get("preset_definitions"))
+            preset_names = inline_presets or self.presets["presets"]
+            job = job_from_entry(entry, preset_names)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        job.presets = inline_presets
+
+        if not self.scheduler.try_submit(job):
+            return 503, {"error": "job queue is full"}
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune_jobs()
+        return 202, job.to_dict()
+
+    def get_job(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def cancel(self, job_id: int) -> Tuple[int, Dict]:
+        """
+        Cancel a queued or running job.
+
+        A running job stops polling, gives back its slots and queues its
+        remote assets for deletion; it is answered with 202 as it is still
+        unwinding.
+
+        Args:
+            job_id: ID of the job
+
+        Returns:
+            Tuple[int, Dict]: HTTP status and response body
+        """
+        job = self.get_job(job_id)
+        if job is None:
+            return 404, {"error": f"unknown job {job_id}"}
+        if not self.scheduler.cancel(job):
+            return 409, {"error": f"job {job_id} is {job.state}", "job": job.to_dict()}
+        if job.state == "running":
+            self.events.log(f"Cancelling running job {job_id} ({job.model_file}) ...")
+            return 202, job.to_dict()
+        self.events.log(f"Cancelled job {job_id} ({job.model_file}).")
+        return 200, job.to_dict()
+
+    def stream_events(self, write) -> None:
+        """
+        Stream events as JSON lines until the client disconnects.
+
+        Args:
+            write: Function sending a chunk of bytes to the client
+        """
+        subscriber = EventSubscriber()
+        self.events.add_sink(subscriber)
+        try:
+            last_write = time.time()
+            while not self._stopping.is_set():
+                event = subscriber.get(timeout=1.0)
+                if event is not None:
+                    write((json.dumps(event.to_dict()) + "\n").encode("utf-8"))
+                    last_write = time.time()
+                elif time.time() - last_write >= self.HEARTBEAT_INTERVAL:
+                    # Blank line: detects disconnected clients
+                    write(b"\n")
+                    last_write = time.time()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.events.remove_sink(subscriber)
+
+    def _parse_inline_presets(self, definitions) -> Optional[Dict]:
+        """
+        Validate preset definitions submitted with a job.
+
+        Args:
+            definitions: {name: {"preset_id": ...} or {"config": ...}}, or None
+
+        Returns:
+            Optional[Dict]: The definitions, or None if there are none
+
+        Raises:
+            ValueError: If a definition is invalid
+        """
+        if definitions is None:
+            return None
+        if not isinstance(definitions, dict) or not definitions:
+            raise ValueError('"preset_definitions" must be an object of presets')
+        for name, preset in definitions.items():
+            if not isinstance(preset, dict) or ("preset_id" in preset) == ("config" in preset):
+                raise ValueError(f'preset "{name}" must have either "preset_id" or "config"')
+            rules = preset.get("select", {})
+            if not isinstance(rules, dict) or any(
+                key not in SELECTION_RULES or not isinstance(value, (int, float))
+                for key, value in rules.items()
+            ):
+                raise ValueError(
+                    f'"select" of preset "{name}" may only contain numeric {", ".join(SELECTION_RULES)}'
+                )
+            rules = preset.get("download", {})
+            if not isinstance(rules, dict) or any(
+                key not in DOWNLOAD_RULES
+                or not isinstance(value, list)
+                or not all(isinstance(v, str) for v in value)
+                for key, value in rules.items()
+            ):
+                raise ValueError(
+                    f'"download" of preset "{name}" may only contain format lists '
+                    f'{", ".join(DOWNLOAD_RULES)}'
+                )
+            if "config" in preset:
+                try:
+                    validator = ValidationUtils.get_schema_validator(self.schema_path)
+                    error = jsonschema.exceptions.best_match(
+                        validator.iter_errors(preset["config"])
+                    )
+                except (IOError, ValueError, jsonschema.exceptions.SchemaError) as e:
+                    raise ValueError(f"unable to validate preset configurations: {e}")
+                if error is not None:
+                    location = "/".join(str(part) for part in error.absolute_path) or "/"
+                    raise ValueError(
+                        f'invalid configuration for preset "{name}" at "{location}": {error.message}'
+                    )
+        return definitions
+
+    def _prune_jobs(self) -> None:
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def _create_server(self, listen: str, socket_path: str):
+        """Create the HTTP server on a Unix socket or TCP address."""
+        handler = _make_handler(self)
+        if socket_path:
+            if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                os.unlink(socket_path)  # stale socket of a previous run
+            server = _UnixHTTPServer(socket_path, handler)
+            os.chmod(socket_path, 0o600)
+            return server
+
+        host, _, port = listen.rpartition(":")
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), handler)
+        server.daemon_threads = True
+        return server
+
+
+def _make_handler(job_server: JobServer):
+    """Create the request handler class bound to a JobServer."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            path = self.path.split("?")[0].rstrip("/")
+            if path == "/jobs":
+                self._send_json(200, job_server.list_jobs())
+            elif path == "/events":
+                self._stream_events()
+            elif path.startswith("/jobs/"):
+                job = job_server.get_job(self._job_id(path))
+                if job is None:
+                    self._send_json(404, {"error": "unknown job"})
+                else:
+                    self._send_json(200, job.to_dict())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.split("?")[0].rstrip("/") != "/jobs":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.close_connection = True  # the body can't be skipped
+                self._send_json(400, {"error": "invalid Content-Length"})
+                return
+            if length > JobServer.MAX_BODY_SIZE:
+                self.close_connection = True
+                self._send_json(413, {"error": "request body too large"})
+                return
+            try:
+                entry = json.loads(self.rfile.read(length) or b"null")
+            except ValueError as e:
+                self._send_json(400, {"error": f"invalid JSON: {e}"})
+                return
+            self._send_json(*job_server.submit(entry))
+
+        def do_DELETE(self):
+            path = self.path.split("?")[0].rstrip("/")
+            if not path.startswith("/jobs/"):
+                self._send_json(404, {"error": "not found"})
+                return
+            self._send_json(*job_server.cancel(self._job_id(path)))
+
+        def _job_id(self, path: str) -> int:
+            try:
+                return int(path.rsplit("/", 1)[1])
+            except ValueError:
+                return -1
+
+        def _send_json(self, status: int, data) -> None:
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream_events(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def write(data: bytes) -> None:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            job_server.stream_events(write)
+            self.close_connection = True
+
+        def address_string(self):
+            # Unix socket clients have no address
+            return str(self.client_address[0]) if self.client_address else "local"
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
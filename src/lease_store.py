@@ -0,0 +1,290 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Set
+from src.event_bus import EventBus
+
+
+class LeaseStore:
+    """Coordinates several nodes processing the same inputs.
+
+    A node claims a job with a time-limited lease before processing it and
+    renews its leases with heartbeats from a background thread. Jobs that
+    are done, failed or leased by another node are skipped; leases of nodes
+    that stopped heartbeating (e.g. crashed) expire and are reclaimed. The
+    stages a job went through are recorded, so the node reclaiming it can
+    resume instead of uploading and optimizing again.
+
+    Subclasses implement the storage (_claim, _renew, _finish, _record,
+    _stages, _counts).
+    """
+
+    def __init__(
+        self,
+        node: str = "",
+        ttl: float = 120.0,
+        events: Optional[EventBus] = None,
+    ):
+        """
+        Args:
+            node: ID of this node (defaults to "<hostname>:<pid>")
+            ttl: Seconds a lease stays valid without a heartbeat
+            events: Event bus for status messages
+        """
+        self.node = node or f"{socket.gethostname()}:{os.getpid()}"
+        self.ttl = ttl
+        self.events = events or EventBus()
+        self._held: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def claim(self, key: str) -> Optional[Dict[str, str]]:
+        """
+        Try to lease a job.
+
+        Args:
+            key: Job key (same on all nodes for the same input)
+
+        Returns:
+            Optional[Dict[str, str]]: The stages recorded for the job so far
+            (empty for a new job), or None if it must not be processed here
+        """
+        claimed, holder = self._claim(key, time.time())
+        if not claimed:
+            self.events.log(f'Skipping "{key}": {holder}.')
+            return None
+        with self._lock:
+            self._held.add(key)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._heartbeat, name="lease-heartbeat", daemon=True
+                )
+                self._thread.start()
+        if holder:
+            self.events.log(f'Reclaimed stale lease of "{key}" from node {holder}.')
+        return self._stages(key)
+
+    def record_stage(self, key: str, stage: str, detail: str = "") -> None:
+        """
+        Record that a job reached a stage.
+
+        Args:
+            key: Job key
+            stage: Stage name, e.g. "uploaded" or "optimized:<preset>"
+            detail: Stage result, e.g. an asset ID
+        """
+        self._record(key, stage, detail, time.time())
+
+    def release(self, key: str, succeeded: bool) -> None:
+        """
+        Finish a job and give up its lease.
+
+        Args:
+            key: Job key
+            succeeded: Whether the job is done (otherwise it is marked failed)
+        """
+        with self._lock:
+            self._held.discard(key)
+        self._finish(key, "done" if succeeded else "failed", time.time())
+
+    def abandon(self, key: str) -> None:
+        """Give up a lease without finishing the job, so any node can reclaim it at once."""
+        with self._lock:
+            self._held.discard(key)
+        self._finish(key, "leased", time.time())
+
+    def close(self) -> None:
+        """Stop heartbeating (leases still held expire after the TTL)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def summary(self) -> str:
+        """Number of jobs per state, for the end-of-run statistics."""
+        counts = self._counts(time.time())
+        states = ", ".join(f"{count} {state}" for state, count in sorted(counts.items()))
+        return f"Lease store ({self.node}): {states or 'no jobs'}"
+
+    def _heartbeat(self) -> None:
+        """Renew the held leases until close() is called."""
+        while not self._stop.wait(self.ttl / 3):
+            with self._lock:
+                held = set(self._held)
+            lost = held - self._renew(held, time.time())
+            for key in lost:
+                self.events.log(
+                    f'Warning: lease of "{key}" was lost to another node.', "error"
+                )
+                with self._lock:
+                    self._held.discard(key)
+
+    def _claim(self, key: str, now: float):
+        """Lease a job; returns (claimed, holder description or stale holder)."""
+        raise NotImplementedError
+
+    def _renew(self, keys: Set[str], now: float) -> Set[str]:
+        """Extend leases; returns the keys still held by this node."""
+        raise NotImplementedError
+
+    def _finish(self, key: str, state: str, now: float) -> None:
+        """Set the state of a lease held by this node and let it expire."""
+        raise NotImplementedError
+
+    def _record(self, key: str, stage: str, detail: str, now: float) -> None:
+        raise NotImplementedError
+
+    def _stages(self, key: str) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def _counts(self, now: float) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class SqliteLeaseStore(LeaseStore):
+    """Lease store in an SQLite database, e.g. on a file system shared by all nodes.
+
+    Every change is a short IMMEDIATE transaction, so concurrent nodes are
+    serialized by SQLite's file locking. The rollback journal is used
+    (not WAL), as WAL doesn't work on network file systems.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS leases (
+            key TEXT PRIMARY KEY,
+            node TEXT NOT NULL,
+            state TEXT NOT NULL,
+            expires REAL NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 1,
+            updated REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS stages (
+            key TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            detail TEXT NOT NULL,
+            node TEXT NOT NULL,
+            time REAL NOT NULL,
+            PRIMARY KEY (key, stage)
+        );
+    """
+
+    def __init__(
+        self,
+        path: str,
+        node: str = "",
+        ttl: float = 120.0,
+        events: Optional[EventBus] = None,
+        busy_timeout: float = 60.0,
+    ):
+        """
+        Args:
+            path: Database file (created if missing)
+            node: ID of this node (defaults to "<hostname>:<pid>")
+            ttl: Seconds a lease stays valid without a heartbeat
+            events: Event bus for status messages
+            busy_timeout: Seconds to wait for a lock held by another node
+        """
+        super().__init__(node, ttl, events)
+        self.path = path
+        # One connection shared by all threads, serialized by _db_lock
+        self._db = sqlite3.connect(
+            path, timeout=busy_timeout, isolation_level=None, check_same_thread=False
+        )
+        self._db_lock = threading.Lock()
+        with self._db_lock:
+            self._db.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        super().close()
+        with self._db_lock:
+            self._db.close()
+
+    def _transaction(self, function):
+        """Run function(cursor) in an IMMEDIATE transaction."""
+        with self._db_lock:
+            cursor = self._db.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(cursor)
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            return result
+
+    def _claim(self, key: str, now: float):
+        def claim(cursor):
+            row = cursor.execute(
+                "SELECT node, state, expires FROM leases WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                cursor.execute(
+                    "INSERT INTO leases (key, node, state, expires, updated) VALUES (?, ?, 'leased', ?, ?)",
+                    (key, self.node, now + self.ttl, now),
+                )
+                return True, ""
+            node, state, expires = row
+            if state == "done":
+                return False, f"already processed by node {node}"
+            if state == "failed":
+                return False, f"failed on node {node}"
+            if expires > now and node != self.node:
+                return False, f"leased by node {node}"
+            cursor.execute(
+                "UPDATE leases SET node = ?, expires = ?, attempts = attempts + 1, updated = ? "
+                "WHERE key = ?",
+                (self.node, now + self.ttl, now, key),
+            )
+            return True, node if node != self.node else ""
+
+        return self._transaction(claim)
+
+    def _renew(self, keys: Set[str], now: float) -> Set[str]:
+        def renew(cursor):
+            renewed = set()
+            for key in keys:
+                cursor.execute(
+                    "UPDATE leases SET expires = ?, updated = ? "
+                    "WHERE key = ? AND node = ? AND state = 'leased'",
+                    (now + self.ttl, now, key, self.node),
+                )
+                if cursor.rowcount:
+                    renewed.add(key)
+            return renewed
+
+        return self._transaction(renew) if keys else set()
+
+    def _finish(self, key: str, state: str, now: float) -> None:
+        self._transaction(
+            lambda cursor: cursor.execute(
+                "UPDATE leases SET state = ?, expires = ?, updated = ? WHERE key = ? AND node = ?",
+                (state, now, now, key, self.node),
+            )
+        )
+
+    def _record(self, key: str, stage: str, detail: str, now: float) -> None:
+        self._transaction(
+            lambda cursor: cursor.execute(
+                "INSERT OR REPLACE INTO stages (key, stage, detail, node, time) VALUES (?, ?, ?, ?, ?)",
+                (key, stage, detail, self.node, now),
+            )
+        )
+
+    def _stages(self, key: str) -> Dict[str, str]:
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT stage, detail FROM stages WHERE key = ? ORDER BY time", (key,)
+            ).fetchall()
+        return dict(rows)
+
+    def _counts(self, now: float) -> Dict[str, int]:
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT CASE WHEN state = 'leased' AND expires <= ? THEN 'stale' ELSE state END, "
+                "COUNT(*) FROM leases GROUP BY 1",
+                (now,),
+            ).fetchall()
+        return dict(rows)
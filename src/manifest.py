@@ -0,0 +1,121 @@
+import json
+from typing import Dict, Iterable, Iterator, Optional
+from src.event_bus import EventBus
+from src.job_scheduler import Job
+
+
+class ManifestReader:
+    """Lazily reads jobs from a JSON-lines manifest.
+
+    Each non-empty line is a JSON object describing one job:
+
+        {"input": "input/teapot.glb", "label": "Teapot", "presets": ["example_0"], "priority": 1}
+
+    "input" is a file path, an http(s) URL or a base asset ID ("1234.id").
+    A base asset ID can also be given as "base_asset_id": 1234. All other
+    fields are optional; jobs without "presets" use all presets, and
+    "timeout" limits how many seconds a job may run. Lines starting with
+    "#" are ignored.
+    """
+
+    def __init__(self, path: str, presets: Dict, events: Optional[EventBus] = None):
+        """
+        Args:
+            path: Path to the manifest file
+            presets: Loaded presets used to check the preset names
+            events: Event bus for error messages
+        """
+        self.path = path
+        self.preset_names = set(presets["presets"])
+        self.events = events or EventBus()
+        self.invalid_lines = 0
+
+    def __iter__(self) -> Iterator[Job]:
+        with open(self.path) as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                job = self._parse_line(line, line_number)
+                if job is None:
+                    self.invalid_lines += 1
+                else:
+                    yield job
+
+    def _parse_line(self, line: str, line_number: int) -> Optional[Job]:
+        """
+        Parse a single manifest line.
+
+        Args:
+            line: The stripped line
+            line_number: Line number for error messages
+
+        Returns:
+            Optional[Job]: The job, or None if the line is invalid
+        """
+        location = f'"{self.path}" line {line_number}'
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            self.events.log(f"Error: invalid JSON in manifest {location}: {e}", "error")
+            return None
+        if not isinstance(entry, dict):
+            self.events.log(f"Error: manifest {location} must be a JSON object.", "error")
+            return None
+
+        try:
+            return job_from_entry(entry, self.preset_names)
+        except ValueError as e:
+            self.events.log(f"Error: {e} in manifest {location}.", "error")
+            return None
+
+
+def job_from_entry(entry: Dict, preset_names: Iterable[str]) -> Job:
+    """
+    Create a job from a manifest entry (or a job submitted in serve mode).
+
+    Args:
+        entry: The decoded JSON object
+        preset_names: Names of the presets the entry may refer to
+
+    Returns:
+        Job: The job
+
+    Raises:
+        ValueError: If the entry is invalid
+    """
+    if "base_asset_id" in entry:
+        model_file = f"{entry['base_asset_id']}.id"
+    else:
+        model_file = entry.get("input")
+    if not isinstance(model_file, str) or not model_file:
+        raise ValueError('an "input" or "base_asset_id" is required')
+
+    names = entry.get("presets")
+    if names is not None:
+        if isinstance(names, str):
+            names = [names]
+        if not isinstance(names, list) or not names:
+            raise ValueError('"presets" must be a preset name or a list of names')
+        known = set(preset_names)
+        unknown = [str(name) for name in names if name not in known]
+        if unknown:
+            raise ValueError(f"unknown preset(s) {', '.join(unknown)}")
+
+    try:
+        priority = int(entry.get("priority", 0))
+    except (TypeError, ValueError):
+        raise ValueError("invalid priority")
+
+    timeout = entry.get("timeout")
+    if timeout is not None:
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise ValueError('"timeout" must be a positive number of seconds')
+
+    return Job(
+        model_file=model_file,
+        label=str(entry.get("label", "")),
+        preset_names=names,
+        priority=priority,
+        timeout=timeout,
+    )
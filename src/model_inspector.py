@@ -0,0 +1,415 @@
+import json
+import mmap
+import os
+import struct
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+
+class ModelInfo:
+    """Summary of a glTF asset, gathered without reading its binary buffers."""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self.errors: List[str] = []
+        self.triangles = 0
+        self.vertices = 0
+        self.meshes = 0
+        self.materials = 0
+        self.textures = 0
+        self.images: List[Optional[Tuple[int, int]]] = []  # (width, height) if known
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    @property
+    def texture_pixels(self) -> int:
+        """Total number of pixels of all images with a known size."""
+        return sum(w * h for w, h in (image for image in self.images if image))
+
+    def summary(self) -> str:
+        """One line description for status messages."""
+        sizes = [f"{w}x{h}" for w, h in (image for image in self.images if image)]
+        image_info = f" ({', '.join(sizes[:4])}{', ...' if len(sizes) > 4 else ''})" if sizes else ""
+        return (
+            f"{self.triangles:,} triangles, {self.vertices:,} vertices, {self.meshes} meshes, "
+            f"{self.materials} materials, {self.textures} textures, "
+            f"{len(self.images)} images{image_info}"
+        )
+
+
+class ModelInspector:
+    """Reads the structure of .glb and .gltf files for pre-upload triage.
+
+    For GLB files only the 12 byte header, the chunk headers and the JSON
+    chunk are parsed through a memory map; binary buffers are never read,
+    except for the first bytes of embedded images to get their dimensions.
+    """
+
+    EXTENSIONS = (".glb", ".gltf")
+
+    GLB_MAGIC = 0x46546C67  # "glTF"
+    CHUNK_JSON = 0x4E4F534A  # "JSON"
+    CHUNK_BIN = 0x004E4942  # "BIN\0"
+
+    _HEADER = struct.Struct("<III")
+    _CHUNK_HEADER = struct.Struct("<II")
+
+    # Components per accessor type
+    _TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+    _COMPONENT_SIZES = {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}
+
+    @classmethod
+    def supports(cls, path: str) -> bool:
+        """Whether the file type can be inspected."""
+        return path.lower().endswith(cls.EXTENSIONS) and os.path.isfile(path)
+
+    @classmethod
+    def inspect(cls, path: str) -> ModelInfo:
+        """
+        Inspect a .glb or .gltf file.
+
+        Args:
+            path: Path to the file
+
+        Returns:
+            ModelInfo: The summary; its errors list problems that make the
+            file unusable
+        """
+        try:
+            size = os.path.getsize(path)
+        except OSError as e:
+            info = ModelInfo(path, 0)
+            info.errors.append(f"cannot read file: {e}")
+            return info
+
+        info = ModelInfo(path, size)
+        try:
+            with open(path, "rb") as f:
+                if path.lower().endswith(".glb"):
+                    if size == 0:
+                        info.errors.append("file is empty")
+                        return info
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        view = memoryview(mapped)
+                        try:
+                            cls._inspect_glb(view, info)
+                        finally:
+                            view.release()
+                else:
+                    document = json.load(f)
+                    cls._inspect_document(document, info, None, os.path.dirname(path))
+        except (OSError, ValueError) as e:
+            info.errors.append(f"cannot parse file: {e}")
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            # A malformed document the checks above missed: reject the file, not the run
+            info.errors.append(f"malformed glTF document: {e!r}")
+        return info
+
+    @classmethod
+    def check_glb_container(
+        cls, view: memoryview, errors: List[str]
+    ) -> List[Tuple[int, int, int]]:
+        """
+        Check the GLB header and chunk table.
+
+        Args:
+            view: The whole file
+            errors: List problems are appended to
+
+        Returns:
+            List[Tuple[int, int, int]]: (chunk type, data offset, data length) per chunk
+        """
+        if len(view) < cls._HEADER.size:
+            errors.append("file too small for a GLB header")
+            return []
+        magic, version, length = cls._HEADER.unpack_from(view, 0)
+        if magic != cls.GLB_MAGIC:
+            errors.append("not a GLB file (bad magic)")
+            return []
+        if version != 2:
+            errors.append(f"unsupported GLB version {version}")
+            return []
+        if length != len(view):
+            errors.append(f"header length {length} doesn't match file size {len(view)}")
+            return []
+
+        chunks = cls.read_chunks(view, errors)
+        if not errors and (not chunks or chunks[0][0] != cls.CHUNK_JSON):
+            errors.append("first chunk isn't a JSON chunk")
+        return chunks
+
+    @classmethod
+    def _inspect_glb(cls, view: memoryview, info: ModelInfo) -> None:
+        """Check the GLB container and inspect its JSON chunk."""
+        chunks = cls.check_glb_container(view, info.errors)
+        if info.errors:
+            return
+
+        _, json_start, json_length = chunks[0]
+        try:
+            document = json.loads(bytes(view[json_start:json_start + json_length]))
+        except ValueError as e:
+            info.errors.append(f"invalid JSON chunk: {e}")
+            return
+        binary = None
+        if len(chunks) > 1 and chunks[1][0] == cls.CHUNK_BIN:
+            _, bin_start, bin_length = chunks[1]
+            binary = view[bin_start:bin_start + bin_length]
+        cls._inspect_document(document, info, binary, None)
+
+    @classmethod
+    def read_chunks(cls, view: memoryview, errors: List[str]) -> List[Tuple[int, int, int]]:
+        """
+        Walk the chunk headers of a GLB file.
+
+        Args:
+            view: The whole file
+            errors: List problems are appended to
+
+        Returns:
+            List[Tuple[int, int, int]]: (chunk type, data offset, data length) per chunk
+        """
+        chunks = []
+        offset = cls._HEADER.size
+        while offset < len(view):
+            if offset + cls._CHUNK_HEADER.size > len(view):
+                errors.append(f"truncated chunk header at byte {offset}")
+                break
+            length, chunk_type = cls._CHUNK_HEADER.unpack_from(view, offset)
+            offset += cls._CHUNK_HEADER.size
+            if offset + length > len(view):
+                errors.append(f"chunk at byte {offset} exceeds the file size")
+                break
+            if length % 4:
+                errors.append(f"chunk at byte {offset} isn't 4-byte aligned")
+                break
+            chunks.append((chunk_type, offset, length))
+            offset += length
+        return chunks
+
+    @classmethod
+    def _inspect_document(
+        cls, document: Dict, info: ModelInfo, binary: Optional[memoryview], base_dir: Optional[str]
+    ) -> None:
+        """Gather counts from the glTF JSON and check its references and numbers."""
+        if not isinstance(document, dict) or "asset" not in document:
+            info.errors.append("not a glTF document (missing asset)")
+            return
+
+        arrays = {
+            key: _objects(document, key, info.errors)
+            for key in (
+                "buffers", "bufferViews", "accessors", "meshes", "nodes", "materials",
+                "textures", "images",
+            )
+        }
+        if info.errors:
+            return
+        buffers, views, accessors = arrays["buffers"], arrays["bufferViews"], arrays["accessors"]
+        meshes = arrays["meshes"]
+        info.meshes = len(meshes)
+        info.materials = len(arrays["materials"])
+        info.textures = len(arrays["textures"])
+
+        cls._check_buffers(buffers, views, binary, info.errors)
+        if not info.errors:
+            cls._check_accessors(accessors, views, info.errors)
+        if not info.errors:
+            cls._check_meshes(meshes, arrays["nodes"], accessors, arrays["images"], views, info.errors)
+        if info.errors:
+            return
+
+        # Count every mesh once per node instancing it (once if there are no nodes)
+        instances = [0] * len(meshes)
+        for node in arrays["nodes"]:
+            mesh_index = node.get("mesh")
+            if mesh_index is not None:
+                instances[mesh_index] += 1
+        for mesh_index, mesh in enumerate(meshes):
+            triangles, vertices = cls._count_primitives(mesh, accessors)
+            factor = instances[mesh_index] or 1
+            info.triangles += triangles * factor
+            info.vertices += vertices * factor
+
+        for image in arrays["images"]:
+            info.images.append(cls._image_size(image, views, binary, base_dir))
+
+    @staticmethod
+    def _check_buffers(
+        buffers: List[Dict], views: List[Dict], binary: Optional[memoryview], errors: List[str]
+    ) -> None:
+        """Check the buffer sizes and that every bufferView lies within its buffer."""
+        for index, buffer in enumerate(buffers):
+            if not _is_count(buffer.get("byteLength", 0)):
+                errors.append(f"buffer {index} has an invalid byteLength")
+        if errors:
+            return
+        for index, buffer_view in enumerate(views):
+            buffer_index = buffer_view.get("buffer")
+            if not _is_index(buffer_index, len(buffers)):
+                errors.append(f"bufferView {index} references a missing buffer")
+                continue
+            offset = buffer_view.get("byteOffset", 0)
+            length = buffer_view.get("byteLength", 0)
+            stride = buffer_view.get("byteStride", 1)
+            if not (_is_count(offset) and _is_count(length) and _is_count(stride) and stride):
+                errors.append(f"bufferView {index} has an invalid byteOffset, byteLength or byteStride")
+            elif offset + length > buffers[buffer_index].get("byteLength", 0):
+                errors.append(f"bufferView {index} exceeds its buffer")
+        if binary is not None and buffers and "uri" not in buffers[0]:
+            if buffers[0].get("byteLength", 0) > len(binary):
+                errors.append("buffer 0 is larger than the BIN chunk")
+
+    @classmethod
+    def _check_accessors(cls, accessors: List[Dict], views: List[Dict], errors: List[str]) -> None:
+        """Check the accessor counts and that every accessor lies within its bufferView."""
+        for index, accessor in enumerate(accessors):
+            view_index = accessor.get("bufferView")
+            offset = accessor.get("byteOffset", 0)
+            count = accessor.get("count", 0)
+            if not (_is_count(offset) and _is_count(count)):
+                errors.append(f"accessor {index} has an invalid byteOffset or count")
+            elif view_index is None:
+                continue
+            elif not _is_index(view_index, len(views)):
+                errors.append(f"accessor {index} references a missing bufferView")
+            else:
+                accessor_type = accessor.get("type")
+                component_type = accessor.get("componentType")
+                element = cls._TYPE_SIZES.get(
+                    accessor_type if isinstance(accessor_type, str) else "", 1
+                ) * cls._COMPONENT_SIZES.get(
+                    component_type if isinstance(component_type, int) else 0, 1
+                )
+                stride = views[view_index].get("byteStride", element)
+                end = offset + (stride * (count - 1) + element if count else 0)
+                if end > views[view_index].get("byteLength", 0):
+                    errors.append(f"accessor {index} exceeds its bufferView")
+
+    @staticmethod
+    def _check_meshes(
+        meshes: List[Dict],
+        nodes: List[Dict],
+        accessors: List[Dict],
+        images: List[Dict],
+        views: List[Dict],
+        errors: List[str],
+    ) -> None:
+        """Check the accessor, mesh and bufferView references of primitives, nodes and images."""
+        for mesh_index, mesh in enumerate(meshes):
+            primitives = mesh.get("primitives", [])
+            if not isinstance(primitives, list) or not all(
+                isinstance(primitive, dict) and isinstance(primitive.get("attributes", {}), dict)
+                for primitive in primitives
+            ):
+                errors.append(f"mesh {mesh_index} has malformed primitives")
+                continue
+            for primitive in primitives:
+                position = primitive.get("attributes", {}).get("POSITION")
+                indices = primitive.get("indices")
+                if any(
+                    value is not None and not _is_index(value, len(accessors))
+                    for value in (position, indices)
+                ):
+                    errors.append(f"mesh {mesh_index} references a missing accessor")
+                    break
+                if not _is_count(primitive.get("mode", 4)):
+                    errors.append(f"mesh {mesh_index} has an invalid primitive mode")
+                    break
+        for index, node in enumerate(nodes):
+            mesh_index = node.get("mesh")
+            if mesh_index is not None and not _is_index(mesh_index, len(meshes)):
+                errors.append(f"node {index} references a missing mesh")
+        for index, image in enumerate(images):
+            if "bufferView" in image and not _is_index(image["bufferView"], len(views)):
+                errors.append(f"image {index} references a missing bufferView")
+            elif "uri" in image and not isinstance(image["uri"], str):
+                errors.append(f"image {index} has an invalid uri")
+
+    @staticmethod
+    def _count_primitives(mesh: Dict, accessors: List[Dict]) -> Tuple[int, int]:
+        """Triangle and vertex counts of a mesh (with its references checked)."""
+        triangles = vertices = 0
+        for primitive in mesh.get("primitives", []):
+            position = primitive.get("attributes", {}).get("POSITION")
+            vertex_count = accessors[position].get("count", 0) if position is not None else 0
+            indices = primitive.get("indices")
+            count = accessors[indices].get("count", 0) if indices is not None else vertex_count
+            mode = primitive.get("mode", 4)
+            vertices += vertex_count
+            if mode == 4:  # TRIANGLES
+                triangles += count // 3
+            elif mode in (5, 6):  # TRIANGLE_STRIP, TRIANGLE_FAN
+                triangles += max(0, count - 2)
+        return triangles, vertices
+
+    @classmethod
+    def _image_size(
+        cls, image: Dict, views: List[Dict], binary: Optional[memoryview], base_dir: Optional[str]
+    ) -> Optional[Tuple[int, int]]:
+        """Dimensions of an embedded or external image, read from its first bytes."""
+        head = b""
+        if "bufferView" in image and binary is not None:
+            view_index = image["bufferView"]
+            if 0 <= view_index < len(views) and views[view_index].get("buffer", 0) == 0:
+                start = views[view_index].get("byteOffset", 0)
+                length = min(views[view_index].get("byteLength", 0), 64 * 1024)
+                head = bytes(binary[start:start + length])
+        elif "uri" in image and base_dir is not None and not image["uri"].startswith("data:"):
+            try:
+                with open(os.path.join(base_dir, urllib.parse.unquote(image["uri"])), "rb") as f:
+                    head = f.read(64 * 1024)
+            except OSError:
+                return None
+        return image_dimensions(head)
+
+
+def _objects(document: Dict, key: str, errors: List[str]) -> List[Dict]:
+    """A top-level array of objects of a glTF document ([] and an error if malformed)."""
+    items = document.get(key, [])
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        errors.append(f"{key} is not an array of objects")
+        return []
+    return items
+
+
+def _is_index(value, length: int) -> bool:
+    """Whether a JSON value is a valid index into an array of the given length."""
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value < length
+
+
+def _is_count(value) -> bool:
+    """Whether a JSON value is a non-negative integer."""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def image_dimensions(head: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read the dimensions of a PNG or JPEG image from its first bytes.
+
+    Args:
+        head: Beginning of the image file
+
+    Returns:
+        Optional[Tuple[int, int]]: (width, height), or None if unknown
+    """
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and len(head) >= 24:
+        return struct.unpack(">II", head[16:24])
+    if head[:2] == b"\xff\xd8":
+        offset = 2
+        while offset + 4 <= len(head):
+            if head[offset] != 0xFF:
+                return None
+            marker = head[offset + 1]
+            length = struct.unpack(">H", head[offset + 2:offset + 4])[0]
+            # SOF markers, except DHT (C4), JPG (C8) and DAC (CC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                if offset + 9 > len(head):
+                    return None
+                height, width = struct.unpack(">HH", head[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + length
+    return None
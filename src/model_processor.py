@@ -1,12 +1,66 @@
+import hashlib
+import json
 import os
-from typing import List, Dict
+import shutil
+import tempfile
+import threading
+import urllib.parse
+from typing import Iterable, List, Dict, Optional, Tuple
 from src.client import RapidPipelineClient
+from src.asset_cleaner import AssetCleaner
+from src.job_scheduler import Job, JobScheduler
+from src.manifest import ManifestReader
+from src.duration_stats import DurationStore, predict_makespan
+from src.folder_watcher import FolderWatcher
+from src.zip_stream import ZipStream
+from src.content_hasher import ContentHasher, find_duplicates, is_exact
+from src.model_inspector import ModelInspector
+from src.lease_store import LeaseStore
+from src.checkpoint import Checkpoint
+from src.single_flight import SingleFlight, flight_key
+from src.cancellation import Cancelled, CancelToken
 
 
 class ModelProcessor:
-    def __init__(self, client: RapidPipelineClient):
+    MIN_HEDGE_SAMPLES = 10  # past optimizations needed before hedging a preset
+
+    def __init__(
+        self,
+        client: RapidPipelineClient,
+        cleaner: Optional[AssetCleaner] = None,
+        workers: int = 1,
+        durations: Optional[DurationStore] = None,
+        schedule: str = "fifo",
+        hasher: Optional[ContentHasher] = None,
+        leases: Optional[LeaseStore] = None,
+        hedge_percentile: float = 0.0,
+        cancel_token: Optional[CancelToken] = None,
+        job_timeout: float = 0.0,
+        checkpoint: Optional[Checkpoint] = None,
+        interactive_priority: Optional[int] = None,
+        interactive_workers: int = 0,
+    ):
         self.client = client
+        self.events = client.events
+        self.cleaner = cleaner or AssetCleaner(client)
+        self.workers = workers
+        self.durations = durations or DurationStore(events=self.events)
+        self.schedule = schedule
+        self.hasher = hasher
+        self.leases = leases
+        self.hedge_percentile = hedge_percentile  # 0: no hedging
+        self.cancel_token = cancel_token or CancelToken("run")  # parent of all job tokens
+        self.job_timeout = job_timeout  # 0: no deadline (unless set per job)
+        self.checkpoint = checkpoint  # not used with leases, which record stages themselves
+        self.interactive_priority = interactive_priority  # None: no priority lanes
+        self.interactive_workers = interactive_workers  # reserved for the interactive lane
+        self.draining = False
+        self.stopped_on_error = False
+        self.flights = SingleFlight()  # identical optimizations in flight
+        self._intake = self.cancel_token.child("intake")  # cancelled to stop starting jobs
         self.failed_optimizations = 0
+        self._lock = threading.Lock()
+        self._current = threading.local()  # job run by the current worker thread
 
     def process_models(
         self,
@@ -20,7 +74,7 @@ class ModelProcessor:
         Process one or more 3D models with the given presets.
 
         Args:
-            model_path: Path to model file or directory
+            model_path: Path to model file, directory or JSON-lines manifest (.jsonl)
             presets: Dictionary of presets to apply
             cleanup: Whether to cleanup after processing
             exit_on_error: Whether to exit on optimization error
@@ -32,34 +86,588 @@ class ModelProcessor:
         # Reset failed optimizations counter
         self.failed_optimizations = 0
 
-        # Get list of files to process
-        files_to_process = self._get_files_to_process(model_path)
+        scheduler = self.create_scheduler(presets, cleanup, exit_on_error)
+
+        manifest = None
+        if model_path.endswith(".jsonl"):
+            # Streamed: jobs are only ordered within the scheduler's queue
+            self.events.log("\nRunning in manifest mode.")
+            manifest = ManifestReader(model_path, presets, self.events)
+            jobs: Iterable[Job] = manifest
+        else:
+            job_list = [
+                Job(model_file, label=model_label)
+                for model_file in self._get_files_to_process(model_path)
+            ]
+            job_list = self._share_inputs(self._hash_jobs(job_list))
+            for job in job_list:
+                job.estimate = self._estimate_job(job, presets)
+            job_list.sort(key=scheduler.order_key)
+            self._print_batch_eta(job_list)
+            jobs = job_list
+
+        try:
+            scheduler.run(jobs, self._intake)
+        finally:
+            self._delete_kept(self.flights.release(), cleanup)
+            self.durations.save()
+            if self.hasher is not None:
+                self.hasher.save()
+            # Wait for queued (or deferred) deletions before finishing the run
+            if cleanup:
+                self.cleaner.flush()
+
+        if manifest is not None:
+            self.failed_optimizations += manifest.invalid_lines
+
+        return self.failed_optimizations
+
+    def watch_folder(
+        self,
+        watcher: FolderWatcher,
+        presets: Dict,
+        cleanup: bool = True,
+        exit_on_error: bool = False,
+        model_label: str = "",
+    ) -> int:
+        """
+        Process models landing in a watched directory until the watcher is stopped.
+
+        Args:
+            watcher: Watcher of the input directory
+            presets: Dictionary of presets to apply
+            cleanup: Whether to cleanup after processing
+            exit_on_error: Whether to exit on optimization error
+            model_label: Optional label for the models
+
+        Returns:
+            int: Number of failed optimizations
+        """
+        self.failed_optimizations = 0
+        scheduler = self.create_scheduler(presets, cleanup, exit_on_error)
+        queued_digests: Dict[str, Optional[str]] = {}
+
+        def enqueue(paths: List[str]) -> None:
+            if scheduler.error is not None or self._intake.cancelled:
+                watcher.stop()
+                return
+            jobs = [Job(path, label=model_label) for path in paths]
+            if self.hasher is not None:
+                # Skip files that were only touched or rewritten with the same content
+                jobs = [
+                    job for job in self._hash_jobs(jobs)
+                    if job.digest is None or queued_digests.get(job.model_file) != job.digest
+                ]
+                queued_digests.update((job.model_file, job.digest) for job in jobs)
+                if not jobs:
+                    return
+                jobs = self._share_inputs(jobs)
+            for job in jobs:
+                job.estimate = self._estimate_job(job, presets)
+            jobs.sort(key=scheduler.order_key)
+            self.events.log(f"\nQueueing {len(jobs)} new model(s).")
+            for job in jobs:
+                scheduler.submit(job)
+
+        scheduler.start()
+        try:
+            watcher.run(enqueue)
+        finally:
+            scheduler.close()
+            self._delete_kept(self.flights.release(), cleanup)
+            self.durations.save()
+            if cleanup:
+                self.cleaner.flush()
+
+        if scheduler.error is not None:
+            raise scheduler.error
+        return self.failed_optimizations
+
+    def drain(self, grace: float) -> None:
+        """
+        Stop the run gracefully, e.g. on SIGTERM (returns at once).
+
+        No further jobs are started, and uploads and optimizations stop at
+        once. Optimizations still running on the server are left running and
+        recorded with the other stages of their job (in the checkpoint or
+        lease store), so the next run resumes them. Downloads in progress may
+        finish within the grace period; then the run is cancelled.
+
+        Args:
+            grace: Seconds in-flight downloads may take
+        """
+        self.draining = True
+        self._intake.cancel("shutdown")
+        self.client.drain("shutdown")
+        timer = threading.Timer(
+            grace, self.cancel_token.cancel, ["shutdown grace period exceeded"]
+        )
+        timer.daemon = True
+        timer.start()
+
+    def fetch_deferred(self, cleanup: bool = True) -> int:
+        """
+        Download results recorded in the client's fetch index.
+
+        Only entries accepted by the client's download filter are fetched.
+        Expired entries are dropped. With cleanup, optimized models are
+        deleted once none of their results is left in the index.
+
+        Args:
+            cleanup: Whether to delete optimized models that were fully fetched
+
+        Returns:
+            int: Number of files that couldn't be fetched
+        """
+        fetch_index = self.client.fetch_index
+        expired = fetch_index.prune()
+        for entry in expired:
+            self.events.log(f'Dropping expired download: {entry["output_path"]}')
+
+        entries = [
+            entry for entry in fetch_index.entries()
+            if self.client.download_filter.wants(entry["format"], entry["url"])
+        ]
+        self.events.log(f"\nFetching {len(entries)} deferred download(s).")
+        damaged = set(
+            self.client.download_files(
+                [(entry["url"], entry["output_path"]) for entry in entries]
+            )
+        )
+        for entry in entries:
+            if entry["output_path"] not in damaged:
+                fetch_index.remove(entry["output_path"])
+
+        if cleanup:
+            owners = {entry["rapid_model_id"]: entry.get("token", "") for entry in entries + expired}
+            for rapid_model_id, token in owners.items():
+                if not fetch_index.has_model(rapid_model_id):
+                    self.cleaner.schedule(AssetCleaner.RAPID_MODEL, rapid_model_id, token)
+            self.cleaner.flush()
+        return len(damaged)
+
+    def create_scheduler(
+        self,
+        presets: Dict,
+        cleanup: bool = True,
+        exit_on_error: bool = False,
+        max_queued: int = 0,
+    ) -> JobScheduler:
+        """
+        Create a scheduler running jobs with this processor.
+
+        Args:
+            presets: Dictionary of presets for jobs without their own presets
+            cleanup: Whether to cleanup after processing
+            exit_on_error: Whether to exit on optimization error
+            max_queued: Maximum number of waiting jobs (defaults to 2 per worker)
+
+        Returns:
+            JobScheduler: The scheduler (not started yet)
+        """
+        return JobScheduler(
+            lambda job: self._process_job(job, presets, cleanup, exit_on_error),
+            workers=self.workers,
+            max_queued=max_queued,
+            events=self.events,
+            policy=self.schedule,
+            estimate=lambda job: self._estimate_job(job, presets),
+            interactive_priority=self.interactive_priority,
+            interactive_workers=self.interactive_workers,
+        )
+
+    def _hash_jobs(self, jobs: List[Job]) -> List[Job]:
+        """
+        Hash the local inputs of jobs in parallel.
+
+        Args:
+            jobs: Jobs in input order
+
+        Returns:
+            List[Job]: The jobs with their digest set
+        """
+        if self.hasher is None:
+            return jobs
+        local = [job for job in jobs if self._is_local_input(job.model_file)]
+        digests = self.hasher.hash_files(job.model_file for job in local)
+        for job in local:
+            job.digest = digests.get(job.model_file)
+        return jobs
+
+    def _share_inputs(self, jobs: List[Job]) -> List[Job]:
+        """
+        Let hashed jobs with the same input share their optimizations.
+
+        Each job still gets its own results; the optimizations are only run
+        once (see SingleFlight.expect()).
+
+        Args:
+            jobs: Jobs in input order, with their digest set
+
+        Returns:
+            List[Job]: The jobs
+        """
+        duplicates = find_duplicates({job.model_file: job.digest for job in jobs})
+        for path, original in duplicates.items():
+            self.events.log(
+                f'"{path}" has the same content as "{original}": sharing its optimizations.'
+            )
+        sharing = set(duplicates) | set(duplicates.values())
+        for job in jobs:
+            if job.model_file in sharing:
+                job.shares_input = True
+                self.flights.expect(job.digest)
+        return jobs
+
+    @staticmethod
+    def _is_local_input(model_file: str) -> bool:
+        """Whether an input is a local file or directory (not an ID or URL)."""
+        return not model_file.endswith(".id") and not model_file.startswith(
+            ("http://", "https://")
+        )
+
+    def _estimate_job(self, job: Job, presets: Dict) -> float:
+        """Estimate the processing time of a job from past stage durations."""
+        if job.presets is not None:
+            presets = {"presets": job.presets}
+        if job.model_file.endswith(".id"):
+            estimate = 0.0
+        else:
+            job.size = self._input_size(job.model_file)
+            self._inspect(job, job.model_file)
+            estimate = self.durations.estimate(
+                job.size, "", DurationStore.UPLOAD
+            ) + self.durations.estimate(job.size, "", DurationStore.ANALYSIS)
+
+        names = job.preset_names or list(self._select_presets(presets, job)["presets"])
+        for name in names:
+            estimate += self.durations.estimate(
+                job.size, name, DurationStore.OPTIMIZATION
+            ) + self.durations.estimate(job.size, name, DurationStore.DOWNLOAD)
+        return estimate
+
+    def _print_batch_eta(self, jobs: List[Job]) -> None:
+        """Print the predicted duration of a batch of jobs."""
+        if len(jobs) < 2:
+            return
+        makespan = predict_makespan([job.estimate for job in jobs], self.workers)
+        minutes, seconds = divmod(int(makespan), 60)
+        self.events.log(
+            f"Predicted batch duration: {minutes}m {seconds:02d}s "
+            f"for {len(jobs)} models on {self.workers} worker(s) ({self.schedule} order)"
+        )
+
+    def _order_presets(self, presets: Dict, size: Optional[int]) -> List:
+        """Order a job's presets by estimated duration according to the schedule."""
+        items = list(presets["presets"].items())
+        if self.schedule == "fifo":
+            return items
+        return sorted(
+            items,
+            key=lambda item: self.durations.estimate(
+                size, item[0], DurationStore.OPTIMIZATION
+            ),
+            reverse=self.schedule == "lpt",
+        )
 
-        # Process each file
-        for model_file in files_to_process:
+    def _process_job(
+        self, job: Job, presets: Dict, cleanup: bool, exit_on_error: bool
+    ) -> None:
+        """Process a scheduled job, fetching URL inputs to a temporary file first."""
+        self._current.job = job
+        cancel_token = job.cancel_token
+        cancel_token.link(self.cancel_token)
+        timeout = job.timeout or self.job_timeout
+        if timeout:
+            cancel_token.restrict(timeout)
+        try:
+            self._intake.check()  # e.g. the run was stopped while the job was queued
+            bulk = self.interactive_priority is not None and job.lane == "bulk"
+            with self.client.cancellation(cancel_token), self.client.lane(job.priority, bulk):
+                try:
+                    if self.leases is not None:
+                        self._run_leased_job(job, presets, cleanup, exit_on_error)
+                    elif self.checkpoint is not None:
+                        self._run_checkpointed_job(job, presets, cleanup, exit_on_error)
+                    else:
+                        self._run_job(job, presets, cleanup, exit_on_error)
+                except Cancelled as e:
+                    self.events.log(f'Stopped "{job.model_file}": {e.reason}.', "error")
+                    if e.expired:
+                        self._record_failure()
+                    raise
+                except Exception:
+                    # Crashed: count it here, the scheduler only logs it and marks the job failed
+                    self._record_failure()
+                    raise
+        finally:
+            self._current.job = None
+            self._current.progress = None
+            if job.shares_input:
+                self._delete_kept(self.flights.done(job.digest), cleanup)
+
+    def _run_leased_job(
+        self, job: Job, presets: Dict, cleanup: bool, exit_on_error: bool
+    ) -> None:
+        """Run a job if no other node has claimed it, recording its stages."""
+        key = self._lease_key(job, presets)
+        stages = self.leases.claim(key)
+        if stages is None:
+            return
+        self._current.progress = (self.leases, key, stages)
+        failures = job.failures
+        try:
+            self._run_job(job, presets, cleanup, exit_on_error)
+        except Cancelled:
+            if self.draining:
+                self.leases.abandon(key)  # another node (or the next run) resumes it
+            else:
+                self.leases.release(key, False)
+            raise
+        except BaseException:
+            # Interrupted: let another node (or the next run) take over
+            self.leases.abandon(key)
+            raise
+        self.leases.release(key, job.failures == failures)
+
+    def _run_checkpointed_job(
+        self, job: Job, presets: Dict, cleanup: bool, exit_on_error: bool
+    ) -> None:
+        """Run a job, recording its stages in the checkpoint until it is finished."""
+        key = self._lease_key(job, presets)
+        stages = self.checkpoint.stages(key)
+        if stages:
+            self.events.log(f'Resuming "{job.model_file}" from the checkpoint.')
+        self._current.progress = (self.checkpoint, key, stages)
+        drained = False
+        try:
+            self._run_job(job, presets, cleanup, exit_on_error)
+        except Cancelled:
+            drained = self.draining  # keep the entry: the next run resumes the job
+            raise
+        finally:
+            if not drained:
+                self.checkpoint.remove(key)
+
+    def _lease_key(self, job: Job, presets: Dict) -> str:
+        """
+        Key identifying a job across nodes: its input and the presets applied.
+
+        Local inputs are identified by content digest when hashing is enabled
+        (and the input wasn't only sampled), otherwise by absolute path, size
+        and modification time (so all nodes must mount the inputs at the
+        same path).
+        """
+        model_file = job.model_file
+        if self.hasher is not None and job.digest is None and self._is_local_input(model_file):
+            job.digest = self.hasher.hash_path(model_file)
+        if model_file.startswith(("http://", "https://")) or model_file.endswith(".id"):
+            source = model_file
+        elif is_exact(job.digest):
+            source = job.digest
+        else:
+            stat = os.stat(model_file)
+            source = f"{os.path.abspath(model_file)}:{stat.st_size}:{stat.st_mtime_ns}"
+        selection = [job.presets or presets, job.preset_names, job.label]
+        fingerprint = hashlib.sha1(
+            json.dumps(selection, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+        return f"{source}#{fingerprint}"
+
+    def _record_stage(self, stage: str, detail: str = "") -> None:
+        """Record a stage of the current job in the lease store or checkpoint (if any)."""
+        progress = getattr(self._current, "progress", None)
+        if progress is not None:
+            store, key, stages = progress
+            stages[stage] = detail
+            store.record_stage(key, stage, detail)
+
+    def _hedge_after(self, size: Optional[int], preset_name: str) -> Optional[float]:
+        """
+        Time after which a straggling optimization is hedged with a duplicate.
+
+        Args:
+            size: Input size in bytes, or None if unknown
+            preset_name: Name of the preset
+
+        Returns:
+            Optional[float]: The hedge_percentile of past optimization durations
+            of the preset, None if hedging is off or there are too few samples
+        """
+        if not self.hedge_percentile:
+            return None
+        stage = DurationStore.OPTIMIZATION
+        if self.durations.sample_count(size, preset_name, stage) < self.MIN_HEDGE_SAMPLES:
+            return None
+        return self.durations.percentile(size, preset_name, stage, self.hedge_percentile)
+
+    def _current_priority(self) -> int:
+        """Priority of the job run by the current thread (0 outside of jobs)."""
+        job = getattr(self._current, "job", None)
+        return job.priority if job is not None else 0
+
+    def _recorded_stages(self) -> Dict[str, str]:
+        """Stages recorded for the current job (by an earlier run, another node or so far)."""
+        progress = getattr(self._current, "progress", None)
+        return progress[2] if progress is not None else {}
+
+    def _run_job(
+        self, job: Job, presets: Dict, cleanup: bool, exit_on_error: bool
+    ) -> None:
+        """Process a job on the current worker thread."""
+        if job.presets is not None:
+            presets = {"presets": job.presets}
+        if job.preset_names is not None:
+            presets = {
+                "presets": {name: presets["presets"][name] for name in job.preset_names}
+            }
+
+        if not job.model_file.startswith(("http://", "https://")):
+            if self.hasher is not None and job.digest is None and self._is_local_input(
+                job.model_file
+            ):
+                job.digest = self.hasher.hash_path(job.model_file)
+            presets = self._triage(job, job.model_file, presets)
+            if presets is None:
+                return
+            self._process_single_file(
+                model_file=job.model_file,
+                presets=presets,
+                cleanup=cleanup,
+                exit_on_error=exit_on_error,
+                model_label=job.label,
+            )
+            return
+
+        temp_dir = tempfile.mkdtemp(prefix="rapidpipeline-")
+        try:
+            url_path = urllib.parse.urlsplit(job.model_file).path
+            model_file = os.path.join(temp_dir, os.path.basename(url_path) or "model")
+            if not self.client.file_utils.download_file(
+                job.model_file,
+                model_file,
+                use_sink=False,
+                priority=job.priority,
+                cancel_token=self.client.cancel_token,
+            ):
+                self.events.log(f"Couldn't fetch input {job.model_file}.", "error")
+                self._record_failure()
+                return
+            presets = self._triage(job, model_file, presets)
+            if presets is None:
+                return
             self._process_single_file(
                 model_file=model_file,
                 presets=presets,
                 cleanup=cleanup,
                 exit_on_error=exit_on_error,
-                model_label=model_label,
+                model_label=job.label,
             )
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
-        return self.failed_optimizations
+    def _inspect(self, job: Job, model_file: str) -> None:
+        """Inspect a local glTF input once, setting the job's info and complexity."""
+        if job.info is None and ModelInspector.supports(model_file):
+            job.info = ModelInspector.inspect(model_file)
+            job.complexity = job.info.triangles
+
+    def _triage(self, job: Job, model_file: str, presets: Dict) -> Optional[Dict]:
+        """
+        Check an input before it is uploaded and select the presets to apply.
+
+        Args:
+            job: The job
+            model_file: Local path of the input
+            presets: Presets of the job
+
+        Returns:
+            Optional[Dict]: The presets to apply, or None if the job is rejected
+        """
+        self._inspect(job, model_file)
+        if job.info is not None:
+            if not job.info.valid:
+                self.events.log(
+                    f'Error: "{model_file}" is corrupt, not uploading it: '
+                    + "; ".join(job.info.errors[:3]),
+                    "error",
+                )
+                self._record_failure()
+                return None
+            self.events.log(f"{os.path.basename(model_file)}: {job.info.summary()}")
+
+        if job.preset_names is not None:
+            return presets
+        if job.size is None:
+            job.size = self._input_size(model_file)
+        selected = self._select_presets(presets, job)
+        if not selected["presets"]:
+            self.events.log(f'Error: no preset selected for "{model_file}".', "error")
+            self._record_failure()
+            return None
+        skipped = len(presets["presets"]) - len(selected["presets"])
+        if skipped:
+            self.events.log(
+                f"Selected preset(s) {', '.join(selected['presets'])} ({skipped} not matching)."
+            )
+        return selected
+
+    @staticmethod
+    def _select_presets(presets: Dict, job: Job) -> Dict:
+        """
+        Keep the presets whose "select" rules match the job's input.
+
+        Rules that can't be evaluated (e.g. triangle limits for inputs that
+        weren't inspected) don't exclude a preset.
+        """
+        size_mb = job.size / (1024 * 1024) if job.size is not None else None
+        triangles = job.info.triangles if job.info is not None else None
+        selected = {}
+        for name, preset in presets["presets"].items():
+            rules = preset.get("select", {})
+            checks = (
+                (triangles, rules.get("min_triangles"), rules.get("max_triangles")),
+                (size_mb, rules.get("min_size_mb"), rules.get("max_size_mb")),
+            )
+            if all(
+                value is None
+                or ((low is None or value >= low) and (high is None or value <= high))
+                for value, low, high in checks
+            ):
+                selected[name] = preset
+        return {"presets": selected}
+
+    def _record_failure(self) -> None:
+        """Count a failed optimization (thread-safe)."""
+        with self._lock:
+            self.failed_optimizations += 1
+        job = getattr(self._current, "job", None)
+        if job is not None:
+            job.failures += 1
+
+    @staticmethod
+    def _input_size(model_file: str) -> Optional[int]:
+        """Upload size of an input file or directory, None if unknown."""
+        try:
+            if os.path.isdir(model_file):
+                return ZipStream(model_file).size
+            return os.path.getsize(model_file)
+        except OSError:
+            return None
 
     def _get_files_to_process(self, model_path: str) -> List[str]:
         """Get list of files to process based on input path."""
         # First check if it's a base asset ID
         if model_path.endswith(".id"):
-            print("\nRunning in base asset ID mode.")
+            self.events.log("\nRunning in base asset ID mode.")
             return [model_path]
 
-        # Original directory/file logic
+        # Original directory/file logic (subdirectories are multi-file assets)
         if os.path.isdir(model_path):
-            print("\nRunning in directory mode.")
+            self.events.log("\nRunning in directory mode.")
             return [os.path.join(model_path, f) for f in os.listdir(model_path)]
         else:
-            print("\nRunning in single-file mode.")
+            self.events.log("\nRunning in single-file mode.")
             return [model_path]
 
     def _process_single_file(
@@ -70,9 +678,33 @@ class ModelProcessor:
         exit_on_error: bool,
         model_label: str,
     ) -> None:
-        """Process a single model file with all presets."""
+        """Process a single model file with all presets, using one API token throughout."""
+        token = self._recorded_stages().get("token")
+        if token is not None:
+            # Resumed: the recorded assets belong to the token used before
+            with self.client.use_token(token):
+                self._process_with_token(
+                    model_file, presets, cleanup, exit_on_error, model_label
+                )
+            return
+        with self.client.token_lease():
+            self._process_with_token(
+                model_file, presets, cleanup, exit_on_error, model_label
+            )
+
+    def _process_with_token(
+        self,
+        model_file: str,
+        presets: Dict,
+        cleanup: bool,
+        exit_on_error: bool,
+        model_label: str,
+    ) -> None:
+        """Upload (unless it's a base asset ID) and optimize a model with all presets."""
         rapid_model_ids = []
         is_base_asset_id = model_file.endswith(".id")
+        size = None
+        stages = dict(self._recorded_stages())
 
         # Get model_id either from base asset ID or by uploading new file
         if is_base_asset_id:
@@ -81,43 +713,108 @@ class ModelProcessor:
                     model_file.rsplit(".", 1)[0]
                 )  # Extract number from "123.id"
                 model_name = str(model_id)
-                print(f"\nProcessing base asset ID: {model_id}")
+                self.events.log(f"\nProcessing base asset ID: {model_id}")
             except ValueError:
-                print(f"Invalid base asset ID format: {model_file}")
-                self.failed_optimizations += 1
+                self.events.log(f"Invalid base asset ID format: {model_file}")
+                self._record_failure()
                 return
         else:
             # Handle regular file upload
-            model_name = os.path.splitext(os.path.basename(model_file))[0]
-            file_ext = os.path.splitext(model_file)[1]
-            print(f"\nProcessing model: {model_name}")
+            if os.path.isdir(model_file):
+                # Multi-file asset: uploaded as a ZIP archive streamed on the fly
+                model_name = os.path.basename(os.path.normpath(model_file))
+                file_ext = ".zip"
+            else:
+                model_name = os.path.splitext(os.path.basename(model_file))[0]
+                file_ext = os.path.splitext(model_file)[1]
+            self.events.log(f"\nProcessing model: {model_name}")
+            size = self._input_size(model_file)
 
-            upload_urls = self.client.get_upload_urls(
-                file_ext=file_ext, model_label=model_label or model_name
-            )
-            if not upload_urls:
-                print("Couldn't obtain signed upload URLs from server.")
-                self.failed_optimizations += 1
-                return
+            if "uploaded" in stages:
+                # Reclaimed from a node that stopped after uploading
+                model_id = int(stages["uploaded"])
+                self.events.log(f"Resuming with base asset (ID: {model_id}) uploaded before.")
+            else:
+                upload_urls = self.client.get_upload_urls(
+                    file_ext=file_ext, model_label=model_label or model_name
+                )
+                if not upload_urls:
+                    self.events.log("Couldn't obtain signed upload URLs from server.")
+                    self._record_failure()
+                    return
 
-            if not self.client.upload_model(model_file, file_ext, upload_urls):
-                print("Couldn't upload base asset.")
-                self.failed_optimizations += 1
-                return
+                timings: Dict[str, float] = {}
+                try:
+                    uploaded = self.client.upload_model(
+                        model_file, file_ext, upload_urls, timings
+                    )
+                except Cancelled:
+                    # The base asset exists (possibly incomplete) once upload URLs were issued
+                    self.cleaner.schedule(
+                        AssetCleaner.BASE_ASSET, upload_urls["id"], self.client.current_token
+                    )
+                    raise
+                if not uploaded:
+                    self.events.log("Couldn't upload base asset.")
+                    self._record_failure()
+                    return
+                for stage, duration in timings.items():
+                    self.durations.record(size, "", stage, duration)
 
-            model_id = upload_urls["id"]
+                model_id = upload_urls["id"]
+                self._record_stage("token", self.client.current_token)
+                self._record_stage("uploaded", str(model_id))
 
         # Process presets (common for both paths)
-        for preset_name, preset in presets["presets"].items():
-            rapid_model_id = self._process_preset(
-                model_id=model_id,
-                model_name=model_label or model_name,
-                preset_name=preset_name,
-                preset=preset,
-                exit_on_error=exit_on_error,
-            )
-            if rapid_model_id != -1:
-                rapid_model_ids.append(rapid_model_id)
+        try:
+            for preset_name, preset in self._order_presets(presets, size):
+                stage = f"optimized:{preset_name}"
+                if stage in stages:
+                    self.events.log(
+                        f'Skipping preset "{preset_name}": optimized and downloaded before.'
+                    )
+                    rapid_model_ids.append(int(stages[stage]))
+                    continue
+                submitted = stages.get(f"submitted:{preset_name}")
+                rapid_model_id = self._process_preset(
+                    model_id=model_id,
+                    model_name=model_label or model_name,
+                    preset_name=preset_name,
+                    preset=preset,
+                    exit_on_error=exit_on_error,
+                    size=size,
+                    submitted=int(submitted) if submitted else None,
+                )
+                if rapid_model_id is None:
+                    continue  # results taken over from another job's optimization
+                if rapid_model_id != -1:
+                    rapid_model_ids.append(rapid_model_id)
+                    self._record_stage(stage, str(rapid_model_id))
+        except Cancelled as e:
+            if self.draining and getattr(self._current, "progress", None) is not None:
+                # Leave the job's assets for the next run, which resumes it
+                # from its recorded stages; only hedged duplicates are deleted
+                submitted = self._recorded_stages().get(f"submitted:{preset_name}")
+                discarded = [i for i in e.rapid_model_ids if str(i) != submitted]
+                if submitted and int(submitted) in e.rapid_model_ids:
+                    self.events.log(
+                        f"Leaving rapidmodel {submitted} running; the next run resumes it."
+                    )
+                for rapid_model_id in discarded:
+                    self.cleaner.schedule(
+                        AssetCleaner.RAPID_MODEL, rapid_model_id, self.client.current_token
+                    )
+                raise
+            # Unfinished optimizations are useless; finished ones are handled as usual
+            for rapid_model_id in e.rapid_model_ids:
+                self.cleaner.schedule(
+                    AssetCleaner.RAPID_MODEL, rapid_model_id, self.client.current_token
+                )
+            if cleanup:
+                self._cleanup_assets(
+                    model_id, rapid_model_ids, delete_base_asset=not is_base_asset_id
+                )
+            raise
 
         # Cleanup if requested (but don't delete base asset if it's a base asset ID)
         if cleanup:
@@ -132,36 +829,133 @@ class ModelProcessor:
         preset_name: str,
         preset: Dict,
         exit_on_error: bool,
-    ) -> int:
-        """Process a single preset for a model."""
-        print(f'\nStarting Optimization for preset "{preset_name}"')
+        size: Optional[int] = None,
+        submitted: Optional[int] = None,
+    ) -> Optional[int]:
+        """
+        Process a single preset for a model (resuming the optimization submitted, if given).
+
+        If another job is running the same optimization on the same input,
+        its results are taken over instead (see SingleFlight).
+
+        Returns:
+            Optional[int]: ID of the optimized model, -1 if the optimization
+            failed, None if the results were taken over from another job
+        """
+        self.events.log(f'\nStarting Optimization for preset "{preset_name}"')
 
         output_prefix = f"output/{model_name}_{preset_name}"
 
-        rapid_model_id = self.client.optimize_model(
-            model_id=model_id, output_prefix=output_prefix, preset=preset
-        )
+        # Selection and download rules are local only and not part of the API request
+        download_filter = self.client.download_filter.for_preset(preset)
+        preset = {
+            key: value for key, value in preset.items() if key not in ("select", "download")
+        }
+
+        key = None
+        source = self._flight_source(model_id)
+        if source is not None and submitted is None:
+            key = flight_key(source, preset)
+        while key is not None:
+            leading, flight = self.flights.join(key)
+            if leading:
+                break
+            if flight.finished:  # kept for jobs with the same input
+                self.events.log("Same optimization done for another job, taking its results ...")
+            else:
+                self.events.log(
+                    "Same optimization in flight for another job, waiting for its results ..."
+                )
+            result = self.flights.wait(flight, self.client.cancel_token)
+            shared = False
+            try:
+                if result is not None:
+                    shared = self.client.share_results(
+                        result[0], output_prefix, result[1], result[2], download_filter
+                    )
+            finally:
+                self.flights.leave(flight, shared)
+            if shared:
+                return None
+            if result is not None:
+                key = None  # the results couldn't be taken over: optimize on our own
+            # else the other job failed: lead the next attempt (or follow another job's)
+
+        timings: Dict[str, float] = {}
+        result = None
+        try:
+            rapid_model_id = self.client.optimize_model(
+                model_id=model_id,
+                output_prefix=output_prefix,
+                preset=preset,
+                timings=timings,
+                download_filter=download_filter,
+                priority=self._current_priority(),
+                hedge_after=self._hedge_after(size, preset_name),
+                submitted=submitted,
+                on_submitted=lambda rapid_model_id: self._record_stage(
+                    f"submitted:{preset_name}", str(rapid_model_id)
+                ),
+            )
+            if rapid_model_id != -1:
+                result = (rapid_model_id, output_prefix, self.client.current_token)
+        finally:
+            if key is not None:
+                self.flights.finish(key, flight, result)
+        for stage, duration in timings.items():
+            self.durations.record(size, preset_name, stage, duration)
 
         if rapid_model_id == -1:
-            self.failed_optimizations += 1
+            self._record_failure()
             if exit_on_error:
-                import sys
-
-                sys.exit(2)
+                # Stop all jobs, letting them clean up, instead of exiting right away
+                self.events.log("Stopping the run (exit on error) ...", "error")
+                self.stopped_on_error = True
+                self.cancel_token.cancel("exit on error")
+                raise Cancelled("exit on error")
 
         return rapid_model_id
 
+    def _flight_source(self, model_id: int) -> Optional[str]:
+        """Identity of the current job's input for sharing optimizations (None if unknown)."""
+        job = getattr(self._current, "job", None)
+        if job is None:
+            return None
+        if job.model_file.endswith(".id"):
+            return f"id:{model_id}"
+        # Set if inputs are hashed; sampled fingerprints don't identify the content
+        return job.digest if is_exact(job.digest) else None
+
+    def _delete_kept(self, results: List[Tuple[int, str, str]], cleanup: bool) -> None:
+        """Delete optimized models kept for jobs with the same input once none needs them."""
+        fetch_index = self.client.fetch_index
+        for rapid_model_id, _, token in results:
+            if cleanup and (fetch_index is None or not fetch_index.has_model(rapid_model_id)):
+                self.cleaner.schedule(AssetCleaner.RAPID_MODEL, rapid_model_id, token)
+
     def _cleanup_assets(
         self, model_id: int, rapid_model_ids: List[int], delete_base_asset: bool = True
     ) -> None:
-        """Clean up uploaded assets and optimized results."""
-        print("\nCleaning up: deleting optimized results...")
+        """Queue uploaded assets and optimized results for background deletion."""
+        self.events.log("\nCleaning up: queueing optimized results for deletion...")
+        token = self.client.current_token
+        fetch_index = self.client.fetch_index
+        for rapid_model_id in rapid_model_ids:
+            if self.flights.keeps(rapid_model_id):
+                self.events.log(
+                    f"Keeping optimized result (ID: {rapid_model_id}) for jobs with the same input"
+                )
+                continue
+            if fetch_index is not None and fetch_index.has_model(rapid_model_id):
+                self.events.log(
+                    f"Keeping optimized result (ID: {rapid_model_id}) for deferred downloads"
+                )
+                continue
+            self.cleaner.schedule(AssetCleaner.RAPID_MODEL, rapid_model_id, token)
+
         if delete_base_asset:
-            self.client.delete_base_asset(model_id)
+            self.cleaner.schedule(AssetCleaner.BASE_ASSET, model_id, token)
         else:
-            print(
+            self.events.log(
                 f"Skipping deletion of base asset (ID: {model_id}) as it was processed using base asset ID mode"
             )
-
-        for rapid_model_id in rapid_model_ids:
-            self.client.delete_rapid_model(rapid_model_id)
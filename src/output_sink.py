@@ -0,0 +1,475 @@
+import datetime
+import hashlib
+import hmac
+import os
+import re
+import tarfile
+import tempfile
+import threading
+import time
+import urllib.parse
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+from src.event_bus import EventBus
+from src.output_store import OutputStore
+from src.request_utils import RequestUtils
+
+
+class SinkWriter:
+    """A result being written to an output sink.
+
+    Data is passed to write() as it is downloaded. The result only becomes
+    visible at its destination with commit(); discard() (also called when
+    the with block is left by an exception) drops it.
+    """
+
+    def write(self, data: bytes) -> int:
+        raise NotImplementedError
+
+    def commit(self) -> None:
+        raise NotImplementedError
+
+    def discard(self) -> None:
+        raise NotImplementedError
+
+    def __enter__(self) -> "SinkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.discard()
+
+
+class OutputSink:
+    """Destination of downloaded results."""
+
+    # Whether results end up as local files (that can be verified after download)
+    local = False
+
+    def open(self, output_path: str, size: int = 0) -> SinkWriter:
+        """
+        Start writing a result.
+
+        Args:
+            output_path: Output path of the result (relative, e.g. "output/model_1.glb")
+            size: Size of the result in bytes (0 if unknown)
+
+        Returns:
+            SinkWriter: Writer for the result's content
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Finish writing (called once at the end of the run)."""
+
+
+class LocalSink(OutputSink):
+    """Writes results to the local file system, optionally through an output store."""
+
+    local = True
+
+    def __init__(self, store: Optional[OutputStore] = None, events: Optional[EventBus] = None):
+        """
+        Args:
+            store: If given, results are kept in this store and linked to their output paths
+            events: Event bus for warnings
+        """
+        self.store = store
+        self.events = events or EventBus()
+
+    def open(self, output_path: str, size: int = 0) -> SinkWriter:
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.store is not None:
+            return _StoreWriter(self, output_path)
+        return _FileWriter(output_path)
+
+
+class _FileWriter(SinkWriter):
+    """Writes to a ".part" file that replaces the output file on commit."""
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.temp_path = output_path + ".part"
+        self._file = open(self.temp_path, "wb")
+
+    def write(self, data: bytes) -> int:
+        return self._file.write(data)
+
+    def commit(self) -> None:
+        self._file.close()
+        # Replacing (instead of truncating) never writes through a hardlink into an output store
+        os.replace(self.temp_path, self.output_path)
+
+    def discard(self) -> None:
+        self._file.close()
+        if os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)
+
+
+class _StoreWriter(SinkWriter):
+    """Writes into the output store and links the stored object on commit."""
+
+    def __init__(self, sink: LocalSink, output_path: str):
+        self.sink = sink
+        self.output_path = output_path
+        self._pending = sink.store.create()
+
+    def write(self, data: bytes) -> int:
+        return self._pending.write(data)
+
+    def commit(self) -> None:
+        method = self.sink.store.materialize(self._pending.commit(), self.output_path)
+        if method == "copy":
+            self.sink.events.log(
+                f'Warning: "{self.output_path}" was copied from the output store '
+                "(hardlinks and reflinks unavailable)"
+            )
+
+    def discard(self) -> None:
+        self._pending.discard()
+
+
+class S3Sink(OutputSink):
+    """Uploads results to an S3-compatible bucket while they are downloaded.
+
+    Results up to part_size bytes are uploaded with a single PUT, larger
+    ones with a multipart upload of part_size parts, so at most one part per
+    result is held in memory. Requests are signed with AWS signature
+    version 4 and sent through RequestUtils (pooled connections, retries,
+    request statistics). Objects are addressed path-style, which AWS and
+    S3-compatible servers (MinIO, Ceph, ...) all support.
+    """
+
+    MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for all but the last part
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint: str = "",
+        region: str = "us-east-1",
+        access_key: str = "",
+        secret_key: str = "",
+        session_token: str = "",
+        request_utils: Optional[RequestUtils] = None,
+        part_size: int = 8 * 1024 * 1024,
+    ):
+        """
+        Args:
+            bucket: Bucket name
+            prefix: Key prefix the output paths are appended to
+            endpoint: Base URL of the S3 service (defaults to AWS in the region)
+            region: Region used for signing
+            access_key: Access key ID
+            secret_key: Secret access key
+            session_token: Session token of temporary credentials
+            request_utils: HTTP transport
+            part_size: Size of multipart upload parts in bytes
+        """
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.endpoint = (endpoint or f"https://s3.{region}.amazonaws.com").rstrip("/")
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.session_token = session_token
+        self.request_utils = request_utils or RequestUtils()
+        self.part_size = max(self.MIN_PART_SIZE, part_size)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "S3Sink":
+        """
+        Create a sink from an "s3://bucket/prefix" URL.
+
+        Raises:
+            ValueError: If the URL has no bucket
+        """
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme != "s3" or not parts.netloc:
+            raise ValueError(f'invalid S3 URL "{url}" (expected s3://bucket/prefix)')
+        return cls(parts.netloc, parts.path, **kwargs)
+
+    def open(self, output_path: str, size: int = 0) -> SinkWriter:
+        return _S3Writer(self, self.object_key(output_path))
+
+    def object_key(self, output_path: str) -> str:
+        name = output_path.replace(os.sep, "/").lstrip("/")
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def request(
+        self, method: str, key: str, query: Optional[Dict[str, str]] = None, data: bytes = b""
+    ) -> Tuple[Dict[str, str], bytes]:
+        """
+        Send a signed request for an object.
+
+        Args:
+            method: HTTP method
+            key: Object key
+            query: Query parameters
+            data: Request body
+
+        Returns:
+            Tuple[Dict[str, str], bytes]: Response headers and body
+
+        Raises:
+            IOError: If the request failed
+        """
+        path = "/" + urllib.parse.quote(f"{self.bucket}/{key}", safe="/~")
+        query_string = _canonical_query(query or {})
+        url = self.endpoint + path + ("?" + query_string if query_string else "")
+        headers = sign_v4(
+            method, url, hashlib.sha256(data).hexdigest(), self.access_key, self.secret_key,
+            self.region, session_token=self.session_token,
+        )
+        result = self.request_utils.send(method, url, headers, data)
+        if result is None:
+            raise IOError(f'S3 {method} of "{key}" failed')
+        response, body = result
+        return dict(response.headers.items()), body
+
+
+class _S3Writer(SinkWriter):
+    """Buffers one part at a time and uploads it to S3."""
+
+    def __init__(self, sink: S3Sink, key: str):
+        self.sink = sink
+        self.key = key
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._etags: List[str] = []
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.sink.part_size:
+            part = bytes(self._buffer[:self.sink.part_size])
+            del self._buffer[:self.sink.part_size]
+            self._upload_part(part)
+        return len(data)
+
+    def commit(self) -> None:
+        if self._upload_id is None:
+            self.sink.request("PUT", self.key, data=bytes(self._buffer))
+            self._buffer = bytearray()
+            return
+        if self._buffer:
+            self._upload_part(bytes(self._buffer))
+            self._buffer = bytearray()
+        parts = "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in enumerate(self._etags, 1)
+        )
+        body = f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode("utf-8")
+        _, response = self.sink.request("POST", self.key, {"uploadId": self._upload_id}, body)
+        # Errors can be reported with status 200 once the response has started
+        if b"<Error>" in response:
+            raise IOError(f'S3 multipart upload of "{self.key}" failed: {response[:200]!r}')
+
+    def discard(self) -> None:
+        self._buffer = bytearray()
+        if self._upload_id is not None:
+            try:
+                self.sink.request("DELETE", self.key, {"uploadId": self._upload_id})
+            except IOError:
+                pass  # incomplete uploads are removed by the bucket's lifecycle rules
+            self._upload_id = None
+
+    def _upload_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            _, body = self.sink.request("POST", self.key, {"uploads": ""})
+            self._upload_id = _xml_text(body, "UploadId")
+            if not self._upload_id:
+                raise IOError(f'S3 didn\'t return an upload ID for "{self.key}"')
+        query = {"partNumber": str(len(self._etags) + 1), "uploadId": self._upload_id}
+        headers, _ = self.sink.request("PUT", self.key, query, data)
+        etag = next((value for name, value in headers.items() if name.lower() == "etag"), "")
+        self._etags.append(etag)
+
+
+class TarSink(OutputSink):
+    """Writes results as a tar stream, e.g. to stdout for piping into another tool.
+
+    Results are written one at a time: a download waits until the previous
+    result was written completely. Results of known size are streamed
+    straight through; others are spooled to a temporary file first.
+    """
+
+    SPOOL_SIZE = 8 * 1024 * 1024  # in memory before spooling to disk
+
+    def __init__(self, stream: BinaryIO, events: Optional[EventBus] = None):
+        """
+        Args:
+            stream: Binary stream the archive is written to
+            events: Event bus for errors
+        """
+        self.stream = stream
+        self.events = events or EventBus()
+        self.lock = threading.Lock()
+
+    def open(self, output_path: str, size: int = 0) -> SinkWriter:
+        return _TarWriter(self, output_path.replace(os.sep, "/"), size)
+
+    def close(self) -> None:
+        with self.lock:
+            self.stream.write(b"\0" * (2 * tarfile.BLOCKSIZE))
+            self.stream.flush()
+
+
+class _TarWriter(SinkWriter):
+    """Writes one member of a tar stream."""
+
+    def __init__(self, sink: TarSink, name: str, size: int):
+        self.sink = sink
+        self.name = name
+        self.size = size
+        self.written = 0
+        self._spool = None
+        if size:
+            sink.lock.acquire()
+            self._write_header(size)
+        else:
+            self._spool = tempfile.SpooledTemporaryFile(TarSink.SPOOL_SIZE)
+
+    def write(self, data: bytes) -> int:
+        if self._spool is not None:
+            return self._spool.write(data)
+        data = data[:self.size - self.written]
+        self.sink.stream.write(data)
+        self.written += len(data)
+        return len(data)
+
+    def commit(self) -> None:
+        if self._spool is not None:
+            self.size = self._spool.tell()
+            self._spool.seek(0)
+            with self.sink.lock:
+                self._write_header(self.size)
+                while True:
+                    chunk = self._spool.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    self.sink.stream.write(chunk)
+                    self.written += len(chunk)
+                self._finish()
+            self._spool.close()
+            return
+        self._finish()
+        self.sink.lock.release()
+
+    def discard(self) -> None:
+        if self._spool is not None:
+            self._spool.close()
+            return
+        # The header is out already: complete the member with zeros to keep the archive readable
+        self.sink.events.log(f'Error: "{self.name}" is incomplete in the tar stream.', "error")
+        self._finish()
+        self.sink.lock.release()
+
+    def _write_header(self, size: int) -> None:
+        info = tarfile.TarInfo(self.name)
+        info.size = size
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self.sink.stream.write(info.tobuf(tarfile.PAX_FORMAT))
+
+    def _finish(self) -> None:
+        """Pad the member to its size and to the tar block size."""
+        missing = self.size - self.written
+        padding = -self.size % tarfile.BLOCKSIZE
+        self.sink.stream.write(b"\0" * (missing + padding))
+        self.sink.stream.flush()
+
+
+def sign_v4(
+    method: str,
+    url: str,
+    payload_hash: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    service: str = "s3",
+    session_token: str = "",
+    now: Optional[datetime.datetime] = None,
+) -> Dict[str, str]:
+    """
+    Sign a request with AWS signature version 4.
+
+    Args:
+        method: HTTP method
+        url: Request URL; its path and query must be URI-encoded already
+            (query parameters sorted, as produced by _canonical_query)
+        payload_hash: Hex SHA-256 of the request body
+        access_key: Access key ID
+        secret_key: Secret access key
+        region: Region name
+        service: Service name
+        session_token: Session token of temporary credentials
+        now: Signing time (defaults to the current time)
+
+    Returns:
+        Dict[str, str]: The headers to send, including Authorization
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = amz_date[:8]
+    parts = urllib.parse.urlsplit(url)
+
+    headers = {
+        "Host": parts.netloc,
+        "x-amz-content-sha256": payload_hash,
+        "x-amz-date": amz_date,
+    }
+    if session_token:
+        headers["x-amz-security-token"] = session_token
+    canonical_headers = sorted(
+        (name.lower(), re.sub(r"\s+", " ", value.strip())) for name, value in headers.items()
+    )
+    signed_headers = ";".join(name for name, _ in canonical_headers)
+    canonical_request = "\n".join([
+        method,
+        parts.path or "/",
+        parts.query,
+        "".join(f"{name}:{value}\n" for name, value in canonical_headers),
+        signed_headers,
+        payload_hash,
+    ])
+
+    scope = f"{date}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    key = ("AWS4" + secret_key).encode("utf-8")
+    for part in (date, region, service, "aws4_request"):
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    headers["Authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+    return headers
+
+
+def _canonical_query(query: Dict[str, str]) -> str:
+    """URI-encode and sort query parameters as required for signing."""
+    encoded = sorted(
+        (urllib.parse.quote(name, safe="~"), urllib.parse.quote(value, safe="~"))
+        for name, value in query.items()
+    )
+    return "&".join(f"{name}={value}" for name, value in encoded)
+
+
+def _xml_text(document: bytes, tag: str) -> Optional[str]:
+    """Text of the first element with a tag (in any namespace) of an XML document."""
+    try:
+        root = ElementTree.fromstring(document)
+    except ElementTree.ParseError:
+        return None
+    for element in root.iter():
+        if element.tag == tag or element.tag.endswith("}" + tag):
+            return element.text
+    return None
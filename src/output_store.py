@@ -0,0 +1,153 @@
+import errno
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from typing import Optional
+from src.event_bus import EventBus
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+
+class PendingObject:
+    """A file being written into the store, hashed while it is written."""
+
+    def __init__(self, store: "OutputStore"):
+        self.store = store
+        self._hasher = hashlib.new(store.algorithm)
+        # Opened like a regular output file, so the permissions follow the umask
+        self.temp_path = os.path.join(store.temp_dir, uuid.uuid4().hex)
+        self._file = open(self.temp_path, "xb")
+
+    def write(self, data: bytes) -> int:
+        self._hasher.update(data)
+        return self._file.write(data)
+
+    @property
+    def digest(self) -> str:
+        return self._hasher.hexdigest()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def discard(self) -> None:
+        """Drop the written data."""
+        self.close()
+        try:
+            os.unlink(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+    def commit(self) -> str:
+        """
+        Move the data to its place in the store.
+
+        Returns:
+            str: Path of the stored object (an existing one if the content was stored before)
+        """
+        self.close()
+        object_path = self.store.object_path(self.digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        try:
+            os.link(self.temp_path, object_path)
+        except FileExistsError:
+            self.store.events.log("Identical content is stored already, reusing it.")
+        finally:
+            os.unlink(self.temp_path)
+        return object_path
+
+    def __enter__(self) -> "PendingObject":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.close()
+
+
+class OutputStore:
+    """Content-addressed store for downloaded results.
+
+    Downloads are hashed while they are streamed to a temporary file and
+    kept once under their digest in <root>/objects. Output files are then
+    materialized from the stored object as a hardlink, a reflink (copy on
+    write clone, e.g. on Btrfs or XFS) or, if neither is possible, a copy.
+    Repeated identical results therefore cost no extra disk space.
+
+    Materialized hardlinks share their content with the store, so output
+    files must be replaced rather than modified in place.
+    """
+
+    FICLONE = 0x40049409  # Linux ioctl cloning a whole file
+
+    def __init__(
+        self,
+        root: str = ".output_store",
+        algorithm: str = "sha256",
+        events: Optional[EventBus] = None,
+    ):
+        """
+        Args:
+            root: Store directory (ideally on the same file system as the outputs)
+            algorithm: hashlib algorithm name
+            events: Event bus for status messages
+        """
+        hashlib.new(algorithm)  # raises ValueError if unsupported
+        self.root = root
+        self.algorithm = algorithm
+        self.events = events or EventBus()
+        self.temp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def create(self) -> PendingObject:
+        """Start writing a new object."""
+        return PendingObject(self)
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def materialize(self, object_path: str, output_path: str) -> str:
+        """
+        Place a stored object at an output path, replacing an existing file.
+
+        Args:
+            object_path: Path of the stored object
+            output_path: Path of the output file
+
+        Returns:
+            str: How the file was materialized ("existing", "hardlink", "reflink" or "copy")
+        """
+        if os.path.exists(output_path) and os.path.samefile(object_path, output_path):
+            return "existing"
+        temp_path = f"{output_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            method = self._link(object_path, temp_path)
+            os.replace(temp_path, output_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return method
+
+    def _link(self, object_path: str, path: str) -> str:
+        """Create path with the content of a stored object, as cheaply as possible."""
+        try:
+            os.link(object_path, path)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EMLINK, errno.EPERM, errno.ENOTSUP):
+                raise
+        if fcntl is not None:
+            try:
+                with open(object_path, "rb") as src, open(path, "wb") as dst:
+                    fcntl.ioctl(dst.fileno(), self.FICLONE, src.fileno())
+                return "reflink"
+            except OSError:
+                os.unlink(path)
+        shutil.copyfile(object_path, path)
+        return "copy"
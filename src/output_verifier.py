@@ -0,0 +1,99 @@
+import mmap
+import os
+import zipfile
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+from src.model_inspector import ModelInspector
+
+
+class OutputVerifier:
+    """Checks downloaded results for truncation and corruption.
+
+    - GLB: header, total length and chunk table, checked through a memory
+      map without reading the buffers
+    - USDZ and ZIP (e.g. .obj.zip): central directory and the CRC of every
+      member, streamed by zipfile
+    - other formats: the file must not be empty
+
+    Files are verified on a small thread pool, so checking one result
+    overlaps with downloading the next.
+    """
+
+    ZIP_EXTENSIONS = (".zip", ".usdz")
+    USD_EXTENSIONS = (".usd", ".usda", ".usdc")
+
+    def __init__(self, workers: int = 2):
+        """
+        Args:
+            workers: Number of files verified concurrently
+        """
+        self._pool = ThreadPoolExecutor(max(1, workers), thread_name_prefix="verifier")
+
+    def submit(self, path: str) -> "Future[List[str]]":
+        """
+        Verify a file in the background.
+
+        Args:
+            path: Path of the downloaded file
+
+        Returns:
+            Future[List[str]]: Resolves to the problems found (empty if intact)
+        """
+        return self._pool.submit(self.verify, path)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    @classmethod
+    def verify(cls, path: str) -> List[str]:
+        """
+        Verify a file.
+
+        Args:
+            path: Path of the file
+
+        Returns:
+            List[str]: Problems found (empty if the file is intact)
+        """
+        try:
+            if os.path.getsize(path) == 0:
+                return ["file is empty"]
+            lower = path.lower()
+            if lower.endswith(".glb"):
+                return cls._verify_glb(path)
+            if lower.endswith(cls.ZIP_EXTENSIONS):
+                return cls._verify_zip(path, usdz=lower.endswith(".usdz"))
+            return []
+        except OSError as e:
+            return [f"cannot read file: {e}"]
+
+    @staticmethod
+    def _verify_glb(path: str) -> List[str]:
+        """Check the GLB header and chunk lengths."""
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    errors: List[str] = []
+                    ModelInspector.check_glb_container(view, errors)
+                    return errors
+                finally:
+                    view.release()
+
+    @classmethod
+    def _verify_zip(cls, path: str, usdz: bool = False) -> List[str]:
+        """Check the central directory and member CRCs of a ZIP based file."""
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = archive.infolist()
+                if not members:
+                    return ["archive is empty"]
+                bad_member = archive.testzip()
+                if bad_member is not None:
+                    return [f'CRC mismatch in "{bad_member}"']
+                if usdz and not members[0].filename.lower().endswith(cls.USD_EXTENSIONS):
+                    return ["first file of the USDZ package isn't a USD layer"]
+        except (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError) as e:
+            return [f"corrupt archive: {e}"]
+        return []
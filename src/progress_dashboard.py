@@ -0,0 +1,277 @@
+import shutil
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, TextIO, Tuple
+from src.event_bus import (
+    Event,
+    EventSink,
+    LogEvent,
+    ProgressEvent,
+    StateEvent,
+    ThroughputEvent,
+    TransferEvent,
+    TransferProgressEvent,
+)
+
+
+class JobView:
+    """Display state of a single in-flight job."""
+
+    def __init__(self, key: str, now: float):
+        self.key = key
+        self.label = ""
+        self.stage = ""
+        self.step = ""
+        self.progress: Optional[int] = None
+        self.started = now
+        self.progress_started: Optional[float] = None
+        self.progress_first = 0
+        self.transfer_bytes = 0
+        self.transfer_total = 0
+        self.transfer_started: Optional[float] = None
+
+    def speed(self, now: float) -> float:
+        """Current transfer speed in bytes per second."""
+        if self.transfer_started is None or now <= self.transfer_started:
+            return 0.0
+        return self.transfer_bytes / (now - self.transfer_started)
+
+    def eta(self, now: float) -> Optional[float]:
+        """Estimated seconds until the current stage completes, if known."""
+        if self.transfer_total and self.transfer_bytes:
+            speed = self.speed(now)
+            if speed > 0:
+                return (self.transfer_total - self.transfer_bytes) / speed
+        if self.progress is not None and self.progress_started is not None:
+            done = self.progress - self.progress_first
+            elapsed = now - self.progress_started
+            if done > 0 and elapsed > 0:
+                return (100 - self.progress) * elapsed / done
+        return None
+
+
+class ProgressDashboard(EventSink):
+    """Throttled multi-line dashboard of all in-flight jobs.
+
+    On a terminal, the dashboard is redrawn at a fixed refresh rate and only
+    when its content changed; log messages are printed above it. When the
+    output is not a terminal, a single summary line is printed periodically
+    instead.
+
+    The upload and download rates are the live throughput reported by the
+    TransferManager, else the averages since the start.
+    """
+
+    FINISHED_STATES = ("done", "failed", "cancelled")
+    RELEASED_STATES = ("complete",)
+    THROUGHPUT_TIMEOUT = 3.0  # seconds after which the last reported throughput is stale
+
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        refresh_rate: float = 4.0,
+        summary_interval: float = 10.0,
+        interactive: Optional[bool] = None,
+    ):
+        """
+        Args:
+            stream: Output stream (defaults to sys.stdout)
+            refresh_rate: Maximum redraws per second on a terminal
+            summary_interval: Seconds between summary lines when not on a terminal
+            interactive: Force terminal (True) or summary (False) mode
+        """
+        self.stream = stream or sys.stdout
+        if interactive is None:
+            interactive = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.interactive = interactive
+        self.interval = 1.0 / refresh_rate
+        self.summary_interval = summary_interval
+        self._last_summary = 0.0
+
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, JobView] = {}
+        self._logs: List[str] = []
+        self._started = time.time()
+        self._done = 0
+        self._failed = 0
+        self._bytes = {"upload": 0, "download": 0}
+        self._throughput: Optional[ThroughputEvent] = None
+        self._drawn_lines = 0
+        self._last_frame = ""
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="progress-dashboard", daemon=True
+        )
+        self._thread.start()
+
+    def handle(self, event: Event) -> None:
+        with self._lock:
+            now = event.timestamp
+            if isinstance(event, LogEvent):
+                self._logs.append(event.message)
+            elif isinstance(event, StateEvent):
+                self._handle_state(event, now)
+            elif isinstance(event, ProgressEvent):
+                job = self._job(event.job, now)
+                if job.progress_started is None:
+                    job.progress_started = now
+                    job.progress_first = event.progress
+                job.progress = event.progress
+                job.step = event.step
+            elif isinstance(event, TransferProgressEvent):
+                job = self._job(event.job, now)
+                if job.transfer_started is None or event.bytes < job.transfer_bytes:
+                    job.transfer_started = now
+                job.stage = job.stage or event.direction
+                job.transfer_bytes = event.bytes
+                job.transfer_total = event.total
+            elif isinstance(event, ThroughputEvent):
+                self._throughput = event
+            elif isinstance(event, TransferEvent):
+                self._bytes[event.direction] = self._bytes.get(event.direction, 0) + event.bytes
+                job = self._jobs.get(event.job)
+                if job is not None:
+                    job.transfer_started = None
+                    job.transfer_bytes = job.transfer_total = 0
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._render(final=True)
+
+    def _handle_state(self, event: StateEvent, now: float) -> None:
+        """Update job rows on state transitions. Caller holds the lock."""
+        if event.state in self.FINISHED_STATES or event.state in self.RELEASED_STATES:
+            self._jobs.pop(event.job, None)
+            if event.state == "done":
+                self._done += 1
+            elif event.state == "failed":
+                self._failed += 1
+            return
+
+        job = self._job(event.job, now)
+        if event.label:
+            job.label = event.label
+        if event.state != job.stage:
+            job.stage = event.state
+            job.progress = None
+            job.progress_started = None
+
+    def _job(self, key: str, now: float) -> JobView:
+        """Get or create the row for a job. Caller holds the lock."""
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = JobView(key, now)
+        return job
+
+    def _run(self) -> None:
+        """Render loop running at the configured refresh rate."""
+        while not self._stop.wait(self.interval):
+            self._render()
+
+    def _render(self, final: bool = False) -> None:
+        """Print pending log lines and redraw the dashboard if it changed."""
+        now = time.time()
+        with self._lock:
+            logs, self._logs = self._logs, []
+            if self.interactive:
+                frame = [] if final else self._frame(now)
+            elif self._jobs and now - self._last_summary >= self.summary_interval:
+                frame = [self._summary_line(now)]
+                self._last_summary = now
+            else:
+                frame = []
+            text = "\n".join(frame)
+            changed = text != self._last_frame
+            if not logs and not changed:
+                return
+            if self.interactive:
+                self._last_frame = text
+
+        out = []
+        if self.interactive and self._drawn_lines:
+            out.append(f"\x1b[{self._drawn_lines}F\x1b[J")
+        out.extend(line + "\n" for line in logs)
+        if frame:
+            out.append(text + "\n")
+        self._drawn_lines = len(frame) if self.interactive else 0
+        self.stream.write("".join(out))
+        self.stream.flush()
+
+    def _frame(self, now: float) -> List[str]:
+        """Build the dashboard lines. Caller holds the lock."""
+        if not self._jobs:
+            return []
+        width = shutil.get_terminal_size((100, 20)).columns - 1
+        lines = [self._summary_line(now)[:width]]
+        for job in sorted(self._jobs.values(), key=lambda j: j.started):
+            lines.append(self._job_line(job, now)[:width])
+        return lines
+
+    def _summary_line(self, now: float) -> str:
+        """Overall throughput line."""
+        elapsed = max(now - self._started, 1e-6)
+        upload, download = self._rates(now, elapsed)
+        line = (
+            f"Jobs: {len(self._jobs)} active, {self._done} done, {self._failed} failed"
+            f"  |  {self._done * 60 / elapsed:.1f} jobs/min"
+            f"  |  up {_format_rate(upload)}"
+            f"  down {_format_rate(download)}"
+        )
+        if not self.interactive:
+            line = time.strftime("[%H:%M:%S] ") + line
+            steps = [
+                f"{job.label or job.key}: {job.stage}"
+                + (f" {job.progress}%" if job.progress is not None else "")
+                for job in self._jobs.values()
+            ]
+            line += "  |  " + ", ".join(steps)
+        return line
+
+    def _rates(self, now: float, elapsed: float) -> Tuple[float, float]:
+        """Upload and download rates in bytes per second."""
+        event = self._throughput
+        if event is None:
+            return self._bytes["upload"] / elapsed, self._bytes["download"] / elapsed
+        if now - event.timestamp > self.THROUGHPUT_TIMEOUT:
+            return 0.0, 0.0
+        return event.upload, event.download
+
+    def _job_line(self, job: JobView, now: float) -> str:
+        """Single dashboard row for a job."""
+        name = (job.label or job.key)[:32]
+        parts = [f"  {name:<32} {job.stage:<14}"]
+        if job.transfer_total:
+            percent = int(100 * job.transfer_bytes / job.transfer_total)
+            parts.append(f"{_make_bar(percent)} {percent:>3}%  {_format_rate(job.speed(now))}")
+        elif job.progress is not None:
+            parts.append(f"{_make_bar(job.progress)} {job.progress:>3}%  {job.step}")
+        else:
+            parts.append(f"{_format_duration(now - job.started)} elapsed")
+        eta = job.eta(now)
+        if eta is not None:
+            parts.append(f"ETA {_format_duration(eta)}")
+        return "  ".join(parts)
+
+
+def _make_bar(progress: int, width: int = 20) -> str:
+    """Create a text-based progress bar."""
+    filled = int(width * min(max(progress, 0), 100) / 100)
+    return "[" + "#" * filled + "_" * (width - filled) + "]"
+
+
+def _format_rate(bytes_per_second: float) -> str:
+    """Format a transfer rate."""
+    for unit in ("B/s", "KB/s", "MB/s"):
+        if bytes_per_second < 1024:
+            return f"{bytes_per_second:.1f} {unit}"
+        bytes_per_second /= 1024
+    return f"{bytes_per_second:.1f} GB/s"
+
+
+def _format_duration(seconds: float) -> str:
+    """Format a duration as e.g. "1m 05s"."""
+    seconds = int(seconds)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
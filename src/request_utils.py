@@ -1,9 +1,14 @@
 import urllib.request
 import urllib.error
+import urllib.parse
 import json
-from typing import Dict, Optional
+import re
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
 import time
 from http.client import HTTPResponse
+from src.event_bus import EventBus, RequestEndEvent, RequestStartEvent
+from src.api_stats import ApiStats
+from src.connection_pool import ConnectionPool
 
 class RequestUtils:
     """Utility class for handling HTTP requests to the RapidPipeline API."""
@@ -11,6 +16,16 @@ class RequestUtils:
     MAX_RETRIES = 3
     RETRY_DELAY = 30  # seconds
 
+    def __init__(self, events: Optional[EventBus] = None):
+        self.events = events or EventBus()
+        self.stats = ApiStats()
+        self.pool = ConnectionPool()
+        self._proxies = urllib.request.getproxies()
+        # Called with each request answered with 429 Too Many Requests
+        self.on_rate_limit: Optional[Callable[[urllib.request.Request], None]] = None
+        # Called with the endpoint, status and latency of each finished attempt
+        self.on_request_end: Optional[Callable[[str, int, float], None]] = None
+
     def get_json(self, url: str, headers: Dict[str, str]) -> Optional[Dict]:
         """
         Perform a GET request and return JSON response.
@@ -55,8 +70,63 @@ class RequestUtils:
             bool: True if successful, False otherwise
         """
         request = urllib.request.Request(url, data=data, method="PUT")
+        return self._execute_and_discard(request)
+
+    def put_stream(self, url: str, stream: BinaryIO, length: int) -> bool:
+        """
+        Perform a PUT request streaming the body from a file-like object.
+
+        The body is sent in chunks instead of being loaded into memory. The
+        stream is rewound with seek(0) if the request has to be retried.
+
+        Args:
+            url: The endpoint URL
+            stream: Readable, rewindable binary stream
+            length: Exact number of bytes the stream produces
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        request = urllib.request.Request(
+            url, data=stream, headers={"Content-Length": str(length)}, method="PUT"
+        )
+        return self._execute_and_discard(request)
+
+    def open_stream(self, url: str) -> Optional[HTTPResponse]:
+        """
+        Perform a GET request and return the unread response for streaming.
+
+        Args:
+            url: The URL to download from
+
+        Returns:
+            Optional[HTTPResponse]: Response to read from (caller closes it) or None
+        """
+        request = urllib.request.Request(url)
+        return self._execute_request(request)
+
+    def send(
+        self, method: str, url: str, headers: Dict[str, str], data: Optional[bytes] = None
+    ) -> Optional[Tuple[HTTPResponse, bytes]]:
+        """
+        Perform a request and read the whole response body.
+
+        Args:
+            method: HTTP method
+            url: The endpoint URL
+            headers: Request headers
+            data: Request body
+
+        Returns:
+            Optional[Tuple[HTTPResponse, bytes]]: The (closed) response, for its
+            headers, and its body, or None if the request failed
+        """
+        request = urllib.request.Request(url, data=data, headers=headers, method=method)
         response = self._execute_request(request)
-        return response is not None
+        if response is None:
+            return None
+        with response:
+            return response, response.read()
 
     def delete(self, url: str, headers: Dict[str, str]) -> bool:
         """
@@ -70,8 +140,24 @@ class RequestUtils:
             bool: True if successful, False otherwise
         """
         request = urllib.request.Request(url, headers=headers, method="DELETE")
+        return self._execute_and_discard(request)
+
+    def _execute_and_discard(self, request: urllib.request.Request) -> bool:
+        """
+        Execute a request whose response body isn't needed.
+
+        Args:
+            request: The prepared request
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
         response = self._execute_request(request)
-        return response is not None
+        if response is None:
+            return False
+        with response:
+            response.read()
+        return True
 
     def _execute_json_request(self, request: urllib.request.Request) -> Optional[Dict]:
         """
@@ -90,7 +176,7 @@ class RequestUtils:
         try:
             return json.loads(response.read().decode("utf-8"))
         except json.JSONDecodeError as e:
-            print(f"ERROR: Failed to parse JSON response: {e}")
+            self.events.log(f"ERROR: Failed to parse JSON response: {e}", "error")
             return None
 
     def _execute_request(
@@ -105,60 +191,146 @@ class RequestUtils:
         Returns:
             Optional[HTTPResponse]: Response object or None if all retries failed
         """
+        method = request.get_method()
+        endpoint = self.endpoint_template(request.full_url)
+        if isinstance(request.data, bytes):
+            bytes_sent = len(request.data)
+        else:
+            bytes_sent = int(request.get_header("Content-length") or 0)
+
         retries = 0
         while retries < self.MAX_RETRIES:
+            self.events.emit(RequestStartEvent(method, endpoint, bytes_sent))
+            start_time = time.perf_counter()
             try:
-                return urllib.request.urlopen(request)
+                response, reused = self._open(request)
+                self._emit_request_end(
+                    method, endpoint, start_time, bytes_sent, response.status, response, reused
+                )
+                return response
             except urllib.error.HTTPError as e:
+                self._emit_request_end(method, endpoint, start_time, bytes_sent, e.code)
                 if e.code == 429:  # Too Many Requests
                     retries += 1
+                    if self.on_rate_limit is not None:
+                        self.on_rate_limit(request)
                     if retries < self.MAX_RETRIES:
-                        print(
+                        e.read()  # drain the body so the connection can be reused
+                        self.stats.record_retry()
+                        self.events.log(
                             f"Rate limit exceeded. Retrying in {self.RETRY_DELAY} seconds..."
                         )
                         time.sleep(self.RETRY_DELAY)
+                        if hasattr(request.data, "seek"):
+                            request.data.seek(0)
                         continue
                 self._handle_http_error(e)
                 return None
             except urllib.error.URLError as e:
+                self._emit_request_end(method, endpoint, start_time, bytes_sent, 0)
                 self._handle_url_error(e)
                 return None
             except Exception as e:
-                print(f"ERROR: Unexpected error occurred: {e}")
+                self._emit_request_end(method, endpoint, start_time, bytes_sent, 0)
+                self.events.log(f"ERROR: Unexpected error occurred: {e}", "error")
                 return None
 
+    def _open(self, request: urllib.request.Request):
+        """
+        Open a request on a pooled keep-alive connection.
+
+        Requests that have to go through a configured proxy use urllib instead.
+
+        Args:
+            request: The prepared request
+
+        Returns:
+            Tuple of the response and whether an open connection was reused
+        """
+        if request.type in self._proxies:
+            return urllib.request.urlopen(request), False
+        return self.pool.urlopen(request)
+
+    def _emit_request_end(
+        self,
+        method: str,
+        endpoint: str,
+        start_time: float,
+        bytes_sent: int,
+        status: int,
+        response: Optional[HTTPResponse] = None,
+        reused: bool = False,
+    ) -> None:
+        """Record a finished attempt and emit a RequestEndEvent for it."""
+        latency = time.perf_counter() - start_time
+        bytes_received = self.content_length(response)
+        self.stats.record(
+            method, endpoint, status, latency, bytes_sent, bytes_received, reused
+        )
+        self.events.emit(
+            RequestEndEvent(method, endpoint, status, latency, bytes_sent, bytes_received)
+        )
+        if self.on_request_end is not None:
+            self.on_request_end(endpoint, status, latency)
+
+    @staticmethod
+    def endpoint_template(url: str) -> str:
+        """
+        Reduce a URL to a low-cardinality endpoint name for reporting.
+
+        Args:
+            url: The request URL
+
+        Returns:
+            str: API path with numeric IDs replaced by "{id}", or "s3" for
+            presigned storage URLs
+        """
+        parsed = urllib.parse.urlsplit(url)
+        if "/api/" not in parsed.path:
+            return "s3"
+        path = parsed.path.split("/api/", 1)[1]
+        path = path.split("/", 1)[1] if "/" in path else path  # strip version
+        return re.sub(r"(?<=/)\d+(?=/|$)|^\d+(?=/|$)", "{id}", path)
+
+    @staticmethod
+    def content_length(response: Optional[HTTPResponse]) -> int:
+        """Return the announced response size, or 0 if unknown."""
+        if response is None:
+            return 0
+        try:
+            return int(response.headers.get("Content-Length") or 0)
+        except ValueError:
+            return 0
+
     def _handle_http_error(self, error: urllib.error.HTTPError) -> None:
         """
-        Handle HTTP errors and print relevant information.
+        Handle HTTP errors and report relevant information.
 
         Args:
             error: The HTTP error
         """
-        print("=" * 50)
-        print(f"ERROR: The server returned HTTP {error.code}")
-        print(f"Reason: {error.reason}")
+        lines = ["=" * 50, f"ERROR: The server returned HTTP {error.code}", f"Reason: {error.reason}"]
 
         try:
             error_body = error.read().decode("utf-8")
             error_json = json.loads(error_body)
-            print(f"Server message: {error_json.get('message', 'No message provided')}")
+            lines.append(f"Server message: {error_json.get('message', 'No message provided')}")
             if "errors" in error_json:
-                print("Detailed errors:")
-                print(json.dumps(error_json["errors"], indent=2))
+                lines.append("Detailed errors:")
+                lines.append(json.dumps(error_json["errors"], indent=2))
         except (json.JSONDecodeError, AttributeError):
-            print(
+            lines.append(
                 f"Raw error response: {error_body if 'error_body' in locals() else 'No response body'}"
             )
-        print("=" * 50)
+        lines.append("=" * 50)
+        self.events.log("\n".join(lines), "error")
 
     def _handle_url_error(self, error: urllib.error.URLError) -> None:
         """
-        Handle URL errors and print relevant information.
+        Handle URL errors and report relevant information.
 
         Args:
             error: The URL error
         """
-        print("=" * 50)
-        print("ERROR: Failed to reach the server")
-        print(f"Reason: {error.reason}")
-        print("=" * 50)
+        lines = ["=" * 50, "ERROR: Failed to reach the server", f"Reason: {error.reason}", "=" * 50]
+        self.events.log("\n".join(lines), "error")
@@ -0,0 +1,52 @@
+import os
+import signal
+import sys
+import threading
+from typing import Callable, Optional
+from src.event_bus import EventBus
+
+
+class ShutdownHandler:
+    """Drains the run on the first SIGINT/SIGTERM and force-exits on the second.
+
+    The drain callback runs on its own thread, as it may take locks held by
+    the interrupted main thread. After a drain, signum is the number of the
+    signal, so the process can exit with 128 + signum like a killed one.
+    """
+
+    SIGNALS = ("SIGINT", "SIGTERM")
+    CLOSE_TIMEOUT = 1.0  # seconds to wait for pending messages on a forced exit
+
+    def __init__(self, drain: Callable[[], None], events: Optional[EventBus] = None):
+        """
+        Args:
+            drain: Stops the run gracefully (see ModelProcessor.drain)
+            events: Event bus for status messages
+        """
+        self.drain = drain
+        self.events = events or EventBus()
+        self.signum = 0
+
+    def install(self) -> None:
+        """Handle the signals (must be called on the main thread)."""
+        for name in self.SIGNALS:
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), self._handle)
+
+    def _handle(self, signum, frame) -> None:
+        name = signal.Signals(signum).name
+        if self.signum:
+            self.events.log(f"\n{name} received while stopping, exiting without waiting.", "error")
+            # Show the pending messages, unless a sink is stuck
+            closer = threading.Thread(target=self.events.close, daemon=True)
+            closer.start()
+            closer.join(self.CLOSE_TIMEOUT)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(128 + signum)
+        self.signum = signum
+        self.events.log(
+            f"\n{name} received: finishing downloads in progress and checkpointing "
+            "the other jobs (send it again to exit at once) ..."
+        )
+        threading.Thread(target=self.drain, name="drain", daemon=True).start()
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+from src.cancellation import CancelToken
+
+
+class Flight:
+    """An optimization in flight and the jobs waiting for it."""
+
+    def __init__(self):
+        # (rapid model ID, output prefix, token name) of the leader's results,
+        # None if the leader failed or was stopped
+        self.result: Optional[Tuple[int, str, str]] = None
+        self.finished = False
+        self.followers = 0
+
+
+class SingleFlight:
+    """Lets jobs share identical optimizations in flight.
+
+    The first job to optimize an input with a preset (see flight_key) leads:
+    it submits the optimization and downloads the results. Jobs asking for
+    the same while it is in flight follow: they wait for the leader and take
+    its results instead of submitting a duplicate. The leader only moves on
+    (and eventually deletes its optimized model) once its followers have
+    their copies. If the leader fails, a follower leads the next attempt.
+
+    Jobs announced with expect() (e.g. inputs of a directory with the same
+    content) needn't be in flight at the same time: results for their
+    input are kept after the leader finishes until all of them are done,
+    so the later jobs take them over even with a single worker.
+    """
+
+    CANCEL_CHECK_INTERVAL = 1.0  # seconds between cancellation checks while waiting
+
+    def __init__(self):
+        self.shared = 0  # optimizations taken over from a leader
+        self._flights: Dict[str, Flight] = {}
+        self._kept: Dict[str, Flight] = {}  # finished flights kept for expected jobs
+        self._expected: Dict[str, int] = {}  # input -> announced jobs not done yet
+        self._condition = threading.Condition()
+
+    def join(self, key: str) -> Tuple[bool, Flight]:
+        """
+        Lead or follow the flight of a key.
+
+        Args:
+            key: Input and preset (see flight_key)
+
+        Returns:
+            Tuple[bool, Flight]: Whether the caller leads (then it must call
+            finish()) and the flight (a follower must call wait())
+        """
+        with self._condition:
+            flight = self._flights.get(key) or self._kept.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight()
+                return True, flight
+            flight.followers += 1
+            return False, flight
+
+    def finish(self, key: str, flight: Flight, result: Optional[Tuple[int, str, str]]) -> None:
+        """
+        End a led flight and wait until the followers are done with its result.
+
+        Args:
+            key: Key of the flight
+            flight: The flight
+            result: (rapid model ID, output prefix, token name), None on failure
+        """
+        with self._condition:
+            del self._flights[key]
+            flight.result = result
+            flight.finished = True
+            if result is not None and self._expected.get(_source(key)):
+                self._kept[key] = flight
+            self._condition.notify_all()
+            while flight.followers:
+                self._condition.wait()
+
+    def wait(
+        self, flight: Flight, cancel_token: Optional[CancelToken] = None
+    ) -> Optional[Tuple[int, str, str]]:
+        """
+        Wait for the leader of a followed flight.
+
+        The caller must call leave() once it is done with the result.
+
+        Args:
+            flight: The flight
+            cancel_token: Stops waiting (leaving the flight and raising
+                Cancelled) when cancelled
+
+        Returns:
+            Optional[Tuple[int, str, str]]: The leader's result, None if it failed
+        """
+        with self._condition:
+            while not flight.finished:
+                if cancel_token is not None and cancel_token.cancelled:
+                    flight.followers -= 1
+                    self._condition.notify_all()
+                    cancel_token.check()
+                self._condition.wait(self.CANCEL_CHECK_INTERVAL if cancel_token else None)
+            return flight.result
+
+    def leave(self, flight: Flight, shared: bool = False) -> None:
+        """
+        Let the leader of a flight move on.
+
+        Args:
+            flight: The followed flight
+            shared: Whether the follower took over the leader's results
+        """
+        with self._condition:
+            flight.followers -= 1
+            if shared:
+                self.shared += 1
+            self._condition.notify_all()
+
+    def expect(self, source: str) -> None:
+        """
+        Announce a job whose input other jobs share, so results for it are kept.
+
+        Args:
+            source: Content digest of the input (see flight_key)
+        """
+        with self._condition:
+            self._expected[source] = self._expected.get(source, 0) + 1
+
+    def done(self, source: str) -> List[Tuple[int, str, str]]:
+        """
+        Count an announced job as done.
+
+        Args:
+            source: Content digest of the job's input
+
+        Returns:
+            List[Tuple[int, str, str]]: Results kept for the input that no job
+            needs any more (the caller deletes their optimized models)
+        """
+        with self._condition:
+            remaining = self._expected.get(source, 0) - 1
+            if remaining > 0:
+                self._expected[source] = remaining
+                return []
+            self._expected.pop(source, None)
+            keys = [key for key in self._kept if _source(key) == source]
+            return [self._kept.pop(key).result for key in keys]
+
+    def release(self) -> List[Tuple[int, str, str]]:
+        """Forget all announced jobs (e.g. at the end of a run) and return the kept results."""
+        with self._condition:
+            self._expected.clear()
+            kept, self._kept = self._kept, {}
+        return [flight.result for flight in kept.values()]
+
+    def keeps(self, rapid_model_id: int) -> bool:
+        """Whether an optimized model is kept for other jobs (its leader mustn't delete it)."""
+        with self._condition:
+            return any(flight.result[0] == rapid_model_id for flight in self._kept.values())
+
+
+def flight_key(source: str, preset: Dict) -> str:
+    """
+    Key of an optimization: the input's identity and the preset sent to the API.
+
+    Args:
+        source: Content digest of the input or "id:<base asset ID>"
+        preset: Preset configuration as submitted
+
+    Returns:
+        str: The key
+    """
+    fingerprint = hashlib.sha1(json.dumps(preset, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{source}#{fingerprint}"
+
+
+def _source(key: str) -> str:
+    """Input identity of a flight key."""
+    return key.rsplit("#", 1)[0]
@@ -0,0 +1,150 @@
+import threading
+import time
+from typing import Dict, List, Optional
+from src.cancellation import CancelToken
+
+
+class ApiToken:
+    """An API token with its concurrency quota and usage."""
+
+    def __init__(
+        self, name: str, secret: str, max_concurrency: int = 0, max_optimizations: int = 0
+    ):
+        """
+        Args:
+            name: Name used in messages and state files (never the secret)
+            secret: The token itself
+            max_concurrency: Maximum number of jobs using the token at once (0: no limit)
+            max_optimizations: Parallel optimizations allowed by the token's plan (0: unknown)
+        """
+        self.name = name
+        self.secret = secret
+        self.max_concurrency = max_concurrency
+        self.max_optimizations = max_optimizations
+        self.active = 0
+        self.jobs = 0
+        self.rate_limited = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return not self.max_concurrency or self.active < self.max_concurrency
+
+    @property
+    def load(self) -> float:
+        """Used share of the concurrency quota (0 for tokens without a quota)."""
+        return self.active / self.max_concurrency if self.max_concurrency else 0.0
+
+
+class TokenPool:
+    """Spreads jobs across several API tokens.
+
+    Each job leases one token for its whole duration, so all requests for a
+    base asset and its optimized models use the token that uploaded it. A
+    new job gets the token with the most remaining budget: tokens that were
+    rate limited recently come last, then tokens by the used share of their
+    concurrency quota. If every token is at its quota, acquire() waits.
+    """
+
+    RATE_LIMIT_COOLDOWN = 60.0  # seconds a rate limited token is avoided
+    CANCEL_CHECK_INTERVAL = 1.0  # seconds between cancellation checks while waiting
+
+    def __init__(self, tokens: List[ApiToken]):
+        """
+        Args:
+            tokens: The tokens (at least one)
+        """
+        if not tokens:
+            raise ValueError("a token pool needs at least one token")
+        self.tokens = tokens
+        self._by_name = {token.name: token for token in tokens}
+        self._by_secret = {token.secret: token for token in tokens}
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_credentials(cls, credentials: Dict) -> "TokenPool":
+        """
+        Create a pool from a credentials file.
+
+        Args:
+            credentials: {"token": "..."} or {"tokens": [...]}, where each
+                entry is a token string or an object with "token" and the
+                optional "name", "max_concurrency" and "max_optimizations"
+
+        Returns:
+            TokenPool: The pool
+        """
+        entries = credentials.get("tokens") or [credentials["token"]]
+        tokens = []
+        for index, entry in enumerate(entries, 1):
+            if isinstance(entry, str):
+                entry = {"token": entry}
+            tokens.append(
+                ApiToken(
+                    entry.get("name") or f"token-{index}",
+                    entry["token"],
+                    entry.get("max_concurrency", 0),
+                    entry.get("max_optimizations", 0),
+                )
+            )
+        return cls(tokens)
+
+    def acquire(self, cancel_token: Optional[CancelToken] = None) -> ApiToken:
+        """
+        Lease the token with the most remaining budget, waiting if all are at their quota.
+
+        Args:
+            cancel_token: Stops waiting (raising Cancelled) when cancelled
+
+        Returns:
+            ApiToken: The token (give it back with release())
+        """
+        with self._condition:
+            while True:
+                now = time.time()
+                candidates = [token for token in self.tokens if token.available]
+                if candidates:
+                    token = min(
+                        candidates,
+                        key=lambda t: (t.cooldown_until > now, t.load, t.active, t.rate_limited),
+                    )
+                    token.active += 1
+                    token.jobs += 1
+                    return token
+                if cancel_token is not None:
+                    cancel_token.check()
+                self._condition.wait(self.CANCEL_CHECK_INTERVAL if cancel_token else None)
+
+    def release(self, token: ApiToken) -> None:
+        """Give back a leased token."""
+        with self._condition:
+            token.active -= 1
+            self._condition.notify()
+
+    def get(self, name: str) -> Optional[ApiToken]:
+        """The token with a name, None if there is none."""
+        return self._by_name.get(name)
+
+    def record_rate_limit(self, secret: str) -> None:
+        """
+        Count a 429 response for a token and avoid it for new jobs for a while.
+
+        Args:
+            secret: The token the rate limited request was sent with
+        """
+        token = self._by_secret.get(secret)
+        if token is None:
+            return
+        with self._condition:
+            token.rate_limited += 1
+            token.cooldown_until = time.time() + self.RATE_LIMIT_COOLDOWN
+
+    def summary(self) -> str:
+        """Per-token usage for the end-of-run statistics."""
+        lines = ["API tokens:"]
+        for token in self.tokens:
+            quota = f"max {token.max_concurrency} concurrent" if token.max_concurrency else "no quota"
+            lines.append(
+                f"  {token.name:<20} {token.jobs:>6} jobs  {token.rate_limited:>4} rate limited  ({quota})"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,272 @@
+import bisect
+import collections
+import itertools
+import threading
+import time
+from typing import BinaryIO, Deque, List, Optional, Tuple
+from src.api_stats import format_bytes
+from src.event_bus import EventBus, ThroughputEvent
+
+
+class TokenBucket:
+    """Bytes that may be transferred now, refilled at a fixed rate."""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Bytes per second (0: unlimited)
+            capacity: Most bytes the bucket saves up while transfers are idle
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self, num_bytes: int, now: float) -> float:
+        """Seconds until num_bytes are available (0: now)."""
+        if not self.rate:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (num_bytes - self.tokens) / self.rate)
+
+    def take(self, num_bytes: int) -> None:
+        """Spend num_bytes (after delay() returned 0); negative amounts give bytes back."""
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens - num_bytes)
+
+
+class _Direction:
+    """Cap, counters and recent throughput of one direction."""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.bytes = 0
+        self.peak = 0.0  # highest throughput over PEAK_WINDOW, in bytes per second
+        self.throttled = 0.0  # seconds transfers waited for bandwidth
+        self.recent: Deque[Tuple[float, int]] = collections.deque()  # (time, bytes)
+        self.last: Deque[Tuple[float, int]] = collections.deque()  # (time, bytes) in PEAK_WINDOW
+        self.last_bytes = 0  # bytes in self.last
+
+
+class TransferManager:
+    """Shapes uploads and downloads to bandwidth caps and shares them fairly.
+
+    Transfers read their data through stream(). Each direction has a token
+    bucket for its cap, and a global bucket caps both directions together.
+    While a cap applies, data is read in pieces of QUANTUM bytes, and
+    waiting pieces are granted in turn: highest priority first (see
+    RapidPipelineClient.lane()), round robin between transfers of the same
+    priority, so concurrent transfers split the bandwidth evenly. A piece
+    only waits for other directions' pieces if it needs the global bucket.
+
+    Keeping the caps somewhat below the link capacity leaves room for API
+    polls and acknowledgements, so their latency stays low while transfers
+    run at the capped rate.
+
+    The throughput of each direction over the last WINDOW seconds is emitted
+    as a ThroughputEvent every REPORT_INTERVAL seconds while data flows. The
+    peak throughput in the summary is the most bytes transferred within any
+    PEAK_WINDOW seconds, so transfers shorter than that count at most at
+    their size per PEAK_WINDOW.
+    """
+
+    DIRECTIONS = ("upload", "download")
+    QUANTUM = 64 * 1024  # bytes per granted piece
+    BURST = 0.25  # seconds of bandwidth a bucket saves up while idle
+    WINDOW = 5.0  # seconds the reported throughput is averaged over
+    REPORT_INTERVAL = 1.0  # seconds between throughput events
+    PEAK_WINDOW = 1.0  # seconds the peak throughput is measured over
+
+    def __init__(
+        self,
+        limit: float = 0.0,
+        upload_limit: float = 0.0,
+        download_limit: float = 0.0,
+        events: Optional[EventBus] = None,
+    ):
+        """
+        Args:
+            limit: Bytes per second of both directions together (0: unlimited)
+            upload_limit: Bytes per second of uploads (0: unlimited)
+            download_limit: Bytes per second of downloads (0: unlimited)
+            events: Event bus for throughput events
+        """
+        self.events = events or EventBus()
+        self.total = self._bucket(limit)
+        self.directions = {
+            "upload": _Direction(self._bucket(upload_limit)),
+            "download": _Direction(self._bucket(download_limit)),
+        }
+        self.active = 0  # open streams
+        # Pieces waiting for bandwidth, sorted: (-priority, turn, direction, bytes)
+        self._waiting: List[Tuple[int, int, str, int]] = []
+        self._turns = itertools.count()
+        self._condition = threading.Condition()
+        self._last_report = 0.0
+
+    def _bucket(self, rate: float) -> TokenBucket:
+        """Bucket for a cap, saving up BURST seconds of it (at least one piece)."""
+        return TokenBucket(rate, max(self.QUANTUM, rate * self.BURST))
+
+    def limited(self, direction: str) -> bool:
+        """Whether transfers in a direction are shaped."""
+        return bool(self.total.rate or self.directions[direction].bucket.rate)
+
+    def stream(self, stream: BinaryIO, direction: str, priority: int = 0) -> "ShapedStream":
+        """
+        Wrap a readable stream, so reading it is shaped and counted.
+
+        Args:
+            stream: Request body to upload or response to download
+            direction: "upload" or "download"
+            priority: Higher priorities get their pieces first
+
+        Returns:
+            ShapedStream: The wrapped stream (use it as a context manager
+            while the transfer runs)
+        """
+        return ShapedStream(self, stream, direction, priority)
+
+    def acquire(self, direction: str, num_bytes: int, priority: int = 0) -> None:
+        """
+        Wait for bandwidth to transfer a piece of up to QUANTUM bytes.
+
+        Args:
+            direction: "upload" or "download"
+            num_bytes: Size of the piece
+            priority: Higher priorities are granted first
+        """
+        state = self.directions[direction]
+        with self._condition:
+            waiter = (-priority, next(self._turns), direction, num_bytes)
+            bisect.insort(self._waiting, waiter)
+            started = time.monotonic()
+            while True:
+                now = time.monotonic()
+                delay = max(
+                    state.bucket.delay(num_bytes, now), self.total.delay(num_bytes, now)
+                )
+                if delay == 0 and self._next_turn(now) is waiter:
+                    break
+                self._condition.wait(delay or None)
+            self._waiting.remove(waiter)
+            state.bucket.take(num_bytes)
+            self.total.take(num_bytes)
+            state.throttled += time.monotonic() - started
+            self._condition.notify_all()
+
+    def refund(self, direction: str, num_bytes: int) -> None:
+        """Give back bandwidth acquired for a piece but not used (e.g. at the end of a stream)."""
+        with self._condition:
+            self.directions[direction].bucket.take(-num_bytes)
+            self.total.take(-num_bytes)
+            self._condition.notify_all()
+
+    def _next_turn(self, now: float) -> Optional[Tuple[int, int, str, int]]:
+        """First waiter whose direction has bandwidth left (called with the lock held)."""
+        for waiter in self._waiting:
+            if self.directions[waiter[2]].bucket.delay(waiter[3], now) == 0:
+                return waiter
+        return None
+
+    def count_active(self, delta: int) -> None:
+        """Count a stream as opened (1) or closed (-1)."""
+        with self._condition:
+            self.active += delta
+
+    def record(self, direction: str, num_bytes: int) -> None:
+        """Count transferred bytes and report the throughput when it is due."""
+        now = time.monotonic()
+        with self._condition:
+            state = self.directions[direction]
+            state.bytes += num_bytes
+            state.recent.append((now, num_bytes))
+            state.last.append((now, num_bytes))
+            state.last_bytes += num_bytes
+            while state.last[0][0] <= now - self.PEAK_WINDOW:
+                state.last_bytes -= state.last.popleft()[1]
+            state.peak = max(state.peak, state.last_bytes / self.PEAK_WINDOW)
+            if now - self._last_report < self.REPORT_INTERVAL:
+                return
+            self._last_report = now
+            rates = {name: self._throughput(name, now) for name in self.DIRECTIONS}
+            active = self.active
+        self.events.emit(ThroughputEvent(rates["upload"], rates["download"], active))
+
+    def throughput(self, direction: str) -> float:
+        """Bytes per second transferred in a direction over the last WINDOW seconds."""
+        with self._condition:
+            return self._throughput(direction, time.monotonic())
+
+    def _throughput(self, direction: str, now: float) -> float:
+        """Recent throughput of a direction (called with the lock held)."""
+        recent = self.directions[direction].recent
+        while recent and recent[0][0] < now - self.WINDOW:
+            recent.popleft()
+        return sum(num_bytes for _, num_bytes in recent) / self.WINDOW
+
+    def summary(self) -> str:
+        """Bytes, peak throughput, cap and waits per direction, for the end-of-run statistics."""
+        lines = [
+            "Bandwidth:",
+            f"{'direction':<10} {'bytes':>10} {'peak (1s)':>12} {'cap':>12} {'throttled':>10}",
+        ]
+        with self._condition:
+            for name, state in self.directions.items():
+                rate = state.bucket.rate
+                cap = _format_rate(rate) if rate else "-"
+                lines.append(
+                    f"{name:<10} {format_bytes(state.bytes):>10} {_format_rate(state.peak):>12} "
+                    f"{cap:>12} {state.throttled:>9.1f}s"
+                )
+            if self.total.rate:
+                lines.append(f"Total cap: {_format_rate(self.total.rate)}")
+        return "\n".join(lines)
+
+
+class ShapedStream:
+    """Readable stream whose reads are shaped and counted by a TransferManager.
+
+    Reads return at most QUANTUM bytes while the direction is capped, so
+    callers (e.g. http.client sending a request body) must not rely on
+    getting the full size they asked for.
+    """
+
+    def __init__(
+        self, manager: TransferManager, stream: BinaryIO, direction: str, priority: int = 0
+    ):
+        self.manager = manager
+        self.stream = stream
+        self.direction = direction
+        self.priority = priority
+
+    def __enter__(self) -> "ShapedStream":
+        self.manager.count_active(1)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.manager.count_active(-1)
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return b"".join(iter(lambda: self.read(TransferManager.QUANTUM), b""))
+        if not self.manager.limited(self.direction):
+            data = self.stream.read(size)
+        else:
+            size = min(size, TransferManager.QUANTUM)
+            self.manager.acquire(self.direction, size, self.priority)
+            data = self.stream.read(size)
+            if len(data) < size:
+                self.manager.refund(self.direction, size - len(data))
+        self.manager.record(self.direction, len(data))
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        """Rewind the wrapped stream (e.g. to retry an upload)."""
+        return self.stream.seek(offset, whence)
+
+
+def _format_rate(bytes_per_second: float) -> str:
+    """Format a throughput for the summary table."""
+    return format_bytes(bytes_per_second) + "/s"
@@ -4,7 +4,16 @@ import os
 sys.path.insert(0, os.path.abspath("schema/six"))
 sys.path.insert(0, os.path.abspath("schema/"))
 import jsonschema
+import threading
 from typing import Dict, List
+from src.download_filter import DOWNLOAD_RULES
+
+# Rules of the optional "select" object of a preset
+SELECTION_RULES = ("min_triangles", "max_triangles", "min_size_mb", "max_size_mb")
+
+# Compiled schema validators by schema file path
+_validators: Dict[str, object] = {}
+_validators_lock = threading.Lock()
 
 
 class ValidationUtils:
@@ -34,6 +43,66 @@ class ValidationUtils:
                 f'Error in preset "{preset_name}": Must specify either "preset_id" or "config".'
             )
             return False
+        return ValidationUtils.validate_preset_selection(
+            preset, preset_name
+        ) and ValidationUtils.validate_preset_downloads(preset, preset_name)
+
+    @staticmethod
+    def validate_preset_selection(preset: Dict, preset_name: str) -> bool:
+        """
+        Validates the optional "select" rules of a preset.
+
+        Args:
+            preset: The preset configuration
+            preset_name: Name of the preset for error messages
+
+        Returns:
+            bool: True if there are no rules or they are valid
+        """
+        rules = preset.get("select", {})
+        if not isinstance(rules, dict):
+            print(f'Error in preset "{preset_name}": "select" must be an object.')
+            return False
+        for key, value in rules.items():
+            if key not in SELECTION_RULES:
+                print(
+                    f'Error in preset "{preset_name}": unknown selection rule "{key}" '
+                    f'(use {", ".join(SELECTION_RULES)}).'
+                )
+                return False
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                print(f'Error in preset "{preset_name}": selection rule "{key}" must be a number.')
+                return False
+        return True
+
+    @staticmethod
+    def validate_preset_downloads(preset: Dict, preset_name: str) -> bool:
+        """
+        Validates the optional "download" rules of a preset.
+
+        Args:
+            preset: The preset configuration
+            preset_name: Name of the preset for error messages
+
+        Returns:
+            bool: True if there are no rules or they are valid
+        """
+        rules = preset.get("download", {})
+        if not isinstance(rules, dict):
+            print(f'Error in preset "{preset_name}": "download" must be an object.')
+            return False
+        for key, value in rules.items():
+            if key not in DOWNLOAD_RULES:
+                print(
+                    f'Error in preset "{preset_name}": unknown download rule "{key}" '
+                    f'(use {", ".join(DOWNLOAD_RULES)}).'
+                )
+                return False
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                print(
+                    f'Error in preset "{preset_name}": download rule "{key}" must be a list of formats.'
+                )
+                return False
         return True
 
     @staticmethod
@@ -52,30 +121,59 @@ class ValidationUtils:
             bool: True if configuration is valid
         """
         try:
-            with open(schema_file) as f:
-                schema = json.load(f)
-        except:
+            validator = ValidationUtils.get_schema_validator(schema_file)
+            error = jsonschema.exceptions.best_match(validator.iter_errors(preset_config))
+        except (IOError, ValueError):
             if not silent:
                 print(
                     f'Error: Unable to validate configuration against schema: schema couldn\'t be read from file "{schema_file}".'
                 )
             return False
+        except jsonschema.exceptions.SchemaError as e:
+            error = e
 
-        try:
-            jsonschema.validate(preset_config, schema)
+        if error is None:
             if not silent:
                 print("Preset configuration passed validation.")
             return True
-        except Exception as e:
-            if not silent:
-                print(
-                    "Error: Preset configuration is not valid - see JSON validation report on how to fix this:"
-                )
-                print("*" * 80)
-                print(e)
-                print("*" * 80)
+        if not silent:
+            print(
+                "Error: Preset configuration is not valid - see JSON validation report on how to fix this:"
+            )
+            print("*" * 80)
+            print(error)
+            print("*" * 80)
         return False
 
+    @staticmethod
+    def get_schema_validator(schema_file: str):
+        """
+        Get the compiled validator for a JSON schema file.
+
+        The schema is loaded and checked only once per file, so validating
+        many preset configurations (e.g. in serve mode) doesn't re-read it.
+
+        Args:
+            schema_file: Path to the JSON schema file
+
+        Returns:
+            The jsonschema validator instance
+
+        Raises:
+            IOError, ValueError: If the schema file can't be read or parsed
+            jsonschema.exceptions.SchemaError: If the schema itself is invalid
+        """
+        with _validators_lock:
+            validator = _validators.get(schema_file)
+            if validator is None:
+                with open(schema_file) as f:
+                    schema = json.load(f)
+                cls = jsonschema.validators.validator_for(schema)
+                cls.check_schema(schema)
+                validator = cls(schema)
+                _validators[schema_file] = validator
+        return validator
+
     @staticmethod
     def validate_input_file(file_path: str) -> bool:
         """
@@ -166,8 +264,11 @@ class ValidationUtils:
             print('Error: Credentials must be valid JSON.')
             return False
 
+        if "tokens" in credentials:
+            return ValidationUtils.validate_token_pool(credentials["tokens"])
+
         if "token" not in credentials:
-            print('Error: Required field "token" missing in credentials file.')
+            print('Error: Required field "token" (or "tokens") missing in credentials file.')
             return False
 
         if not isinstance(credentials["token"], str):
@@ -180,6 +281,42 @@ class ValidationUtils:
 
         return True
 
+    @staticmethod
+    def validate_token_pool(tokens: List) -> bool:
+        """
+        Validate the "tokens" list of a credentials file.
+
+        Args:
+            tokens: Token strings or {"token", "name", "max_concurrency",
+                "max_optimizations"} objects
+
+        Returns:
+            bool: True if the list is valid
+        """
+        if not isinstance(tokens, list) or not tokens:
+            print('Error: Field "tokens" must be a non-empty list in credentials file.')
+            return False
+        names = set()
+        for index, entry in enumerate(tokens, 1):
+            if isinstance(entry, str):
+                entry = {"token": entry}
+            if not isinstance(entry, dict) or not isinstance(entry.get("token"), str) or not entry["token"]:
+                print(
+                    f'Error: Entry {index} of "tokens" must be a token string or an object with "token".'
+                )
+                return False
+            for field in ("max_concurrency", "max_optimizations"):
+                limit = entry.get(field, 0)
+                if isinstance(limit, bool) or not isinstance(limit, int) or limit < 0:
+                    print(f'Error: "{field}" of token {index} must be a non-negative integer.')
+                    return False
+            name = entry.get("name") or f"token-{index}"
+            if name in names:
+                print(f'Error: Duplicate token name "{name}" in credentials file.')
+                return False
+            names.add(name)
+        return True
+
     def validate_presets(self, presets: dict, schema_path: str) -> bool:
         """Validate all presets in the configuration."""
         print("\nValidating preset configurations...")
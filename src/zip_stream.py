@@ -0,0 +1,252 @@
+import os
+import struct
+import time
+import zlib
+from typing import List, Tuple
+
+
+class ZipStream:
+    """Read-only file-like object producing a ZIP archive of a directory on the fly.
+
+    Files are stored without compression, so the exact archive size is known
+    before anything is read and the archive can be streamed into a request
+    with a Content-Length, without writing a temporary file. Texture images
+    and binary buffers are compressed already, so little is lost.
+
+    CRCs are computed while streaming and written in data descriptors after
+    each file. ZIP64 records are used for files or archives of 4 GiB and more.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    _LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+    _DATA_DESCRIPTOR = struct.Struct("<IIII")
+    _DATA_DESCRIPTOR64 = struct.Struct("<IIQQ")
+    _CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+    _END_RECORD = struct.Struct("<IHHHHIIH")
+    _END_RECORD64 = struct.Struct("<IQHHIIQQQQ")
+    _END_LOCATOR64 = struct.Struct("<IIQI")
+
+    _ZIP64_LIMIT = 0xFFFFFFFF
+    _FLAGS = 0x08 | 0x800  # data descriptor, UTF-8 names
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory to archive (hidden files are skipped)
+
+        Raises:
+            OSError: If the directory can't be read
+        """
+        self.root = root
+        # (archive name, path, size, DOS time, DOS date, offset)
+        self.entries: List[Tuple[bytes, str, int, int, int, int]] = []
+        offset = 0
+        for path, name in self._list_files(root):
+            stat = os.stat(path)
+            dos_time, dos_date = _dos_datetime(stat.st_mtime)
+            self.entries.append(
+                (name.encode("utf-8"), path, stat.st_size, dos_time, dos_date, offset)
+            )
+            offset += self._entry_size(name.encode("utf-8"), stat.st_size, offset)
+        self._central_offset = offset
+        self.size = offset + self._central_directory_size()
+        self.seek(0)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read up to size bytes of the archive.
+
+        Raises:
+            IOError: If a file changed size while the archive is streamed
+        """
+        if size is None or size < 0:
+            size = self.size
+        chunks = []
+        while size > 0:
+            if not self._buffer:
+                if not self._fill():
+                    break
+            chunk = self._buffer[:size]
+            self._buffer = self._buffer[size:]
+            chunks.append(chunk)
+            size -= len(chunk)
+        data = b"".join(chunks)
+        self._position += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        """Rewind to the start (the only supported position), e.g. to retry an upload."""
+        if offset != 0 or whence != 0:
+            raise IOError("ZipStream can only be rewound to the start")
+        self.close()
+        self._parts = self._generate()
+        self._buffer = b""
+        self._position = 0
+        self._file = None
+        return 0
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        file = getattr(self, "_file", None)
+        if file is not None:
+            file.close()
+            self._file = None
+
+    def __enter__(self) -> "ZipStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _fill(self) -> bool:
+        """Load the next part of the archive into the buffer."""
+        try:
+            self._buffer = next(self._parts)
+            return True
+        except StopIteration:
+            return False
+
+    def _generate(self):
+        """Yield the archive in parts."""
+        crcs = []
+        for name, path, size, dos_time, dos_date, offset in self.entries:
+            zip64 = self._needs_zip64(size, offset)
+            yield self._local_header(name, size, dos_time, dos_date, zip64)
+
+            crc = 0
+            remaining = size
+            self._file = open(path, "rb")
+            with self._file:
+                while remaining > 0:
+                    chunk = self._file.read(min(self.CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    crc = zlib.crc32(chunk, crc)
+                    remaining -= len(chunk)
+                    yield chunk
+                if remaining or self._file.read(1):
+                    raise IOError(f'"{path}" changed while it was being uploaded')
+            self._file = None
+            crcs.append(crc)
+
+            if zip64:
+                yield self._DATA_DESCRIPTOR64.pack(0x08074B50, crc, size, size)
+            else:
+                yield self._DATA_DESCRIPTOR.pack(0x08074B50, crc, size, size)
+
+        yield self._central_directory(crcs)
+
+    def _local_header(
+        self, name: bytes, size: int, dos_time: int, dos_date: int, zip64: bool
+    ) -> bytes:
+        extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0) if zip64 else b""
+        sizes = 0xFFFFFFFF if zip64 else 0
+        return self._LOCAL_HEADER.pack(
+            0x04034B50, 45 if zip64 else 20, self._FLAGS, 0, dos_time, dos_date,
+            0, sizes, sizes, len(name), len(extra),
+        ) + name + extra
+
+    def _central_directory(self, crcs: List[int]) -> bytes:
+        records = []
+        for (name, _, size, dos_time, dos_date, offset), crc in zip(self.entries, crcs):
+            extra_values = []
+            if size >= self._ZIP64_LIMIT:
+                extra_values += [size, size]
+            if offset >= self._ZIP64_LIMIT:
+                extra_values.append(offset)
+            extra = b""
+            if extra_values:
+                extra = struct.pack(
+                    f"<HH{len(extra_values)}Q", 0x0001, 8 * len(extra_values), *extra_values
+                )
+            version = 45 if extra else 20
+            records.append(
+                self._CENTRAL_HEADER.pack(
+                    0x02014B50, version, version, self._FLAGS, 0, dos_time, dos_date, crc,
+                    self._clamp(size), self._clamp(size),
+                    len(name), len(extra), 0, 0, 0, 0o100644 << 16,
+                    self._clamp(offset),
+                ) + name + extra
+            )
+        directory = b"".join(records)
+        return directory + self._end_records(len(directory))
+
+    def _end_records(self, directory_size: int) -> bytes:
+        count = len(self.entries)
+        offset = self._central_offset
+        end = b""
+        if self._needs_zip64_end(directory_size):
+            end64_offset = offset + directory_size
+            end += self._END_RECORD64.pack(
+                0x06064B50, 44, 45, 45, 0, 0, count, count, directory_size, offset
+            )
+            end += self._END_LOCATOR64.pack(0x07064B50, 0, end64_offset, 1)
+        end += self._END_RECORD.pack(
+            0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+            self._clamp(directory_size), self._clamp(offset), 0,
+        )
+        return end
+
+    def _entry_size(self, name: bytes, size: int, offset: int) -> int:
+        """Size of an entry's local header, data and data descriptor."""
+        if self._needs_zip64(size, offset):
+            return self._LOCAL_HEADER.size + len(name) + 20 + size + self._DATA_DESCRIPTOR64.size
+        return self._LOCAL_HEADER.size + len(name) + size + self._DATA_DESCRIPTOR.size
+
+    def _central_directory_size(self) -> int:
+        size = 0
+        for name, _, file_size, _, _, offset in self.entries:
+            extra = 0
+            if file_size >= self._ZIP64_LIMIT:
+                extra += 16
+            if offset >= self._ZIP64_LIMIT:
+                extra += 8
+            size += self._CENTRAL_HEADER.size + len(name) + (extra + 4 if extra else 0)
+        end = self._END_RECORD.size
+        if self._needs_zip64_end(size):
+            end += self._END_RECORD64.size + self._END_LOCATOR64.size
+        return size + end
+
+    def _clamp(self, value: int) -> int:
+        """32 bit field value, or the marker for a value in the ZIP64 extra field."""
+        return 0xFFFFFFFF if value >= self._ZIP64_LIMIT else value
+
+    def _needs_zip64(self, size: int, offset: int) -> bool:
+        # The offset matters too: readers take ZIP64 descriptors by the local extra field
+        return size >= self._ZIP64_LIMIT or offset >= self._ZIP64_LIMIT
+
+    def _needs_zip64_end(self, directory_size: int) -> bool:
+        return (
+            len(self.entries) >= 0xFFFF
+            or self._central_offset >= self._ZIP64_LIMIT
+            or directory_size >= self._ZIP64_LIMIT
+        )
+
+    @staticmethod
+    def _list_files(root: str) -> List[Tuple[str, str]]:
+        """All regular files below root as (path, archive name), sorted by name."""
+        files = []
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                if filename.startswith(".") or not os.path.isfile(path):
+                    continue
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                files.append((path, name))
+        return files
+
+
+def _dos_datetime(timestamp: float) -> Tuple[int, int]:
+    """Convert a timestamp to DOS (time, date) fields."""
+    t = time.localtime(max(timestamp, 315532800))  # DOS dates start in 1980
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+